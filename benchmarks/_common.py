@@ -0,0 +1,69 @@
+"""
+Shared helpers for the benchmark suite: an offline config, fake sockets and stats.
+"""
+import statistics
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+from aigent.core.profiles import set_config_path
+
+BENCH_PROFILE = "bench"
+
+def setup_offline_config(provider_options: Dict = None) -> Path:
+    """
+    Writes a temporary settings.yaml with a fake-provider profile that allows every
+    tool, points the global config at it and returns the temp directory.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="aigent-bench-"))
+    config = {
+        "settings": {"default_profile": BENCH_PROFILE, "allowed_work_dirs": [str(workdir), "."]},
+        "permission_schemas": [{"name": "bench", "default_policy": "allow"}],
+        "profiles": {
+            BENCH_PROFILE: {
+                "model_provider": "fake",
+                "model_name": "fake",
+                "permission_schema": "bench",
+                "provider_options": provider_options or {},
+            }
+        },
+    }
+    config_path = workdir / "settings.yaml"
+    config_path.write_text(yaml.safe_dump(config))
+    set_config_path(config_path)
+    return workdir
+
+class FakeWebSocket:
+    """Minimal stand-in for a FastAPI WebSocket that just counts frames."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.frames += 1
+        self.bytes += len(text)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Latency summary (ms) of a list of samples."""
+    ordered = sorted(samples_ms)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
@@ -0,0 +1,33 @@
+"""
+ConnectionManager.broadcast: events per second fanned out to 1, 10 and 100 sockets.
+"""
+import time
+from typing import Dict, List
+
+from aigent.core.schemas import AgentEvent, EventType
+from aigent.server.api import ConnectionManager
+
+from _common import FakeWebSocket
+
+async def run(socket_counts: List[int] = (1, 10, 100), events: int = 5000) -> Dict:
+    results = {}
+    payload = AgentEvent(type=EventType.TOKEN, content="token ")
+
+    for count in socket_counts:
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket() for _ in range(count)]
+        manager.active_connections["bench"] = sockets
+
+        start = time.perf_counter()
+        for _ in range(events):
+            # Serialize per event like process_chat_message does
+            await manager.broadcast("bench", payload.to_json())
+        elapsed = time.perf_counter() - start
+
+        results[f"sockets_{count}"] = {
+            "events": events,
+            "events_per_sec": round(events / elapsed, 1),
+            "frames_per_sec": round(events * count / elapsed, 1),
+            "us_per_event": round(elapsed / events * 1e6, 2),
+        }
+    return results
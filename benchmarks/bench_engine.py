@@ -0,0 +1,59 @@
+"""
+AgentEngine.stream: turn latency and time-to-first-event, with and without a tool call.
+"""
+import time
+from typing import Dict
+
+from aigent.core.engine import AgentEngine
+from aigent.core.profiles import ProfileManager
+from aigent.core.schemas import EventType
+
+from _common import BENCH_PROFILE, summarize
+
+async def _measure_turns(engine: AgentEngine, turns: int) -> Dict:
+    latencies, first_event, first_token = [], [], []
+    events = 0
+    for i in range(turns):
+        start = time.perf_counter()
+        got_first = got_token = False
+        async for event in engine.stream(f"turn {i}"):
+            now = time.perf_counter()
+            events += 1
+            if not got_first:
+                first_event.append((now - start) * 1000)
+                got_first = True
+            if event.type == EventType.TOKEN and not got_token:
+                first_token.append((now - start) * 1000)
+                got_token = True
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        # Keep the history from growing across turns so turns stay comparable
+        engine.history = engine.history[:1]
+
+    return {
+        "turn": summarize(latencies),
+        "time_to_first_event": summarize(first_event),
+        "time_to_first_token": summarize(first_token),
+        "events_per_turn": events / turns,
+    }
+
+async def run(turns: int = 50) -> Dict:
+    profile = ProfileManager().get_profile(BENCH_PROFILE)
+    results = {}
+
+    # 1. Plain answer
+    text_profile = profile.model_copy(update={"provider_options": {"generated_tokens": 64}})
+    engine = AgentEngine(text_profile)
+    await engine.initialize()
+    results["text_turn"] = await _measure_turns(engine, turns)
+
+    # 2. One tool call, then an answer
+    tool_profile = profile.model_copy(update={"provider_options": {"script": [
+        {"tool_calls": [{"name": "fs_read", "args": {"path": "README.md"}}]},
+        "Done reading.",
+    ]}})
+    engine = AgentEngine(tool_profile)
+    await engine.initialize()
+    results["tool_turn"] = await _measure_turns(engine, turns)
+
+    return results
@@ -0,0 +1,64 @@
+"""
+ConnectionManager.connect: new session creation and rehydration of a saved session.
+"""
+import time
+from pathlib import Path
+from typing import Dict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, SystemMessage
+
+import aigent.server.api as api
+from aigent.server.api import ConnectionManager
+
+from _common import BENCH_PROFILE, FakeWebSocket, summarize
+
+def _saved_history(turns: int):
+    messages = [SystemMessage(content="system prompt " * 200)]
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"question {i}", name="bench"))
+        messages.append(AIMessage(content="", tool_calls=[{"name": "fs_read", "args": {"path": f"f{i}.py"}, "id": f"c{i}"}]))
+        messages.append(ToolMessage(content="x = 1\n" * 200, tool_call_id=f"c{i}"))
+        messages.append(AIMessage(content=f"answer {i} " * 20))
+    return messages
+
+async def run(workdir: Path, iterations: int = 30, history_turns: int = 50) -> Dict:
+    api.SESSIONS_DIR = workdir / "sessions"
+    api.SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+
+    # 1. Fresh sessions
+    connect_ms = []
+    for i in range(iterations):
+        manager = ConnectionManager()
+        start = time.perf_counter()
+        assert await manager.connect(FakeWebSocket(), f"new-{i}", BENCH_PROFILE)
+        connect_ms.append((time.perf_counter() - start) * 1000)
+
+    # 2. Rehydrate a saved session (load + initialize + replay to the socket)
+    seed = ConnectionManager()
+    await seed.connect(FakeWebSocket(), "saved", BENCH_PROFILE)
+    seed.sessions["saved"].history = _saved_history(history_turns)
+    await seed._save_session_to_disk("saved")
+
+    rehydrate_ms, frames = [], 0
+    for _ in range(iterations):
+        manager = ConnectionManager()
+        socket = FakeWebSocket()
+        start = time.perf_counter()
+        assert await manager.connect(socket, "saved", BENCH_PROFILE)
+        rehydrate_ms.append((time.perf_counter() - start) * 1000)
+        frames = socket.frames
+
+    # 3. Save duration for the same session
+    save_ms = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await seed._save_session_to_disk("saved")
+        save_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "connect_new": summarize(connect_ms),
+        "connect_rehydrate": summarize(rehydrate_ms),
+        "save": summarize(save_ms),
+        "history_messages": len(seed.sessions["saved"].history),
+        "replayed_frames": frames,
+    }
@@ -0,0 +1,75 @@
+"""
+Tool round-trip overhead of the authorization wrapper (_wrap_tool + Authorizer.check).
+"""
+import time
+from typing import Dict
+
+from langchain_core.tools import tool
+
+from aigent.core.engine import AgentEngine, _ACTIVE_ENGINE
+from aigent.core.permissions import Authorizer
+from aigent.core.profiles import ProfileManager
+from aigent.core.schemas import PermissionSchema, PermissionPolicy
+
+from _common import BENCH_PROFILE, summarize
+
+async def _noop_event(event) -> None:
+    pass
+
+async def run(calls: int = 2000) -> Dict:
+    @tool
+    async def noop(value: str) -> str:
+        """Returns its input."""
+        return value
+
+    @tool
+    async def noop_wrapped(value: str) -> str:
+        """Returns its input."""
+        return value
+
+    # Baseline: the same interception shape as _wrap_tool, minus authorization,
+    # so the difference isolates the authorization cost
+    original_arun = noop._arun
+
+    async def passthrough_arun(*args, config=None, **kwargs):
+        return await original_arun(*args, config=config, **kwargs)
+
+    noop._arun = passthrough_arun
+
+    engine = AgentEngine(ProfileManager().get_profile(BENCH_PROFILE))
+    wrapped = engine._wrap_tool(noop_wrapped)
+    _ACTIVE_ENGINE.set(engine)
+
+    results = {}
+    cases = {
+        "policy_allow": PermissionSchema(name="allow", default_policy=PermissionPolicy.ALLOW),
+        "allowlisted": PermissionSchema(name="ask", default_policy=PermissionPolicy.ASK),
+    }
+    for name, schema in cases.items():
+        engine.authorizer = Authorizer(schema, _noop_event)
+        engine.authorizer.allowlist.add("noop_wrapped:*")
+
+        raw_ms, wrapped_ms, check_ms = [], [], []
+        for i in range(calls):
+            args = {"value": str(i)}
+
+            start = time.perf_counter()
+            await noop.ainvoke(args)
+            raw_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await wrapped.ainvoke(args)
+            wrapped_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await engine.authorizer.check("noop_wrapped", args)
+            check_ms.append((time.perf_counter() - start) * 1000)
+
+        raw, wrapped_stats = summarize(raw_ms), summarize(wrapped_ms)
+        results[name] = {
+            "passthrough_tool": raw,
+            "wrapped_tool": wrapped_stats,
+            "authorizer_check": summarize(check_ms),
+            "wrapper_overhead_us": round((wrapped_stats["mean_ms"] - raw["mean_ms"]) * 1000, 2),
+        }
+    return results
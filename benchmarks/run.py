@@ -0,0 +1,75 @@
+"""
+End-to-end benchmark suite, driven by the offline fake model provider.
+
+Measures engine turn latency / time-to-first-event, broadcast fan-out, session
+connect/rehydrate and tool authorization overhead, and prints one JSON document
+(optionally written to a file) so results can be compared across releases.
+
+Usage:
+    python benchmarks/run.py                       # all suites, JSON on stdout
+    python benchmarks/run.py --only engine tools   # selected suites
+    python benchmarks/run.py --output bench.json --quick
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from _common import setup_offline_config  # noqa: E402
+
+SUITES = ["engine", "broadcast", "sessions", "tools"]
+
+async def run_suites(selected, quick: bool) -> dict:
+    workdir = setup_offline_config()
+
+    # Imported after the config path is set
+    import bench_engine
+    import bench_broadcast
+    import bench_sessions
+    import bench_tools
+
+    scale = 0.2 if quick else 1.0
+    results = {}
+    for name in selected:
+        start = time.perf_counter()
+        if name == "engine":
+            results[name] = await bench_engine.run(turns=max(5, int(50 * scale)))
+        elif name == "broadcast":
+            results[name] = await bench_broadcast.run(events=max(500, int(5000 * scale)))
+        elif name == "sessions":
+            results[name] = await bench_sessions.run(workdir, iterations=max(5, int(30 * scale)))
+        elif name == "tools":
+            results[name] = await bench_tools.run(calls=max(200, int(2000 * scale)))
+        results[name]["wall_s"] = round(time.perf_counter() - start, 3)
+    return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=SUITES, help="Suites to run")
+    parser.add_argument("--output", type=str, default=None, help="Also write the JSON report to this file")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations (smoke run)")
+    args = parser.parse_args()
+
+    from importlib.metadata import version
+
+    report = {
+        "aigent_version": version("aigent"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": asyncio.run(run_suites(args.only, args.quick)),
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
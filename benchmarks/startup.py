@@ -0,0 +1,89 @@
+"""
+Startup-time benchmark.
+
+Runs `python -X importtime` for the CLI entry modules in a fresh interpreter and
+reports the total import time, the slowest modules, and any heavy modules that
+should only be loaded lazily (provider SDKs, the web stack).
+
+Usage:
+    python benchmarks/startup.py                 # JSON report on stdout
+    python benchmarks/startup.py --max-ms 400    # exit 1 on regression
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List
+
+# Modules `aigent chat` / `aigent --help` must not import eagerly
+LAZY_MODULES = [
+    "langchain_openai",
+    "langchain_anthropic",
+    "langchain_google_genai",
+    "fastapi",
+    "uvicorn",
+]
+
+TARGETS = {
+    "main": "import aigent.main",
+    "cli": "import aigent.interfaces.cli",
+    "engine": "import aigent.core.engine",
+}
+
+def measure(statement: str) -> Dict:
+    """Runs one import in a fresh interpreter and parses the importtime report."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    modules: List[Dict] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "top_level": not name.startswith("  "),
+        })
+
+    total_us = sum(m["cumulative_us"] for m in modules if m["top_level"])
+    loaded = {m["module"] for m in modules}
+    slowest = sorted(modules, key=lambda m: m["self_us"], reverse=True)[:15]
+
+    return {
+        "statement": statement,
+        "total_ms": round(total_us / 1000, 2),
+        "module_count": len(modules),
+        "eager_lazy_modules": [name for name in LAZY_MODULES if name in loaded],
+        "slowest": [{"module": m["module"], "self_ms": round(m["self_us"] / 1000, 2)} for m in slowest],
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if any target exceeds this import time")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per target (best run is reported)")
+    args = parser.parse_args()
+
+    report: Dict[str, Dict] = {}
+    failed = False
+    for name, statement in TARGETS.items():
+        runs = [measure(statement) for _ in range(max(1, args.runs))]
+        best = min(runs, key=lambda r: r["total_ms"])
+        report[name] = best
+
+        if best["eager_lazy_modules"]:
+            failed = True
+        if args.max_ms is not None and best["total_ms"] > args.max_ms:
+            failed = True
+
+    print(json.dumps({"benchmark": "startup", "results": report}, indent=2))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
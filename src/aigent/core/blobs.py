@@ -0,0 +1,92 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+from aigent.core.schemas import BlobStoreConfig
+
+# Handles are the SHA-256 hex digest of the stored content
+_HANDLE_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobStore:
+    """
+    Content-addressed store for oversized tool outputs.
+
+    Outputs larger than the threshold are written once under their SHA-256
+    (identical outputs share a file) and replaced, in the ToolMessage the model,
+    the history and the session file see, by a preview plus the blob handle.
+    The blob_read tool fetches byte ranges of a stored blob on demand.
+    """
+
+    def __init__(self, config: Optional[BlobStoreConfig] = None):
+        self.configure(config or BlobStoreConfig())
+
+    def configure(self, config: BlobStoreConfig) -> None:
+        self.config = config
+        self.root = Path(config.dir).expanduser()
+
+    def _path(self, handle: str) -> Path:
+        if not _HANDLE_RE.match(handle):
+            raise ValueError(f"Invalid blob handle: {handle!r}")
+        # Two-level fan-out keeps directories small
+        return self.root / handle[:2] / handle[2:]
+
+    def put(self, content: str) -> str:
+        """Stores content (if not already stored) and returns its handle."""
+        data = content.encode("utf-8")
+        handle = hashlib.sha256(data).hexdigest()
+        path = self._path(handle)
+        if path.exists():
+            return handle
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial blob
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return handle
+
+    def size(self, handle: str) -> int:
+        """Size of a stored blob in bytes."""
+        return self._path(handle).stat().st_size
+
+    def read_range(self, handle: str, offset: int = 0, length: int = 8000) -> str:
+        """Reads up to `length` bytes of a blob starting at byte `offset`."""
+        path = self._path(handle)
+        with open(path, "rb") as f:
+            f.seek(max(0, offset))
+            data = f.read(max(0, length))
+        # A range may cut a multi-byte character; don't fail on it
+        return data.decode("utf-8", errors="replace")
+
+    def needs_spill(self, output: str) -> bool:
+        return self.config.enabled and len(output) > self.config.threshold_chars
+
+    def spill(self, output: str) -> str:
+        """
+        Stores an oversized output and returns the preview that replaces it.
+
+        Args:
+            output: The full tool output.
+
+        Returns:
+            str: The first preview_chars characters plus a note with the handle.
+        """
+        handle = self.put(output)
+        size = len(output.encode("utf-8"))
+        preview = output[:self.config.preview_chars]
+        return (
+            f"{preview}\n"
+            f"... [Output truncated: {len(output)} characters ({size} bytes) in total. "
+            f"The full output is stored as blob {handle}. "
+            f"Use blob_read(handle=\"{handle}\", offset=<byte offset>, length=<bytes>) to read more.]"
+        )
+
+# Process-wide store, configured from settings.blobs by AgentEngine.initialize()
+BLOB_STORE = BlobStore()
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import AsyncGenerator, AsyncIterator, List, Optional
+from aigent.core.schemas import AgentEvent, EventType, TokenBatchingConfig
+
+class TokenCoalescer:
+    """
+    Merges bursts of TOKEN events into micro-batches before they reach the transports.
+
+    The first token of a turn is passed through immediately (no added time to first
+    token). After that, tokens are buffered until the batch window elapses or the
+    buffer reaches max_chars. Any non-token event flushes the buffer first, so the
+    relative order of events is preserved.
+
+    The window adapts to the stream: it grows towards max_delay while tokens arrive
+    faster than it (batches hold several tokens) and shrinks back to min_delay when
+    the stream is slow, so a trickle of tokens is not delayed needlessly.
+    """
+
+    def __init__(self, min_delay: float = 0.016, max_delay: float = 0.05, max_chars: int = 2048):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_config(cls, config: TokenBatchingConfig) -> Optional["TokenCoalescer"]:
+        """Builds a coalescer from settings, or returns None if batching is disabled."""
+        if not config.enabled:
+            return None
+        return cls(
+            min_delay=config.min_delay_ms / 1000,
+            max_delay=config.max_delay_ms / 1000,
+            max_chars=config.max_chars
+        )
+
+    async def coalesce(self, events: AsyncIterator[AgentEvent]) -> AsyncGenerator[AgentEvent, None]:
+        """
+        Wraps an event stream (e.g. AgentEngine.stream) and yields coalesced events.
+
+        Args:
+            events: The source event stream.
+
+        Yields:
+            AgentEvent: Events in their original order, with runs of TOKEN events merged.
+        """
+        iterator = events.__aiter__()
+        buffer: List[str] = []
+        buffered_chars = 0
+        deadline = 0.0
+        window = self.min_delay
+        first_token = True
+
+        # The pending __anext__ runs as a task so that a flush timeout never cancels
+        # (and thereby closes) the source generator
+        next_task: Optional[asyncio.Task] = None
+        try:
+            while True:
+                if next_task is None:
+                    next_task = asyncio.ensure_future(iterator.__anext__())
+
+                if buffer:
+                    timeout = max(0.0, deadline - time.monotonic())
+                    done, _ = await asyncio.wait({next_task}, timeout=timeout)
+                    if not done:
+                        # Window elapsed with the source still quiet: flush
+                        yield self._batch(buffer)
+                        window = self._adapt(window, len(buffer))
+                        buffer, buffered_chars = [], 0
+                        continue
+                else:
+                    await asyncio.wait({next_task})
+
+                task, next_task = next_task, None
+                try:
+                    event = task.result()
+                except StopAsyncIteration:
+                    break
+
+                if event.type == EventType.TOKEN:
+                    if first_token:
+                        first_token = False
+                        yield event
+                        continue
+                    if not buffer:
+                        deadline = time.monotonic() + window
+                    buffer.append(event.content)
+                    buffered_chars += len(event.content)
+                    if buffered_chars >= self.max_chars:
+                        yield self._batch(buffer)
+                        window = self._adapt(window, len(buffer))
+                        buffer, buffered_chars = [], 0
+                    continue
+
+                # Non-token event: flush pending tokens first to keep ordering
+                if buffer:
+                    yield self._batch(buffer)
+                    window = self._adapt(window, len(buffer))
+                    buffer, buffered_chars = [], 0
+                if event.type in (EventType.FINISH, EventType.ERROR):
+                    # A new answer starts after this: pass its first token straight through
+                    first_token = True
+                yield event
+
+            if buffer:
+                yield self._batch(buffer)
+        finally:
+            if next_task is not None and not next_task.done():
+                next_task.cancel()
+                # Let the cancellation land before closing the source, which
+                # can't be closed while its __anext__ is still running
+                await asyncio.wait({next_task})
+            # Stopped early (consumer closed us): finalize the source now
+            # rather than whenever the GC gets to it
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+
+    def _batch(self, parts: List[str]) -> AgentEvent:
+        return AgentEvent(type=EventType.TOKEN, content="".join(parts))
+
+    def _adapt(self, window: float, batch_size: int) -> float:
+        """Grows the window while batches fill up, shrinks it when they don't."""
+        if batch_size > 1:
+            return min(self.max_delay, window * 2)
+        return max(self.min_delay, window / 2)
@@ -1,34 +1,107 @@
 import asyncio
-from typing import List, AsyncGenerator, Any, Optional
+import json
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, AsyncGenerator, Any, Awaitable, Callable, Optional, Dict, Tuple
 from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage, AIMessage, ToolMessage
 from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables import RunnableConfig
-from langchain.agents import AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-# Handle potential import location changes or missing function in older versions
-try:
-    from langchain.agents import create_tool_calling_agent
-except ImportError:
-    try:
-        # Try importing from specific module if main package doesn't expose it
-        from langchain.agents.tool_calling_agent.base import create_tool_calling_agent
-    except ImportError:
-         # If truly missing, we might be on a very old version (pre-0.1.15)
-         # But we specified >=0.3.0 in pyproject.toml now.
-         # Re-raise with clear message
-         raise ImportError("Could not import 'create_tool_calling_agent'. Please ensure langchain>=0.2.0 is installed.")
-
-from aigent.core.schemas import UserProfile, AgentEvent, EventType, ModelProvider, PermissionSchema, PermissionPolicy
+from aigent.core.schemas import UserProfile, AgentEvent, EventType, PermissionSchema, PermissionPolicy, ModelProvider
 from aigent.core.memory import MemoryLoader
+from aigent.core.providers import create_chat_model, WARMABLE_PROVIDERS
+from aigent.core.http_pool import HTTP_POOL
+from aigent.core.prompt_cache import build_system_message, mark_history_prefix, extract_usage
+from aigent.core.history import ChatHistory, SUMMARY_MESSAGE_ID, WINDOW_LOW_WATERMARK, render_transcript
+from aigent.core.tracing import TurnTracer, SpanExporter, OTLPFileSpanExporter
+from aigent.core.processes import ProcessRegistry, CURRENT_PROCESSES
+from aigent.core.shell import configure_shell, ShellSession, CURRENT_SHELL
 from aigent.plugins.loader import PluginLoader
-from aigent.core.tools import fs_read, fs_write, fs_patch, bash_execute
+from aigent.core.tools import fs_read, fs_write, fs_patch, fs_multi_patch, fs_search, fs_glob, code_lookup, bash_execute, blob_read
+from aigent.core.blobs import BLOB_STORE
+from aigent.core.files import FILE_CACHE, ReadTracker, CURRENT_READS
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.search import configure_search
+from aigent.core.workspace import WORKSPACE
+from aigent.core.repomap import REPO_MAP
 from aigent.core.permissions import Authorizer
 from aigent.core.profiles import ProfileManager
 
+# Bump whenever the structure of the agent prompt below changes, so that
+# compiled agents built against the old layout are not reused.
+PROMPT_LAYOUT_VERSION = 2
+
+# Process-wide caches shared by every AgentEngine.
+# Chat models: (provider, model_name, temperature, provider_options) -> BaseChatModel
+_MODEL_CACHE: Dict[Tuple[Any, ...], BaseChatModel] = {}
+# Compiled agents: (id(llm), tool names, prompt layout) -> AgentExecutor
+_AGENT_CACHE: Dict[Tuple[Any, ...], Any] = {}
+
+# Providers whose models keep per-conversation state (the fake provider's script
+# position and RNG); every engine gets its own model and compiled agent, so
+# concurrent sessions don't advance one shared script
+_UNSHARED_PROVIDERS = {ModelProvider.FAKE}
+
+# The engine whose turn is currently running. Wrapped tools are shared between
+# engines (they live inside cached AgentExecutors), so they look up the
+# Authorizer of the calling engine through this context variable.
+_ACTIVE_ENGINE: ContextVar[Optional["AgentEngine"]] = ContextVar("aigent_active_engine", default=None)
+
+# Event channel of the turn running in the current task. Each turn gets its own
+# queue, so late events from an earlier (crashed) turn can never leak into the next.
+_TURN_CHANNEL: ContextVar[Optional[asyncio.Queue]] = ContextVar("aigent_turn_channel", default=None)
+
+# Tracer of the turn running in the current task (read by the wrapped tools to
+# time authorization)
+_TURN_TRACER: ContextVar[Optional[TurnTracer]] = ContextVar("aigent_turn_tracer", default=None)
+
+# Pushed onto a turn's channel after its last event
+_END_OF_TURN = object()
+
+def clear_agent_cache() -> None:
+    """Drops every cached chat model and compiled agent."""
+    _MODEL_CACHE.clear()
+    _AGENT_CACHE.clear()
+
+def _report_warm_up(task: asyncio.Task) -> None:
+    """Done-callback of the connection warm-up: retrieves and reports its failure."""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"HTTP warm-up failed: {task.exception()}")
+
+def _build_prompt() -> ChatPromptTemplate:
+    """Builds the prompt layout used by every compiled agent."""
+    return ChatPromptTemplate.from_messages([
+        # A message (not a template) so it can carry provider cache breakpoints
+        MessagesPlaceholder(variable_name="system_message"),
+        MessagesPlaceholder(variable_name="chat_history"),
+        # We don't standardly inject user name into prompt unless we change the prompt structure.
+        # But LangChain HumanMessage name is enough for history tracking.
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+def get_chat_model(profile: UserProfile) -> BaseChatModel:
+    """
+    Returns a chat model for the profile, shared by all engines with the same
+    provider, model, temperature and provider options (except for
+    _UNSHARED_PROVIDERS, which get a new model per call).
+    """
+    if profile.model_provider in _UNSHARED_PROVIDERS:
+        return create_chat_model(profile)
+    key = (
+        profile.model_provider,
+        profile.model_name,
+        profile.temperature,
+        json.dumps(profile.provider_options, sort_keys=True, default=str)
+    )
+    llm = _MODEL_CACHE.get(key)
+    if llm is None:
+        # Provider SDKs are imported here, on first use, not at module import
+        llm = create_chat_model(profile)
+        _MODEL_CACHE[key] = llm
+    return llm
+
 class AgentEngine:
     def __init__(self, profile: UserProfile, yolo: bool = False):
         self.profile = profile
@@ -37,14 +110,61 @@ class AgentEngine:
         self.plugin_loader = PluginLoader()
         self.tools: List[Any] = []
         self.llm: BaseChatModel = None # type: ignore
-        self.history: List[BaseMessage] = []
-        
-        # Event Queue for streaming events out (populated during stream)
-        self._event_queue: asyncio.Queue = asyncio.Queue()
+        # File ranges this session has already been sent (see fs_read)
+        self.reads = ReadTracker()
+        self.history = ChatHistory()
+
         self.authorizer: Authorizer = None # type: ignore
 
+        # Caps concurrent tool execution when the model returns several tool calls
+        # at once (AgentExecutor dispatches them with asyncio.gather)
+        self._tool_semaphore = asyncio.Semaphore(max(1, profile.max_parallel_tools))
+
+        # Background history compaction (see _compact_history)
+        self._compaction_task: Optional[asyncio.Task] = None
+        # If set, messages folded into the summary are appended here (JSON lines)
+        self.archive_path: Optional[Path] = None
+        # If set, awaited after a compaction changed the history (e.g. to persist it)
+        self.on_compacted: Optional[Callable[[], Awaitable[None]]] = None
+
+        # Token usage of the last turn, incl. prompt cache reads/writes
+        self.last_turn_usage: Dict[str, int] = {}
+
+        # Tracing: each finished turn's spans are handed to these exporters
+        self.span_exporters: List[SpanExporter] = []
+        self.emit_trace_events: bool = True
+
+        # Long-lived shell for bash_execute (settings.bash.persistent_shell)
+        self.shell: Optional[ShellSession] = None
+
+        # Background provider connection warm-up (settings.http_pool.warm_up)
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+        # Task running the in-flight turn (see cancel)
+        self._turn_task: Optional[asyncio.Task] = None
+
+        # Compiled agent for this engine (see _get_agent_executor)
+        self._agent_executor: Any = None
+        self._agent_key: Optional[Tuple[Any, ...]] = None
+
+    @property
+    def history(self) -> ChatHistory:
+        return self._history
+
+    @history.setter
+    def history(self, messages: List[BaseMessage]) -> None:
+        # Always keep a ChatHistory so token counts are cached as messages are added
+        self._history = messages if isinstance(messages, ChatHistory) else ChatHistory(messages)
+        # Replaced (reset, loaded): files read earlier are no longer in the conversation
+        self.reads.clear()
+
     async def _emit_event(self, event: AgentEvent):
-        await self._event_queue.put(event)
+        """Pushes an event onto the channel of the turn running in this task."""
+        channel = _TURN_CHANNEL.get()
+        if channel is None:
+            # No turn in flight (e.g. a stray callback after the turn ended)
+            return
+        channel.put_nowait(event)
 
     async def initialize(self) -> None:
         """
@@ -54,12 +174,13 @@ class AgentEngine:
         
         schema = None
         
+        pm = ProfileManager()
+
         # 1. YOLO Mode Override (Highest Priority)
         if self.yolo:
             schema = PermissionSchema(name="yolo", default_policy=PermissionPolicy.ALLOW)
         else:
             # 2. Load from Profile Config
-            pm = ProfileManager()
             schema_name = self.profile.permission_schema
             found_schema = pm.get_permission_schema(schema_name)
             
@@ -70,9 +191,14 @@ class AgentEngine:
                 schema = PermissionSchema(name="fallback_safe", default_policy=PermissionPolicy.ASK)
                 schema.tools = {
                     "fs_read": PermissionPolicy.ALLOW,
+                    "fs_search": PermissionPolicy.ALLOW,
+                    "fs_glob": PermissionPolicy.ALLOW,
+                    "code_lookup": PermissionPolicy.ALLOW,
                     "bash_execute": PermissionPolicy.ASK,
                     "fs_write": PermissionPolicy.ASK,
-                    "fs_patch": PermissionPolicy.ASK
+                    "fs_patch": PermissionPolicy.ASK,
+                    "fs_multi_patch": PermissionPolicy.ASK,
+                    "blob_read": PermissionPolicy.ALLOW
                 }
         
         self.authorizer = Authorizer(schema, self._emit_event)
@@ -121,7 +247,7 @@ class AgentEngine:
 
         # 2. Load Tools (Plugins + Core)
         plugin_tools = self.plugin_loader.load_plugins(self.profile.allowed_tools)
-        core_tools = [fs_read, fs_write, fs_patch, bash_execute]
+        core_tools = [fs_read, fs_search, fs_glob, code_lookup, fs_write, fs_patch, fs_multi_patch, bash_execute, blob_read]
         
         raw_tools = []
         if "*" in self.profile.allowed_tools:
@@ -133,41 +259,47 @@ class AgentEngine:
         self.tools = [self._wrap_tool(t) for t in raw_tools]
 
         # 3. Setup LLM
-        if self.profile.model_provider == ModelProvider.OPENAI:
-            self.llm = ChatOpenAI(
-                model=self.profile.model_name,
-                temperature=self.profile.temperature
-            )
-        elif self.profile.model_provider == ModelProvider.ANTHROPIC:
-            self.llm = ChatAnthropic(
-                model=self.profile.model_name,
-                temperature=self.profile.temperature
-            )
-        elif self.profile.model_provider == ModelProvider.GOOGLE:
-            self.llm = ChatGoogleGenerativeAI(
-                model=self.profile.model_name,
-                temperature=self.profile.temperature,
-                convert_system_message_to_human=True # Sometimes needed for older Gemini models, safe to keep
-            )
-        elif self.profile.model_provider == ModelProvider.GROK:
-            # Grok uses the OpenAI SDK format
-            import os
-            api_key = os.getenv("XAI_API_KEY")
-            if not api_key:
-                raise ValueError("XAI_API_KEY not found in environment")
-                
-            self.llm = ChatOpenAI(
-                model=self.profile.model_name,
-                base_url="https://api.x.ai/v1",
-                api_key=api_key,
-                temperature=self.profile.temperature
+        # Tools are bound once per compiled agent (see _get_agent_executor),
+        # not here, so the plain model can be shared between engines.
+        if not pm.loaded:
+            pm.load_profiles()
+        HTTP_POOL.configure(pm.config.http_pool)
+        configure_shell(pm.config.bash)
+        BLOB_STORE.configure(pm.config.blobs)
+        FILE_CACHE.configure(pm.config.file_cache)
+        ALLOWED_ROOTS.configure(pm.config.allowed_work_dirs, watch=pm.config_path)
+        configure_search(pm.config.search)
+        WORKSPACE.configure(pm.config.workspace_index, ALLOWED_ROOTS.current_dirs())
+        REPO_MAP.configure(pm.config.repo_map)
+        if pm.config.bash.persistent_shell and self.shell is None:
+            # Started lazily by the first command
+            self.shell = ShellSession(
+                shell=pm.config.bash.shell,
+                cwd=os.getcwd(),
+                idle_timeout=pm.config.bash.idle_timeout
             )
-        else:
-            raise ValueError(f"Unsupported provider: {self.profile.model_provider}")
 
-        # Bind tools
-        if self.tools:
-            self.llm = self.llm.bind_tools(self.tools)
+        tracing = pm.config.tracing
+        self.emit_trace_events = tracing.emit_events
+        if tracing.otlp_file:
+            self.span_exporters.append(OTLPFileSpanExporter(tracing.otlp_file))
+        self.llm = get_chat_model(self.profile)
+
+        # Optionally open the provider connection now, off the critical path,
+        # so the first turn doesn't pay for TCP + TLS setup
+        if pm.config.http_pool.warm_up and self.profile.model_provider in WARMABLE_PROVIDERS \
+                and self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(HTTP_POOL.warm_up(self.profile.model_provider))
+            self._warm_up_task.add_done_callback(_report_warm_up)
+
+        # Optional map of the workspace's code (see RepoMap), after the static context
+        if pm.config.repo_map.inject_into_prompt:
+            try:
+                repo_map = await asyncio.to_thread(REPO_MAP.render, ALLOWED_ROOTS.current_dirs())
+                if repo_map:
+                    system_context += f"\n--- Repository Map ---\n{repo_map}\n"
+            except Exception as e:
+                print(f"Repository map unavailable: {e}")
 
         # Initialize History with System Prompt
         self.history = [SystemMessage(content=system_context)]
@@ -175,7 +307,14 @@ class AgentEngine:
     def _wrap_tool(self, tool: Any) -> Any:
         """
         Wraps a tool's _arun method to check permissions first.
+
+        The wrapper is installed once per tool object and resolves the Authorizer
+        of whichever engine is running the current turn, so the same tool can be
+        shared by compiled agents across engines.
         """
+        if getattr(tool, "_aigent_wrapped", False):
+            return tool
+
         # We need to modify the instance method
         # This is a bit hacky but standard for dynamic interception
         original_arun = tool._arun
@@ -191,16 +330,67 @@ class AgentEngine:
             if kwargs:
                 input_args.update(kwargs)
 
-            allowed = await self.authorizer.check(tool.name, input_args)
+            engine = _ACTIVE_ENGINE.get()
+            if engine is None or engine.authorizer is None:
+                # Fail closed: never run an unauthorized tool outside of a turn
+                return "Error: Tool execution denied (no active session)."
+
+            # Authorization runs outside the semaphore: allowed calls don't queue
+            # behind a call waiting on the user, and approvals are serialized
+            # by the Authorizer itself
+            tracer = _TURN_TRACER.get()
+            span = tracer.start_span("authorization", tool=tool.name) if tracer else None
+            allowed = await engine.authorizer.check(tool.name, input_args)
+            if span is not None:
+                tracer.end_span(span, allowed=allowed)
             if not allowed:
                 return "Error: Tool execution denied by user."
             
             # Pass config explicitly if provided
-            return await original_arun(*args, config=config, **kwargs)
+            async with engine._tool_semaphore:
+                result = await original_arun(*args, config=config, **kwargs)
+
+            # Oversized output goes to the blob store; history, replay and the
+            # model only get a preview and a handle for blob_read
+            if isinstance(result, str) and tool.name != "blob_read" and BLOB_STORE.needs_spill(result):
+                result = await asyncio.to_thread(BLOB_STORE.spill, result)
+            return result
         
         tool._arun = wrapped_arun
+        tool._aigent_wrapped = True
         return tool
 
+    def _get_agent_executor(self) -> Any:
+        """
+        Returns the compiled agent for the current model, tools and prompt layout.
+
+        Agents are cached process-wide, so engines sharing a profile and tool set
+        reuse the same executor instead of rebuilding it every turn. The cache key
+        changes (and a new agent is compiled) whenever the model, the tool objects
+        or PROMPT_LAYOUT_VERSION change. Tools are keyed by identity, not name: an
+        engine's own plugin tool must never run in another engine's executor. The
+        cached executor holds its tools, so their ids can't be reused meanwhile.
+        """
+        key = (id(self.llm), tuple(id(t) for t in self.tools), PROMPT_LAYOUT_VERSION)
+        if self._agent_executor is not None and self._agent_key == key:
+            return self._agent_executor
+
+        # A model of its own (see _UNSHARED_PROVIDERS) would never be shared
+        shared = self.profile.model_provider not in _UNSHARED_PROVIDERS
+        executor = _AGENT_CACHE.get(key) if shared else None
+        if executor is None:
+            # Imported lazily so the (heavy) agents package is only loaded on first use
+            from langchain.agents import AgentExecutor, create_tool_calling_agent
+
+            agent = create_tool_calling_agent(self.llm, self.tools, _build_prompt())
+            executor = AgentExecutor(agent=agent, tools=self.tools, verbose=False)
+            if shared:
+                _AGENT_CACHE[key] = executor
+
+        self._agent_executor = executor
+        self._agent_key = key
+        return executor
+
     async def _run_agent_executor(self, user_input: str, user_name: Optional[str] = None) -> None:
         """
         Helper to run the agent and push events to the queue.
@@ -209,52 +399,102 @@ class AgentEngine:
             user_input: The text input from the user.
             user_name: Optional name of the user for history tracking.
         """
-        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        # Route tool authorization to this engine for the duration of the turn
+        _ACTIVE_ENGINE.set(self)
+
+        tracer = TurnTracer({
+            "profile": self.profile.name,
+            "model": self.profile.model_name,
+            "provider": str(self.profile.model_provider)
+        })
+        _TURN_TRACER.set(tracer)
+        # run_id -> open span of an in-flight model call / tool call
+        open_spans: Dict[str, Any] = {}
+
+        usage: Dict[str, int] = {}
+        error: Optional[Exception] = None
+        cancelled = False
+        streamed_tokens = 0
+        final_text = ""
+        tool_buffer: Dict[str, Dict[str, Any]] = {}
+
+        # Child processes started by tools during this turn (killed on cancel)
+        processes = ProcessRegistry()
+        CURRENT_PROCESSES.set(processes)
+        CURRENT_SHELL.set(self.shell)
+        CURRENT_READS.set(self.reads)
 
         try:
-            # Construct agent
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "{system_message}"),
-                MessagesPlaceholder(variable_name="chat_history"),
-                # We don't standardly inject user name into prompt unless we change the prompt structure.
-                # But LangChain HumanMessage name is enough for history tracking.
-                ("human", "{input}"),
-                MessagesPlaceholder(variable_name="agent_scratchpad"),
-            ])
+            agent_executor = self._get_agent_executor()
 
-            agent = create_tool_calling_agent(self.llm, self.tools, prompt)
-            agent_executor = AgentExecutor(agent=agent, tools=self.tools, verbose=False)
+            system_text = self.history[0].content if self.history else ""
 
-            system_msg_content = self.history[0].content if self.history else ""
+            # Rolling summary of compacted turns goes right after the system prompt
+            summary = self.history.summary()
+            caching = self.profile.prompt_caching
+            provider = self.profile.model_provider
+            system_msg = build_system_message(
+                system_text,
+                summary.content if summary is not None else None,
+                provider,
+                caching
+            )
             
-            # History Slicing (Compactification)
-            # Get all messages between System (0) and Latest User (last)
-            intermediate_history = self.history[1:-1]
+            # History Windowing (Compactification)
+            # Get all messages between System (+ Summary) and Latest User (last)
+            intermediate_history = self.history[self.history.conversation_start():-1]
             
-            # Slice to keep only the last N messages
-            max_msgs = getattr(self.profile, "max_messages", 50)
-            chat_history_safe = intermediate_history[-max_msgs:] if max_msgs > 0 else intermediate_history
-
-            final_text = ""
-            tool_buffer = {}
+            # Keep the newest messages that fit the profile's token budget,
+            # never splitting a tool call from its results. The window is
+            # trimmed in chunks, so its start (and cached prefix) holds for a while
+            chat_history_safe = self.history.window(
+                intermediate_history,
+                max_tokens=self.profile.max_history_tokens,
+                max_messages=self.profile.max_messages,
+                low_watermark=WINDOW_LOW_WATERMARK
+            )
+            chat_history_safe = mark_history_prefix(chat_history_safe, provider, caching)
+            # Earlier fs_read results may have left the prompt; resend files from now on
+            if len(chat_history_safe) < len(intermediate_history):
+                self.reads.clear()
 
             async for event in agent_executor.astream_events(
                 {
-                    "system_message": system_msg_content,
+                    "system_message": [system_msg],
                     "chat_history": chat_history_safe,
                     "input": user_input
                 },
                 version="v2"
             ):
                 kind = event["event"]
-                
-                if kind == "on_chat_model_stream":
+
+                if kind == "on_chat_model_start":
+                    open_spans[event.get("run_id")] = tracer.start_span("llm")
+
+                elif kind == "on_chat_model_stream":
                     content = event["data"]["chunk"].content
                     if content:
+                        llm_span = open_spans.get(event.get("run_id"))
+                        if llm_span is not None and "ttft_ms" not in llm_span.attributes:
+                            llm_span.attributes["ttft_ms"] = round(llm_span.duration_ms, 3)
+                        if not streamed_tokens:
+                            # Only recorded once a token arrives: tool-only, cancelled
+                            # and failed turns have no time to first token
+                            tracer.mark("first_token")
+                        streamed_tokens += 1
                         final_text += content
                         await self._emit_event(AgentEvent(type=EventType.TOKEN, content=content))
-                
+
+                elif kind == "on_chat_model_end":
+                    call_usage = extract_usage(event["data"].get("output"))
+                    for key, value in call_usage.items():
+                        usage[key] = usage.get(key, 0) + value
+                    llm_span = open_spans.pop(event.get("run_id"), None)
+                    if llm_span is not None:
+                        tracer.end_span(llm_span, **call_usage)
+
                 elif kind == "on_tool_start":
+                    open_spans[event.get("run_id")] = tracer.start_span("tool", tool=event["name"])
                     await self._emit_event(AgentEvent(
                         type=EventType.TOOL_START, 
                         content=f"Calling tool: {event['name']}",
@@ -268,6 +508,14 @@ class AgentEngine:
                         "output": None
                     }
                     
+                elif kind == "on_custom_event" and event["name"] == "tool_output":
+                    data = event["data"]
+                    await self._emit_event(AgentEvent(
+                        type=EventType.TOOL_OUTPUT,
+                        content=data["content"],
+                        metadata={"name": data.get("tool"), "stream": data.get("stream")}
+                    ))
+
                 elif kind == "on_tool_end":
                      await self._emit_event(AgentEvent(
                         type=EventType.TOOL_END, 
@@ -277,35 +525,134 @@ class AgentEngine:
                      run_id = event["run_id"]
                      if run_id in tool_buffer:
                          tool_buffer[run_id]["output"] = str(event["data"].get("output"))
+                     tool_span = open_spans.pop(run_id, None)
+                     if tool_span is not None:
+                         tracer.end_span(tool_span)
+
+        except asyncio.CancelledError:
+            # Cancelling the task has already aborted the provider stream and
+            # the tool tasks; free what they leave behind right away
+            cancelled = True
+            processes.kill_all()
+            if self.authorizer is not None:
+                self.authorizer.cancel_pending()
+            tracer.root.attributes["cancelled"] = True
+            # The turn still finishes normally (partial history, FINISH event)
+            task = asyncio.current_task()
+            if task is not None:
+                task.uncancel()
+
+        except Exception as e:
+            error = e
+            tracer.root.attributes["error"] = str(e)
+
+        if error is None:
+            history_span = tracer.start_span("history_update")
+            self._record_turn(tool_buffer, final_text, cancelled)
+            tracer.end_span(history_span, messages=len(self.history))
+            self.last_turn_usage = usage
+        else:
+            # The turn's tool results are not kept, so neither are its reads
+            self.reads.discard()
+
+        # The trace goes out before FINISH/ERROR so clients see it as part of the turn
+        tracer.root.attributes["streamed_tokens"] = streamed_tokens
+        tracer.finish()
+        summary = tracer.summary()
+        if self.emit_trace_events:
+            await self._emit_event(AgentEvent(
+                type=EventType.TRACE,
+                metadata={
+                    "trace_id": tracer.trace_id,
+                    "summary": summary,
+                    "spans": [s.to_dict() for s in tracer.spans]
+                }
+            ))
+
+        if error is not None:
+            await self._emit_event(AgentEvent(type=EventType.ERROR, content=str(error)))
+        else:
+            metadata: Dict[str, Any] = {"usage": usage} if usage else {}
+            if cancelled:
+                metadata["cancelled"] = True
+            await self._emit_event(AgentEvent(type=EventType.FINISH, metadata=metadata))
+
+        for exporter in self.span_exporters:
+            try:
+                exporter.export(tracer.spans, summary)
+            except Exception as e:
+                # Tracing is best-effort and must never break a turn
+                print(f"Span export failed: {e}")
 
-            # Update History
-            if tool_buffer:
-                tool_calls = []
-                for run_id, data in tool_buffer.items():
-                    tool_calls.append({
-                        "name": data["name"],
-                        "args": data["args"],
-                        "id": data["id"]
-                    })
-                
-                ai_msg_tools = AIMessage(content="", tool_calls=tool_calls)
-                self.history.append(ai_msg_tools)
-                
-                for run_id, data in tool_buffer.items():
-                    if data["output"] is not None:
-                        tool_msg = ToolMessage(
-                            content=data["output"],
-                            tool_call_id=data["id"]
-                        )
-                        self.history.append(tool_msg)
-
-            if final_text:
-                self.history.append(AIMessage(content=final_text))
+    def _record_turn(self, tool_buffer: Dict[str, Dict[str, Any]], final_text: str, cancelled: bool = False) -> None:
+        """
+        Appends the turn's tool calls, tool results and answer to the history.
+
+        On a cancelled turn, tool calls that never finished get a placeholder
+        result, so every tool call in the history keeps a matching ToolMessage.
+        The turn's file reads count as sent only if every tool result was kept.
+        """
+        unfinished = any(data["output"] is None for data in tool_buffer.values())
+        if unfinished:
+            self.reads.discard()
+        else:
+            self.reads.commit()
+
+        # tool_buffer is ordered by on_tool_start, which fires in the order
+        # AgentExecutor dispatches the calls (the model's order), so results
+        # keep their original order even when the tools finished out of order
+        if tool_buffer:
+            tool_calls = []
+            for run_id, data in tool_buffer.items():
+                tool_calls.append({
+                    "name": data["name"],
+                    "args": data["args"],
+                    "id": data["id"]
+                })
             
-            await self._emit_event(AgentEvent(type=EventType.FINISH))
+            ai_msg_tools = AIMessage(content="", tool_calls=tool_calls)
+            self.history.append(ai_msg_tools)
             
-        except Exception as e:
-            await self._emit_event(AgentEvent(type=EventType.ERROR, content=str(e)))
+            for run_id, data in tool_buffer.items():
+                output = data["output"]
+                if output is None and cancelled:
+                    output = "Error: Tool execution cancelled by user."
+                if output is not None:
+                    tool_msg = ToolMessage(
+                        content=output,
+                        tool_call_id=data["id"]
+                    )
+                    self.history.append(tool_msg)
+
+        if final_text:
+            self.history.append(AIMessage(content=final_text))
+
+    async def aclose(self) -> None:
+        """Releases the engine's resources (the persistent shell, pending background tasks)."""
+        if self._warm_up_task is not None and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+        if self._compaction_task is not None and not self._compaction_task.done():
+            self._compaction_task.cancel()
+            await asyncio.wait({self._compaction_task})
+        if self.shell is not None:
+            await self.shell.close()
+
+    def cancel(self) -> bool:
+        """
+        Cancels the in-flight turn, if any.
+
+        The provider stream is aborted, child processes started by tools are
+        killed and pending approvals are denied. The turn then ends with a
+        FINISH event (metadata "cancelled") and a partial, consistent history.
+
+        Returns:
+            bool: True if a running turn was cancelled.
+        """
+        task = self._turn_task
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
 
     async def stream(self, user_input: str, user_name: Optional[str] = None) -> AsyncGenerator[AgentEvent, None]:
         """
@@ -325,20 +672,114 @@ class AgentEngine:
         # Attach the name if provided
         self.history.append(HumanMessage(content=user_input, name=user_name))
 
-        # Start execution in background
-        task = asyncio.create_task(self._run_agent_executor(user_input, user_name))
-        
-        # Consume queue
-        while not task.done() or not self._event_queue.empty():
-            try:
-                event = await asyncio.wait_for(self._event_queue.get(), timeout=0.1)
+        # Start execution in background with a fresh channel for this turn
+        channel: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._run_turn(channel, user_input, user_name))
+        self._turn_task = task
+
+        # Consume the channel until the end-of-turn sentinel. get() parks the
+        # generator until an event is pushed, so an idle turn costs no wakeups.
+        try:
+            while True:
+                event = await channel.get()
+                if event is _END_OF_TURN:
+                    break
                 yield event
-            except asyncio.TimeoutError:
-                continue
-        
-        # Check for task crash
-        if task.done() and task.exception():
-            yield AgentEvent(type=EventType.ERROR, content=f"Engine Crash: {task.exception()}")
+        finally:
+            # Consumer went away early: don't leave the turn running unobserved
+            if not task.done():
+                task.cancel()
+
+        # Fold old turns into the summary off the critical path
+        self._schedule_compaction()
+
+    def _schedule_compaction(self) -> None:
+        """Starts a background compaction unless disabled or one is already running."""
+        if not self.profile.summarize_history:
+            return
+        if self._compaction_task is not None and not self._compaction_task.done():
+            return
+        self._compaction_task = asyncio.create_task(self._compact_history())
+
+    async def _compact_history(self) -> None:
+        """
+        Folds messages that no longer fit the history window into the rolling summary.
+
+        The summary is updated incrementally (previous summary + newly evicted
+        messages), stored as a SystemMessage right after the system prompt, and the
+        folded messages are removed from memory (and archived if archive_path is set).
+        """
+        try:
+            history = self.history
+            start = history.conversation_start()
+            conversation = history[start:]
+            window = history.window(
+                conversation,
+                max_tokens=self.profile.max_history_tokens,
+                max_messages=self.profile.max_messages,
+                low_watermark=WINDOW_LOW_WATERMARK
+            )
+            evicted = conversation[:len(conversation) - len(window)]
+            if not evicted:
+                return
 
+            from aigent.core.prompts import SUMMARY_SYSTEM_PROMPT
 
+            previous = history.summary()
+            previous_text = previous.content if previous is not None else "(empty)"
+            response = await self.llm.ainvoke([
+                SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+                HumanMessage(content=(
+                    f"Current summary:\n{previous_text}\n\n"
+                    f"New messages:\n{render_transcript(evicted)}"
+                ))
+            ])
+            summary_text = response.content if isinstance(response.content, str) else str(response.content)
+
+            # The history may have been reset or replaced while we were summarizing
+            current = history[start:start + len(evicted)]
+            if self.history is not history or len(current) != len(evicted) \
+                    or any(a is not b for a, b in zip(current, evicted)):
+                return
+
+            if self.archive_path is not None:
+                await self._archive_messages(evicted)
+
+            del history[start:start + len(evicted)]
+            # Evicted tool results may have carried file contents
+            self.reads.clear()
+            summary_msg = SystemMessage(content=summary_text, id=SUMMARY_MESSAGE_ID)
+            if previous is not None:
+                history[1] = summary_msg
+            else:
+                history.insert(1, summary_msg)
+
+            if self.on_compacted is not None:
+                await self.on_compacted()
+        except Exception as e:
+            # Compaction is best-effort; the window still bounds the prompt
+            print(f"History compaction failed: {e}")
 
+    async def _archive_messages(self, messages: List[BaseMessage]) -> None:
+        """Appends messages to the archive file as JSON lines."""
+        import json
+        import aiofiles
+        from langchain_core.messages import messages_to_dict
+
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        async with aiofiles.open(self.archive_path, mode="a") as f:
+            for data in messages_to_dict(messages):
+                await f.write(json.dumps(data) + "\n")
+
+    async def _run_turn(self, channel: asyncio.Queue, user_input: str, user_name: Optional[str]) -> None:
+        """
+        Runs one turn against its own event channel and always terminates the
+        channel, reporting unexpected crashes as an ERROR event first.
+        """
+        _TURN_CHANNEL.set(channel)
+        try:
+            await self._run_agent_executor(user_input, user_name)
+        except Exception as e:
+            channel.put_nowait(AgentEvent(type=EventType.ERROR, content=f"Engine Crash: {e}"))
+        finally:
+            channel.put_nowait(_END_OF_TURN)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Union
+from pydantic import Field, PrivateAttr
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Splits text into word-ish "tokens", keeping the trailing whitespace on each
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+_WORDS = (
+    "the agent reads files runs commands and reports results to the user while "
+    "keeping the history short and the prompt cache warm for the next turn"
+).split()
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic, offline chat model for benchmarks and tests.
+
+    Responses come from `script` in order (cycling when exhausted). Each entry is
+    either a string or a dict with optional "content" and "tool_calls"
+    ([{"name": ..., "args": {...}}]). Without a script, it generates
+    `generated_tokens` words of filler text.
+
+    Streaming is paced by `tokens_per_second` after a time-to-first-token drawn
+    from a normal distribution (`latency_ms` mean, `latency_jitter_ms` std dev)
+    seeded with `seed`, so runs are reproducible.
+
+    The script position and RNG belong to the instance; AgentEngine never shares
+    a fake model between sessions (see _UNSHARED_PROVIDERS).
+    """
+
+    model_name: str = "fake"
+    script: List[Union[str, Dict[str, Any]]] = Field(default_factory=list)
+    generated_tokens: int = 32
+    tokens_per_second: float = 0.0 # 0 = no pacing
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    seed: int = 0
+
+    _step: int = PrivateAttr(default=0)
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "aigent-fake"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        # Tools are only recorded; which tool to call is decided by the script
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    # --- Response selection ---
+
+    def _next_response(self) -> Dict[str, Any]:
+        """Returns the next scripted (or generated) response as a dict."""
+        if self.script:
+            entry = self.script[self._step % len(self.script)]
+            self._step += 1
+            if isinstance(entry, str):
+                return {"content": entry, "tool_calls": []}
+            return {"content": entry.get("content", ""), "tool_calls": entry.get("tool_calls", [])}
+
+        self._step += 1
+        words = [self._rng.choice(_WORDS) for _ in range(self.generated_tokens)]
+        return {"content": " ".join(words), "tool_calls": []}
+
+    def _first_token_delay(self) -> float:
+        delay_ms = self._rng.gauss(self.latency_ms, self.latency_jitter_ms) if self.latency_jitter_ms else self.latency_ms
+        return max(0.0, delay_ms) / 1000
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _chunks(self, response: Dict[str, Any]) -> List[AIMessageChunk]:
+        chunks = [AIMessageChunk(content=token) for token in _TOKEN_RE.findall(response["content"])]
+        if response["tool_calls"]:
+            chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+                {
+                    "name": call["name"],
+                    "args": json.dumps(call.get("args", {})),
+                    "id": call.get("id") or f"call_{uuid.uuid4().hex[:12]}",
+                    "index": idx,
+                }
+                for idx, call in enumerate(response["tool_calls"])
+            ]))
+        if not chunks:
+            chunks.append(AIMessageChunk(content=""))
+        return chunks
+
+    # --- BaseChatModel interface ---
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = self._next_response()
+        time.sleep(self._first_token_delay())
+        message = AIMessage(
+            content=response["content"],
+            tool_calls=[
+                {"name": c["name"], "args": c.get("args", {}), "id": c.get("id") or f"call_{uuid.uuid4().hex[:12]}"}
+                for c in response["tool_calls"]
+            ]
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = self._chunks(self._next_response())
+        time.sleep(self._first_token_delay())
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._chunks(self._next_response())
+        await asyncio.sleep(self._first_token_delay())
+        token_delay = self._token_delay()
+        for idx, chunk in enumerate(chunks):
+            if idx and token_delay:
+                await asyncio.sleep(token_delay)
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,324 @@
+import bisect
+import mmap
+import re
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+from aigent.core.schemas import FileCacheConfig
+
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD_BYTES = 1 << 20
+# Bytes inspected to decide whether a file is binary
+BINARY_SNIFF_BYTES = 8192
+# Most bytes a single fs_read returns; larger reads are paginated (fs_read also
+# keeps pages under the blob store's spill threshold, see tools._page_bytes)
+MAX_READ_BYTES = 256 * 1024
+# Line indexes kept in memory (LRU)
+LINE_INDEX_CACHE_SIZE = 64
+
+_NEWLINE = re.compile(b"\n")
+
+# (resolved path, mtime_ns, size, inode): changes whenever the file does
+FileKey = Tuple[str, int, int, int]
+
+def file_key(path: Path, stat: os.stat_result) -> FileKey:
+    return (str(path.resolve()), stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+class LineIndex:
+    """
+    Byte offsets of the start of every line of a file, so that line N can be
+    located in O(1) without scanning the file.
+    """
+
+    def __init__(self, data: Union[bytes, mmap.mmap], size: int):
+        self.size = size
+        # array('Q') stores offsets as 8-byte ints, far smaller than a list
+        self.starts = array("Q", [0] if size else [])
+        self.starts.extend(m.end() for m in _NEWLINE.finditer(data))
+        # A trailing newline does not start another line
+        if self.starts and self.starts[-1] == size:
+            self.starts.pop()
+
+    @property
+    def line_count(self) -> int:
+        return len(self.starts)
+
+    def span(self, first: int, count: int) -> Tuple[int, int]:
+        """
+        Byte range of `count` lines starting at 0-based line `first`.
+        count <= 0 means "to the end of the file".
+        """
+        start = self.starts[first] if first < len(self.starts) else self.size
+        last = first + count
+        end = self.starts[last] if 0 < count and last < len(self.starts) else self.size
+        return start, end
+
+_INDEX_CACHE: "OrderedDict[FileKey, LineIndex]" = OrderedDict()
+# fs_read runs in executor threads
+_INDEX_LOCK = threading.Lock()
+
+def get_line_index(key: FileKey, data: Union[bytes, mmap.mmap]) -> LineIndex:
+    """Returns the cached line index for this version of the file, building it on a miss."""
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(key)
+        if index is not None:
+            _INDEX_CACHE.move_to_end(key)
+            return index
+
+    index = LineIndex(data, key[2])
+    with _INDEX_LOCK:
+        _INDEX_CACHE[key] = index
+        while len(_INDEX_CACHE) > LINE_INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+    return index
+
+def clear_line_index_cache() -> None:
+    with _INDEX_LOCK:
+        _INDEX_CACHE.clear()
+
+class FileCache:
+    """
+    Contents of recently read files, shared by fs_read and fs_patch.
+
+    Entries are validated against the file's current FileKey on every lookup,
+    so a file changed by anything (an editor, bash_execute, git) is re-read.
+    Our own fs_write/fs_patch also invalidate explicitly, which covers writes
+    that land within the filesystem's timestamp granularity. Eviction is LRU
+    by total bytes. Files large enough to be memory-mapped are not cached;
+    the OS page cache already serves them.
+    """
+
+    def __init__(self, config: Optional[FileCacheConfig] = None):
+        self._entries: "OrderedDict[str, Tuple[FileKey, bytes]]" = OrderedDict()
+        self._bytes = 0
+        # fs_read runs in executor threads
+        self._lock = threading.Lock()
+        self.configure(config or FileCacheConfig())
+
+    def configure(self, config: FileCacheConfig) -> None:
+        self.config = config
+        with self._lock:
+            self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def _evict(self) -> None:
+        limit = self.config.max_bytes if self.config.enabled else 0
+        while self._entries and self._bytes > limit:
+            _, (_, data) = self._entries.popitem(last=False)
+            self._bytes -= len(data)
+
+    def read(self, path: Path, stat: Optional[os.stat_result] = None) -> Tuple[bytes, FileKey]:
+        """
+        Returns the file's bytes and FileKey, from the cache if the file is unchanged.
+
+        Args:
+            path: The file to read.
+            stat: The file's stat result, if the caller already has it.
+
+        Returns:
+            Tuple[bytes, FileKey]: The content and the version it belongs to.
+        """
+        stat = stat or path.stat()
+        key = file_key(path, stat)
+        name = key[0]
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(name)
+                return entry[1], key
+
+        data = path.read_bytes()
+        if len(data) != stat.st_size:
+            # Changed while we were reading: don't cache it, and describe what we got
+            after = path.stat()
+            return data, (name, after.st_mtime_ns, len(data), after.st_ino)
+
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            if self.config.enabled and len(data) <= self.config.max_bytes:
+                self._entries[name] = (key, data)
+                self._bytes += len(data)
+                self._evict()
+        return data, key
+
+    def invalidate(self, path: Path) -> None:
+        """Drops a file's cached content (called after we write to it)."""
+        with self._lock:
+            old = self._entries.pop(str(path.resolve()), None)
+            if old is not None:
+                self._bytes -= len(old[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+# Process-wide cache, configured from settings.file_cache by AgentEngine.initialize()
+FILE_CACHE = FileCache()
+
+class ReadTracker:
+    """
+    Remembers which file versions and ranges a session has already been sent,
+    so fs_read can answer "unchanged since last read" instead of resending them.
+
+    One tracker per engine. Reads made during a turn stay pending until the
+    turn's tool results are committed to the history (commit), and are
+    dropped if they never get there (discard, e.g. an errored turn). The
+    tracker is cleared whenever earlier tool results may have left the
+    conversation (history reset, windowing or compaction).
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, Set[Tuple[FileKey, int, int]]] = {}
+        # Reads of the running turn; its tool results are still in the scratchpad
+        self._pending: List[Tuple[FileKey, int, int]] = []
+
+    def seen(self, key: FileKey, start: int, end: int) -> bool:
+        return (key, start, end) in self._seen.get(key[0], ()) or (key, start, end) in self._pending
+
+    def record(self, key: FileKey, start: int, end: int) -> None:
+        self._pending.append((key, start, end))
+
+    def commit(self) -> None:
+        """Marks the pending reads as sent (their results are in the history now)."""
+        for key, start, end in self._pending:
+            versions = self._seen.setdefault(key[0], set())
+            # Older versions of the file are stale now
+            for old in [v for v in versions if v[0] != key]:
+                versions.discard(old)
+            versions.add((key, start, end))
+        self._pending.clear()
+
+    def discard(self) -> None:
+        """Drops the pending reads (their results never reached the history)."""
+        self._pending.clear()
+
+    def forget(self, path: Path) -> None:
+        """Drops every read of path (e.g. after writing it in place)."""
+        resolved = str(path.resolve())
+        self._seen.pop(resolved, None)
+        self._pending = [p for p in self._pending if p[0][0] != resolved]
+
+    def clear(self) -> None:
+        self._seen.clear()
+        self._pending.clear()
+
+# Read tracker of the engine running the current turn (see AgentEngine)
+CURRENT_READS: ContextVar[Optional[ReadTracker]] = ContextVar("aigent_current_reads", default=None)
+
+def is_binary(sample: bytes) -> bool:
+    """Heuristic used by git and grep: text files don't contain NUL bytes."""
+    return b"\0" in sample
+
+@dataclass
+class FileSlice:
+    """Part of a text file, with enough context to ask for the next part."""
+    text: str
+    size: int
+    line_count: Optional[int] # None for byte-range reads (no index needed)
+    first_line: int = 0 # 1-based, 0 if unknown
+    last_line: int = 0
+    start_byte: int = 0
+    end_byte: int = 0
+    key: Optional[FileKey] = None # The file version this slice was read from
+
+    @property
+    def complete(self) -> bool:
+        return self.start_byte == 0 and self.end_byte >= self.size
+
+class BinaryFileError(ValueError):
+    pass
+
+def read_slice(
+    path: Path,
+    offset: int = 1,
+    limit: int = 0,
+    byte_start: Optional[int] = None,
+    byte_end: Optional[int] = None,
+    max_bytes: int = MAX_READ_BYTES
+) -> FileSlice:
+    """
+    Reads lines (or a byte range) of a text file without loading all of it.
+
+    Files of MMAP_THRESHOLD_BYTES or more are memory-mapped, smaller ones come
+    from FILE_CACHE; line positions come from a LineIndex cached per FileKey. The result never
+    exceeds max_bytes; a line range that does is cut at a line boundary.
+
+    Args:
+        path: The file to read.
+        offset: 1-based line to start at.
+        limit: Number of lines to read. 0 reads to the end (subject to max_bytes).
+        byte_start: If given (or byte_end is), read this byte range instead of lines.
+        byte_end: End of the byte range (exclusive). Defaults to start + max_bytes.
+        max_bytes: Upper bound on the bytes returned.
+
+    Returns:
+        FileSlice: The decoded text and its position in the file.
+
+    Raises:
+        BinaryFileError: If the file looks binary.
+    """
+    stat = path.stat()
+    size = stat.st_size
+
+    if size >= MMAP_THRESHOLD_BYTES:
+        key = file_key(path, stat)
+        with open(path, "rb") as f:
+            data: Union[bytes, mmap.mmap] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        data, key = FILE_CACHE.read(path, stat)
+        size = len(data)
+
+    try:
+        if is_binary(data[:BINARY_SNIFF_BYTES]):
+            raise BinaryFileError(f"{path} appears to be a binary file ({size} bytes).")
+
+        if byte_start is not None or byte_end is not None:
+            start = min(max(0, byte_start or 0), size)
+            end = size if byte_end is None or byte_end < 0 else min(byte_end, size)
+            end = max(start, min(end, start + max_bytes))
+            return FileSlice(
+                text=data[start:end].decode("utf-8", errors="replace"),
+                size=size,
+                line_count=None,
+                start_byte=start,
+                end_byte=end,
+                key=key
+            )
+
+        index = get_line_index(key, data)
+        first = max(1, offset) - 1
+        start, end = index.span(first, limit)
+
+        if end - start > max_bytes:
+            # Cut at the last line start that fits (mid-line only for one huge line)
+            cut = start + max_bytes
+            fits = bisect.bisect_right(index.starts, cut, first + 1)
+            end = index.starts[fits - 1] if fits - 1 > first else cut
+
+        # Lines [first, last_line) start before `end`
+        last_line = bisect.bisect_left(index.starts, end, first)
+
+        return FileSlice(
+            text=data[start:end].decode("utf-8", errors="replace"),
+            size=size,
+            line_count=index.line_count,
+            first_line=first + 1 if end > start else 0,
+            last_line=last_line,
+            start_byte=start,
+            end_byte=end,
+            key=key
+        )
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
@@ -0,0 +1,201 @@
+import json
+from typing import Dict, Iterable, List, Optional, SupportsIndex
+from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Rough per-message overhead (role, separators) added by chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Message id of the rolling conversation summary kept right after the system prompt
+SUMMARY_MESSAGE_ID = "aigent-conversation-summary"
+
+# Tool output longer than this is clipped when rendered for summarization
+TRANSCRIPT_TOOL_OUTPUT_CHARS = 2000
+
+# Share of the history budget the engine's window is trimmed down to once it is
+# full, so that its start (and the cached prompt prefix) holds for several turns
+WINDOW_LOW_WATERMARK = 0.75
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """
+    Cheap, provider-agnostic token estimate for a message (~4 chars per token).
+
+    Tool call arguments count too, since providers send them back to the model.
+    """
+    content = message.content
+    text = content if isinstance(content, str) else json.dumps(content, default=str)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += json.dumps(message.tool_calls, default=str)
+    return MESSAGE_OVERHEAD_TOKENS + (len(text) + 3) // 4
+
+def is_summary(message: BaseMessage) -> bool:
+    """True if the message is the rolling conversation summary."""
+    return isinstance(message, SystemMessage) and message.id == SUMMARY_MESSAGE_ID
+
+def render_transcript(messages: List[BaseMessage]) -> str:
+    """Renders messages as a plain-text transcript for the summarizer."""
+    lines = []
+    for msg in messages:
+        content = msg.content if isinstance(msg.content, str) else json.dumps(msg.content, default=str)
+        if isinstance(msg, HumanMessage):
+            speaker = f"User ({msg.name})" if msg.name else "User"
+            lines.append(f"{speaker}: {content}")
+        elif isinstance(msg, AIMessage):
+            if content:
+                lines.append(f"Assistant: {content}")
+            for call in msg.tool_calls:
+                lines.append(f"Assistant called {call['name']}({json.dumps(call['args'], default=str)})")
+        elif isinstance(msg, ToolMessage):
+            if len(content) > TRANSCRIPT_TOOL_OUTPUT_CHARS:
+                content = content[:TRANSCRIPT_TOOL_OUTPUT_CHARS] + "... [truncated]"
+            lines.append(f"Tool result: {content}")
+    return "\n".join(lines)
+
+def _scale(limit: int, share: float) -> int:
+    """A budget scaled down to a share of itself (0 stays unlimited)."""
+    return max(1, int(limit * share)) if limit > 0 else 0
+
+class ChatHistory(list):
+    """
+    A list of messages that caches each message's token count when it is added.
+
+    Behaves exactly like a list (and serializes like one), but lets the engine
+    build a token-budgeted window without re-measuring the whole history every turn.
+    """
+
+    def __init__(self, messages: Iterable[BaseMessage] = ()):
+        super().__init__(messages)
+        # id(message) -> token count. Messages are held by the list itself,
+        # so ids stay valid while the message is part of the history.
+        self._token_counts: Dict[int, int] = {}
+        for msg in self:
+            self._count(msg)
+        # First message of the last sticky window (see window)
+        self._window_start: Optional[BaseMessage] = None
+
+    def _count(self, msg: BaseMessage) -> int:
+        count = estimate_tokens(msg)
+        self._token_counts[id(msg)] = count
+        return count
+
+    def append(self, msg: BaseMessage) -> None:
+        self._count(msg)
+        super().append(msg)
+
+    def extend(self, messages: Iterable[BaseMessage]) -> None:
+        messages = list(messages)
+        for msg in messages:
+            self._count(msg)
+        super().extend(messages)
+
+    def insert(self, index: SupportsIndex, msg: BaseMessage) -> None:
+        self._count(msg)
+        super().insert(index, msg)
+
+    def __iadd__(self, messages: Iterable[BaseMessage]) -> "ChatHistory":  # type: ignore[override]
+        self.extend(messages)
+        return self
+
+    def __setitem__(self, index, value) -> None:  # type: ignore[override]
+        if isinstance(index, slice):
+            value = list(value)
+            for msg in value:
+                self._count(msg)
+        else:
+            self._count(value)
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index) -> None:  # type: ignore[override]
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        for msg in removed:
+            self._token_counts.pop(id(msg), None)
+
+    def summary(self) -> Optional[SystemMessage]:
+        """Returns the rolling summary message, if the history has one."""
+        if len(self) > 1 and is_summary(self[1]):
+            return self[1]  # type: ignore[return-value]
+        return None
+
+    def conversation_start(self) -> int:
+        """Index of the first conversation message (after system prompt and summary)."""
+        return 2 if self.summary() is not None else 1
+
+    def token_count(self, msg: BaseMessage) -> int:
+        """Returns the cached token count of a message, measuring it if unknown."""
+        count = self._token_counts.get(id(msg))
+        if count is None:
+            count = self._count(msg)
+        return count
+
+    def window(
+        self,
+        messages: List[BaseMessage],
+        max_tokens: int,
+        max_messages: int = 0,
+        low_watermark: float = 1.0
+    ) -> List[BaseMessage]:
+        """
+        Selects the newest messages that fit within a token budget.
+
+        The window is filled from the newest message backwards and stops at the
+        first group that does not fit, so it is always a contiguous suffix. An
+        AIMessage with tool calls and its ToolMessages form one group and are
+        never split; ToolMessages whose AIMessage is missing are dropped.
+
+        With a low_watermark below 1 the window is sticky: it keeps starting at
+        the same message for as long as the messages from there fit, and once
+        they don't, it is trimmed down to that share of the budgets in one go.
+        A window that dropped one group per turn would change its start, and
+        with it the cached prompt prefix, on every turn.
+
+        Args:
+            messages: The messages to window (usually a slice of this history).
+            max_tokens: Token budget for the window. 0 disables the token limit.
+            max_messages: Message count cap. 0 disables the count limit.
+            low_watermark: Share of the budgets a full sticky window is trimmed to.
+
+        Returns:
+            List[BaseMessage]: The selected messages in their original order.
+        """
+        # Group messages into atomic units
+        groups: List[List[BaseMessage]] = []
+        for msg in messages:
+            if isinstance(msg, ToolMessage):
+                if groups and isinstance(groups[-1][0], AIMessage) and groups[-1][0].tool_calls:
+                    groups[-1].append(msg)
+                # Orphaned tool result: providers reject it, so leave it out
+                continue
+            groups.append([msg])
+
+        count = self._fitting(groups, max_tokens, max_messages)
+        if low_watermark < 1:
+            start = next((i for i, g in enumerate(groups) if g[0] is self._window_start), None)
+            if start is not None and start >= len(groups) - count:
+                # The window from the previous start still fits: keep it
+                count = len(groups) - start
+            elif count < len(groups):
+                low = self._fitting(
+                    groups,
+                    _scale(max_tokens, low_watermark),
+                    _scale(max_messages, low_watermark)
+                )
+                count = low or count
+            self._window_start = groups[-count][0] if count else None
+
+        return [msg for group in groups[len(groups) - count:] for msg in group]
+
+    def _fitting(self, groups: List[List[BaseMessage]], max_tokens: int, max_messages: int) -> int:
+        """Number of newest groups that fit within the budgets."""
+        count = 0
+        used_tokens = 0
+        used_messages = 0
+        for group in reversed(groups):
+            group_tokens = sum(self.token_count(m) for m in group)
+            if max_tokens > 0 and used_tokens + group_tokens > max_tokens:
+                break
+            if max_messages > 0 and used_messages + len(group) > max_messages:
+                break
+            count += 1
+            used_tokens += group_tokens
+            used_messages += len(group)
+        return count
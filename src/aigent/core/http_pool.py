@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import httpx
+from aigent.core.schemas import HttpPoolConfig
+
+@dataclass
+class PooledClients:
+    """Sync and async HTTP clients sharing one provider endpoint's settings."""
+    sync: httpx.Client
+    async_: httpx.AsyncClient
+    base_url: str
+    warmed_up: bool = False
+
+class HttpClientPool:
+    """
+    Process-wide HTTP clients for LLM providers.
+
+    Clients are keyed by (provider, base_url, credentials), so every engine talking
+    to the same endpoint with the same key reuses the same connection pool and its
+    warm (already TLS-negotiated) keep-alive connections.
+    """
+
+    def __init__(self, config: Optional[HttpPoolConfig] = None):
+        self.config = config or HttpPoolConfig()
+        self._clients: Dict[Tuple[str, str, str], PooledClients] = {}
+
+    def configure(self, config: HttpPoolConfig) -> None:
+        """Applies new limits. Only clients created afterwards are affected."""
+        self.config = config
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=self.config.max_keepalive_connections,
+            keepalive_expiry=self.config.keepalive_expiry
+        )
+
+    def get(self, provider: str, base_url: str, api_key: Optional[str]) -> PooledClients:
+        """Returns the shared clients for an endpoint, creating them on first use."""
+        # Never keep raw credentials around as dict keys
+        credentials = hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+        key = (str(provider), base_url, credentials)
+
+        clients = self._clients.get(key)
+        if clients is None:
+            clients = PooledClients(
+                sync=httpx.Client(limits=self._limits()),
+                async_=httpx.AsyncClient(limits=self._limits()),
+                base_url=base_url
+            )
+            self._clients[key] = clients
+        return clients
+
+    async def warm_up(self, provider: Optional[str] = None, timeout: float = 5.0) -> None:
+        """
+        Opens a connection (TCP + TLS) for every client that hasn't been used yet,
+        so the first model request of a new session doesn't pay for it.
+        Any HTTP response (even 401/404) leaves a reusable keep-alive connection.
+
+        Args:
+            provider: Only warm up this provider's clients (default: all).
+            timeout: Seconds to wait for each connection.
+        """
+        pending = [
+            c for key, c in self._clients.items()
+            if not c.warmed_up and (provider is None or key[0] == str(provider))
+        ]
+        for clients in pending:
+            clients.warmed_up = True
+
+        async def _touch(clients: PooledClients) -> None:
+            try:
+                await clients.async_.head(clients.base_url, timeout=timeout)
+            except Exception:
+                # Best-effort: the real request will simply connect itself
+                pass
+
+        await asyncio.gather(*[_touch(c) for c in pending])
+
+    async def aclose(self) -> None:
+        """Closes every pooled client."""
+        for clients in self._clients.values():
+            clients.sync.close()
+            await clients.async_.aclose()
+        self._clients.clear()
+
+# Shared by every provider factory in the process
+HTTP_POOL = HttpClientPool()
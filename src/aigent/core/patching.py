@@ -0,0 +1,285 @@
+import bisect
+import difflib
+import mmap
+import os
+import re
+import stat as stat_module
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+from aigent.core import files
+from aigent.core.files import FILE_CACHE, LineIndex, file_key, get_line_index
+from aigent.core.workspace import WORKSPACE
+
+# Unchanged lines shown around each change in the returned diff
+DIFF_CONTEXT_LINES = 3
+# Bytes copied per write when streaming the untouched parts of a file
+COPY_CHUNK_BYTES = 1 << 20
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@")
+
+@dataclass
+class TextEdit:
+    """One find-and-replace: the first match of target in lines start_line..end_line."""
+    target: str
+    replacement: str
+    start_line: int = 1 # 1-based
+    end_line: int = -1 # 1-based, inclusive; -1 means end of file
+
+class PatchError(ValueError):
+    pass
+
+# (start byte, end byte, replacement bytes) of one located edit
+Span = Tuple[int, int, bytes]
+
+def _newline(data: Union[bytes, mmap.mmap]) -> bytes:
+    """The file's line ending, judged by its first line."""
+    idx = data.find(b"\n")
+    return b"\r\n" if idx > 0 and data[idx - 1:idx] == b"\r" else b"\n"
+
+def _encode(text: str, newline: bytes) -> bytes:
+    if newline == b"\r\n":
+        # Edits are written with \n; keep a CRLF file CRLF
+        text = text.replace("\r\n", "\n").replace("\n", "\r\n")
+    return text.encode("utf-8")
+
+def locate(
+    data: Union[bytes, mmap.mmap],
+    index: LineIndex,
+    edit: TextEdit,
+    newline: bytes,
+    label: str = "the file",
+    taken: Sequence[Span] = ()
+) -> Span:
+    """
+    Finds an edit's target within its line range (label names the file in errors).
+
+    Matches overlapping a span in `taken` (earlier edits to the same file) are
+    skipped, so several edits with the same target replace successive matches.
+
+    Raises:
+        PatchError: If the target is not found.
+    """
+    first = max(1, edit.start_line) - 1
+    pos = -1
+    if edit.end_line == -1 or edit.end_line > first:
+        count = 0 if edit.end_line == -1 else edit.end_line - first
+        seg_start, seg_end = index.span(first, count)
+        target = _encode(edit.target, newline)
+        pos = data.find(target, seg_start, seg_end)
+        while pos >= 0:
+            blocker = next((t for t in taken if pos < t[1] and t[0] < pos + max(1, len(target))), None)
+            if blocker is None:
+                break
+            pos = data.find(target, max(pos + 1, blocker[1]), seg_end)
+    if pos < 0:
+        raise PatchError(
+            f"Target text not found in lines {edit.start_line}-{edit.end_line} of {label}. "
+            "Please ensure exact match (whitespace matters)."
+        )
+    return pos, pos + len(target), _encode(edit.replacement, newline)
+
+def _line_of(index: LineIndex, pos: int) -> int:
+    """0-based line containing byte pos."""
+    return max(0, bisect.bisect_right(index.starts, pos) - 1)
+
+def _line_start(index: LineIndex, line: int) -> int:
+    return index.starts[line] if line < index.line_count else index.size
+
+def render_diff(data: Union[bytes, mmap.mmap], index: LineIndex, spans: List[Span], context: int = DIFF_CONTEXT_LINES) -> List[str]:
+    """
+    Unified diff hunks (without file headers) for sorted, non-overlapping spans.
+
+    Only the changed lines and their context are decoded and compared, so the
+    cost depends on the size of the edits, not of the file.
+    """
+    # Line range (0-based, inclusive) each span touches, widened by the context
+    regions: List[List] = []
+    last_line = max(0, index.line_count - 1)
+    for start, end, replacement in spans:
+        first = max(0, _line_of(index, start) - context)
+        # The line holding `end` is touched too: when the target ends with a
+        # newline, the replacement joins onto (or ends right before) that line
+        last = min(last_line, _line_of(index, end) + context)
+        if regions and first <= regions[-1][1] + 1:
+            # Contexts touch: one hunk
+            regions[-1][1] = max(regions[-1][1], last)
+            regions[-1][2].append((start, end, replacement))
+        else:
+            regions.append([first, last, [(start, end, replacement)]])
+
+    lines: List[str] = []
+    shift = 0 # Lines added (or removed) by earlier hunks
+    for first, last, region_spans in regions:
+        region_start = _line_start(index, first)
+        region_end = _line_start(index, last + 1)
+        old = bytes(data[region_start:region_end])
+        new = bytearray()
+        cursor = region_start
+        for start, end, replacement in region_spans:
+            new += data[cursor:start]
+            new += replacement
+            cursor = end
+        new += data[cursor:region_end]
+
+        old_lines = old.decode("utf-8", errors="replace").splitlines()
+        new_lines = bytes(new).decode("utf-8", errors="replace").splitlines()
+        for line in difflib.unified_diff(old_lines, new_lines, n=context, lineterm=""):
+            if line.startswith(("---", "+++")):
+                continue
+            match = _HUNK_RE.match(line)
+            if match:
+                # Move the hunk header from region-relative to file line numbers
+                old_start = int(match.group(1)) + first
+                new_start = int(match.group(3)) + first + shift
+                line = f"@@ -{old_start}{match.group(2) or ''} +{new_start}{match.group(4) or ''} @@"
+            lines.append(line)
+        shift += len(new_lines) - len(old_lines)
+    return lines
+
+def _write_temp(path: Path, data: Union[bytes, mmap.mmap], spans: List[Span]) -> str:
+    """
+    Writes data with the spans replaced to a temp file next to path.
+
+    The untouched parts are copied in chunks straight from data (an mmap for
+    large files), so the new content is never held in memory as a whole.
+    The temp file gets the original's permission bits.
+    """
+    real = path.resolve()
+    mode = stat_module.S_IMODE(real.stat().st_mode)
+    fd, tmp = tempfile.mkstemp(dir=real.parent, prefix=f".{real.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            def copy(start: int, end: int) -> None:
+                while start < end:
+                    stop = min(end, start + COPY_CHUNK_BYTES)
+                    f.write(data[start:stop])
+                    start = stop
+
+            cursor = 0
+            for start, end, replacement in spans:
+                copy(cursor, start)
+                f.write(replacement)
+                cursor = end
+            copy(cursor, len(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return tmp
+
+def write_atomic(path: Path, data: Union[bytes, mmap.mmap], spans: List[Span]) -> None:
+    """
+    Writes data with the spans replaced, through a temp file and os.replace,
+    so a crash leaves the old file intact.
+    """
+    tmp = _write_temp(path, data, spans)
+    try:
+        os.replace(tmp, path.resolve())
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+def _load(path: Path) -> Tuple[Union[bytes, mmap.mmap], LineIndex]:
+    """File content (memory-mapped if large) and its line index."""
+    stat = path.stat()
+    if stat.st_size >= files.MMAP_THRESHOLD_BYTES:
+        key = file_key(path, stat)
+        with open(path, "rb") as f:
+            data: Union[bytes, mmap.mmap] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        data, key = FILE_CACHE.read(path, stat)
+    return data, get_line_index(key, data)
+
+def patch_file(path: Path, edit: TextEdit) -> List[str]:
+    """
+    Applies one edit to a file and returns the diff of the change.
+
+    Args:
+        path: The file to modify.
+        edit: What to replace, and where to look for it.
+
+    Returns:
+        List[str]: Unified diff hunk lines; empty if the edit changed nothing.
+
+    Raises:
+        PatchError: If the target is not found.
+    """
+    data, index = _load(path)
+    try:
+        span = locate(data, index, edit, _newline(data), str(path))
+        start, end, replacement = span
+        if data[start:end] == replacement:
+            return []
+        diff = render_diff(data, index, [span])
+        write_atomic(path, data, [span])
+        FILE_CACHE.invalidate(path)
+        WORKSPACE.notify(path)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+    return diff
+
+def patch_files(edits: List[Tuple[Path, TextEdit]]) -> Dict[Path, List[str]]:
+    """
+    Applies edits across one or more files: all or nothing.
+
+    Every target is located (in each file's original content) before anything
+    is written; if any is missing, no file changes. Each file is then read and
+    written once, whatever the number of edits to it, and the new versions are
+    moved into place only after all of them were written successfully.
+
+    Args:
+        edits: (path, edit) pairs, applied in order per file.
+
+    Returns:
+        Dict[Path, List[str]]: Diff hunk lines per changed file, in first-edit order.
+
+    Raises:
+        PatchError: Listing every edit whose target was not found.
+    """
+    grouped: Dict[Path, List[Tuple[int, TextEdit]]] = {}
+    for number, (path, edit) in enumerate(edits, start=1):
+        grouped.setdefault(path.resolve(), []).append((number, edit))
+
+    loaded: Dict[Path, Tuple[Union[bytes, mmap.mmap], LineIndex, List[Span]]] = {}
+    temps: Dict[Path, str] = {}
+    try:
+        # 1. Locate every edit
+        errors: List[str] = []
+        for path, file_edits in grouped.items():
+            data, index = _load(path)
+            newline = _newline(data)
+            spans: List[Span] = []
+            for number, edit in file_edits:
+                try:
+                    spans.append(locate(data, index, edit, newline, str(path), spans))
+                except PatchError as e:
+                    errors.append(f"Edit {number}: {e}")
+            loaded[path] = (data, index, sorted(spans, key=lambda s: s[0]))
+        if errors:
+            raise PatchError("No files were changed.\n" + "\n".join(errors))
+
+        # 2. Write each changed file once, then move them all into place
+        diffs: Dict[Path, List[str]] = {}
+        for path, (data, index, spans) in loaded.items():
+            spans = [s for s in spans if data[s[0]:s[1]] != s[2]]
+            if not spans:
+                continue
+            diffs[path] = render_diff(data, index, spans)
+            temps[path] = _write_temp(path, data, spans)
+        for path, tmp in list(temps.items()):
+            os.replace(tmp, path)
+            del temps[path]
+            FILE_CACHE.invalidate(path)
+            WORKSPACE.notify(path)
+        return diffs
+    finally:
+        for tmp in temps.values():
+            Path(tmp).unlink(missing_ok=True)
+        for data, _, _ in loaded.values():
+            if isinstance(data, mmap.mmap):
+                data.close()
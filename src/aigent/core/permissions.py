@@ -86,12 +86,36 @@ class Authorizer:
         # Pending Requests: request_id -> Future
         self.pending_requests: Dict[str, asyncio.Future] = {}
 
+        # Serializes interactive approvals when tool calls run concurrently,
+        # so the user is asked one question at a time
+        self._approval_lock = asyncio.Lock()
+
     async def check(self, tool_name: str, input_args: Dict[str, Any]) -> bool:
         """
         Determines if a tool call is allowed.
         Returns True if allowed, False if denied (after prompting user).
         """
         # 1. Check Session Allowlist (Fast Path)
+        if self._is_allowlisted(tool_name, input_args):
+            return True
+
+        # 2. Check Policy
+        policy = self.schema.tools.get(tool_name, self.schema.default_policy)
+        
+        if policy == PermissionPolicy.ALLOW:
+            return True
+        elif policy == PermissionPolicy.DENY:
+            return False
+        
+        # 3. Ask User (Policy == ASK), one request at a time
+        async with self._approval_lock:
+            # An "always" decision for an earlier call may now cover this one
+            if self._is_allowlisted(tool_name, input_args):
+                return True
+            return await self._request_approval(tool_name, input_args)
+
+    def _is_allowlisted(self, tool_name: str, input_args: Dict[str, Any]) -> bool:
+        """Checks the session allowlist (exact, tool-level and smart signatures)."""
         # We check exact match and tool-level match
         exact_sig = AuthorizationStrategy.default(tool_name, input_args)
         tool_sig = AuthorizationStrategy.tool_only(tool_name, input_args)
@@ -105,16 +129,7 @@ class Authorizer:
             if cmd_sig and cmd_sig in self.allowlist:
                 return True
 
-        # 2. Check Policy
-        policy = self.schema.tools.get(tool_name, self.schema.default_policy)
-        
-        if policy == PermissionPolicy.ALLOW:
-            return True
-        elif policy == PermissionPolicy.DENY:
-            return False
-        
-        # 3. Ask User (Policy == ASK)
-        return await self._request_approval(tool_name, input_args)
+        return False
 
     async def _request_approval(self, tool_name: str, input_args: Dict[str, Any]) -> bool:
         request_id = str(uuid.uuid4())
@@ -169,6 +184,18 @@ class Authorizer:
             if request_id in self.pending_requests:
                 del self.pending_requests[request_id]
 
+    def cancel_pending(self) -> int:
+        """
+        Denies every approval still waiting for the user (e.g. when the turn is
+        cancelled). Returns the number of requests resolved.
+        """
+        resolved = 0
+        for future in list(self.pending_requests.values()):
+            if not future.done():
+                future.set_result({"decision": "deny"})
+                resolved += 1
+        return resolved
+
     def resolve_request(self, request_id: str, decision_data: Dict[str, Any]):
         if request_id in self.pending_requests:
             future = self.pending_requests[request_id]
@@ -0,0 +1,58 @@
+import os
+import signal
+import threading
+from contextvars import ContextVar
+from typing import Any, Optional, Set
+
+class ProcessRegistry:
+    """
+    Child processes started by tools during a turn, so that cancelling the turn
+    can kill them instead of waiting for them to finish or time out.
+
+    Processes should be started in their own session (start_new_session=True),
+    so the whole process group (the shell and everything it spawned) is killed.
+    Works with both subprocess.Popen and asyncio subprocesses.
+    """
+
+    def __init__(self):
+        self._processes: Set[Any] = set()
+        # Sync tools register from executor threads
+        self._lock = threading.Lock()
+
+    def add(self, process: Any) -> None:
+        with self._lock:
+            self._processes.add(process)
+
+    def discard(self, process: Any) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+    def __len__(self) -> int:
+        return len(self._processes)
+
+    def kill_all(self) -> int:
+        """Kills every registered process (group). Returns the number of processes signalled."""
+        with self._lock:
+            processes = list(self._processes)
+            self._processes.clear()
+
+        killed = 0
+        for process in processes:
+            if kill_process_tree(process):
+                killed += 1
+        return killed
+
+def kill_process_tree(process: Any) -> bool:
+    """Kills a process and, on POSIX, its process group. Returns False if it was already gone."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+# Processes of the turn running in the current context. Context variables are
+# copied into the executor threads sync tools run in, so tools can register here.
+CURRENT_PROCESSES: ContextVar[Optional[ProcessRegistry]] = ContextVar("aigent_current_processes", default=None)
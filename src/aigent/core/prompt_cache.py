@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Optional
+from langchain_core.messages import BaseMessage, SystemMessage
+from aigent.core.schemas import ModelProvider
+
+# Anthropic cache breakpoint: everything up to and including the marked block is cached
+CACHE_CONTROL = {"type": "ephemeral"}
+
+def _uses_cache_breakpoints(provider: str) -> bool:
+    # OpenAI (and Grok) cache the longest shared prefix automatically, so only the
+    # message ordering matters there; Anthropic needs explicit breakpoints
+    return provider == ModelProvider.ANTHROPIC
+
+def build_system_message(
+    system_text: str,
+    summary_text: Optional[str],
+    provider: str,
+    enabled: bool
+) -> SystemMessage:
+    """
+    Builds the system message sent to the model.
+
+    The static system prompt always comes first and the (changing) conversation
+    summary after it, so the stable part forms a cacheable prefix. With caching
+    enabled on Anthropic, the static part carries a cache breakpoint.
+    """
+    summary_block = None
+    if summary_text:
+        summary_block = f"--- Summary of Earlier Conversation ---\n{summary_text}\n"
+
+    if not (enabled and _uses_cache_breakpoints(provider)) or not system_text:
+        content = system_text
+        if summary_block:
+            content += "\n" + summary_block
+        return SystemMessage(content=content)
+
+    blocks: List[Any] = [{"type": "text", "text": system_text, "cache_control": CACHE_CONTROL}]
+    if summary_block:
+        blocks.append({"type": "text", "text": summary_block})
+    return SystemMessage(content=blocks)
+
+def mark_history_prefix(messages: List[BaseMessage], provider: str, enabled: bool) -> List[BaseMessage]:
+    """
+    Adds a cache breakpoint at the end of the history prefix (the messages before
+    the new user input), so the next turn re-reads it from cache.
+
+    The stored messages are never modified; the marked message is a copy.
+    """
+    if not (enabled and _uses_cache_breakpoints(provider)):
+        return messages
+
+    # Mark the newest message that has text to attach the breakpoint to
+    # (Anthropic rejects empty text blocks, e.g. a tool-call-only AIMessage)
+    for idx in range(len(messages) - 1, -1, -1):
+        content = messages[idx].content
+        if isinstance(content, str) and content:
+            marked = messages[idx].model_copy(update={
+                "content": [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+            })
+            return messages[:idx] + [marked] + messages[idx + 1:]
+    return messages
+
+def extract_usage(message: Any) -> Dict[str, int]:
+    """
+    Reads token usage (including prompt cache reads/writes) from a model response.
+    Returns an empty dict if the provider reported none.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens") or 0,
+        "output_tokens": usage.get("output_tokens") or 0,
+        "cache_read_tokens": details.get("cache_read") or 0,
+        "cache_creation_tokens": details.get("cache_creation") or 0,
+    }
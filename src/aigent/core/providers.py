@@ -0,0 +1,118 @@
+import os
+from typing import Callable, Dict
+from langchain_core.language_models import BaseChatModel
+from aigent.core.schemas import UserProfile, ModelProvider
+from aigent.core.http_pool import HTTP_POOL
+
+# Factory building a chat model for a profile. Each factory imports its provider
+# SDK itself, so only the SDK of the selected provider is ever loaded.
+ProviderFactory = Callable[[UserProfile], BaseChatModel]
+
+# Registry: provider -> factory
+PROVIDERS: Dict[str, ProviderFactory] = {}
+
+# Providers whose factories take their clients from HTTP_POOL when the model is
+# built, so HTTP_POOL.warm_up() can open their connection ahead of the first
+# turn. Anthropic's clients are only created on the first request, Gemini talks
+# gRPC and the fake provider has no connection: there is nothing to warm up.
+WARMABLE_PROVIDERS = {ModelProvider.OPENAI, ModelProvider.GROK}
+
+def register_provider(provider: str) -> Callable[[ProviderFactory], ProviderFactory]:
+    """Decorator registering a chat model factory for a provider."""
+    def decorator(factory: ProviderFactory) -> ProviderFactory:
+        PROVIDERS[provider] = factory
+        return factory
+    return decorator
+
+def create_chat_model(profile: UserProfile) -> BaseChatModel:
+    """
+    Instantiates the LangChain chat model for a profile's provider.
+
+    Raises:
+        ValueError: If no factory is registered for the provider.
+    """
+    factory = PROVIDERS.get(profile.model_provider)
+    if factory is None:
+        raise ValueError(f"Unsupported provider: {profile.model_provider}")
+    return factory(profile)
+
+@register_provider(ModelProvider.OPENAI)
+def _openai(profile: UserProfile) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+    base_url = os.getenv("OPENAI_API_BASE") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+    clients = HTTP_POOL.get(ModelProvider.OPENAI, base_url, os.getenv("OPENAI_API_KEY"))
+    return ChatOpenAI(
+        model=profile.model_name,
+        temperature=profile.temperature,
+        base_url=base_url,
+        # Report usage (incl. cached prompt tokens) on streamed responses
+        stream_usage=True,
+        http_client=clients.sync,
+        http_async_client=clients.async_
+    )
+
+@register_provider(ModelProvider.ANTHROPIC)
+def _anthropic(profile: UserProfile) -> BaseChatModel:
+    from functools import cached_property
+    import anthropic
+    from langchain_anthropic import ChatAnthropic
+
+    class PooledChatAnthropic(ChatAnthropic):
+        # ChatAnthropic has no http_client option, so hand the SDK clients the
+        # pooled httpx clients directly
+        @cached_property
+        def _client(self) -> anthropic.Client:
+            return anthropic.Client(**self._client_params, http_client=self._pooled.sync)
+
+        @cached_property
+        def _async_client(self) -> anthropic.AsyncClient:
+            return anthropic.AsyncClient(**self._client_params, http_client=self._pooled.async_)
+
+        @cached_property
+        def _pooled(self):
+            return HTTP_POOL.get(
+                ModelProvider.ANTHROPIC,
+                self.anthropic_api_url or "https://api.anthropic.com",
+                self.anthropic_api_key.get_secret_value()
+            )
+
+    return PooledChatAnthropic(
+        model=profile.model_name,
+        temperature=profile.temperature
+    )
+
+@register_provider(ModelProvider.GOOGLE)
+def _google(profile: UserProfile) -> BaseChatModel:
+    # The Gemini SDK talks gRPC rather than httpx, so it isn't pooled here; its
+    # channel is still shared through the engine's per-profile model cache.
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=profile.model_name,
+        temperature=profile.temperature,
+        convert_system_message_to_human=True # Sometimes needed for older Gemini models, safe to keep
+    )
+
+@register_provider(ModelProvider.GROK)
+def _grok(profile: UserProfile) -> BaseChatModel:
+    # Grok uses the OpenAI SDK format
+    from langchain_openai import ChatOpenAI
+    api_key = os.getenv("XAI_API_KEY")
+    if not api_key:
+        raise ValueError("XAI_API_KEY not found in environment")
+
+    base_url = "https://api.x.ai/v1"
+    clients = HTTP_POOL.get(ModelProvider.GROK, base_url, api_key)
+    return ChatOpenAI(
+        model=profile.model_name,
+        base_url=base_url,
+        api_key=api_key,
+        temperature=profile.temperature,
+        http_client=clients.sync,
+        http_async_client=clients.async_
+    )
+
+@register_provider(ModelProvider.FAKE)
+def _fake(profile: UserProfile) -> BaseChatModel:
+    # Offline stand-in: scripted/generated responses, see FakeChatModel for options
+    from aigent.core.fake_model import FakeChatModel
+    return FakeChatModel(model_name=profile.model_name, **profile.provider_options)
@@ -0,0 +1,335 @@
+import ast
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.schemas import RepoMapConfig
+from aigent.core.search import list_files
+from aigent.core.walk import compile_glob
+from aigent.core.workspace import WORKSPACE
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the stored symbol format changes
+INDEX_VERSION = 1
+# Below this many stale files, parsing in-process beats starting workers
+PARALLEL_THRESHOLD = 64
+# Longest docstring summary kept per symbol
+MAX_DOC_CHARS = 120
+
+def module_name(rel_path: str) -> str:
+    """Dotted module name of a source file (src/ layouts drop the src prefix)."""
+    parts = rel_path[:-3].split("/") if rel_path.endswith(".py") else rel_path.split("/")
+    if parts and parts[0] == "src" and len(parts) > 1:
+        parts = parts[1:]
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts = parts[:-1]
+    return ".".join(parts)
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+def _doc(node: ast.AST) -> str:
+    doc = ast.get_docstring(node) or ""
+    first = doc.strip().split("\n", 1)[0] if doc.strip() else ""
+    return first[:MAX_DOC_CHARS]
+
+def parse_symbols(abs_path: str) -> List[Dict[str, Any]]:
+    """
+    Top-level classes and functions of a Python file, and the methods of its classes.
+
+    Runs in worker processes, so it takes and returns plain values. A file
+    that doesn't parse yields no symbols.
+    """
+    try:
+        with open(abs_path, "rb") as f:
+            tree = ast.parse(f.read(), filename=abs_path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    symbols: List[Dict[str, Any]] = []
+    function_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            symbols.append({"name": node.name, "kind": "class", "signature": _signature(node), "line": node.lineno, "doc": _doc(node)})
+            for item in node.body:
+                if isinstance(item, function_types):
+                    symbols.append({
+                        "name": f"{node.name}.{item.name}",
+                        "kind": "method",
+                        "signature": _signature(item),
+                        "line": item.lineno,
+                        "doc": _doc(item)
+                    })
+        elif isinstance(node, function_types):
+            symbols.append({"name": node.name, "kind": "function", "signature": _signature(node), "line": node.lineno, "doc": _doc(node)})
+    return symbols
+
+class RepoMap:
+    """
+    Symbols (classes, functions, methods with signatures) of the Python files
+    below one root, persisted as JSON under the cache directory.
+
+    refresh() lists the files (through the workspace index when there is one)
+    and re-parses only those whose (mtime, size) changed; many changed files
+    are parsed with ast in a process pool. With a workspace index, the listing
+    itself is skipped while the index reports no changes. Lookups and the
+    compact map are served from memory.
+    """
+
+    def __init__(self, root: str, config: RepoMapConfig):
+        self.root = root
+        self.base = os.path.realpath(os.path.expanduser(root))
+        self.config = config
+        digest = hashlib.sha256(self.base.encode()).hexdigest()[:16]
+        self.cache_path = Path(config.cache_dir).expanduser() / f"{digest}.json"
+        # rel path -> {"mtime_ns", "size", "module", "symbols"}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # (workspace index, its generation) as of the last refresh
+        self._index_state: Optional[Tuple[Any, int]] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("root") == self.base:
+            self.files = data.get("files", {})
+
+    def _save(self) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": INDEX_VERSION, "root": self.base, "files": self.files}, f)
+            os.replace(tmp, self.cache_path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def refresh(self) -> int:
+        """
+        Brings the map up to date with the files on disk.
+
+        Returns:
+            int: The number of files (re-)parsed.
+        """
+        with self._lock:
+            # Read before listing, so a change made meanwhile is seen next time
+            found = WORKSPACE.lookup(self.base)
+            index_state = (found[0], found[0].generation) if found is not None and not found[1] else None
+            if index_state is not None and index_state == self._index_state:
+                return 0
+
+            current = {}
+            for entry in list_files(self.base, compile_glob(self.config.include)):
+                current[entry.rel_path] = entry
+
+            stale = [
+                entry for rel, entry in current.items()
+                if (self.files.get(rel) or {}).get("mtime_ns") != entry.mtime_ns
+                or self.files[rel].get("size") != entry.size
+            ]
+            removed = [rel for rel in self.files if rel not in current]
+            self._index_state = index_state
+            if not stale and not removed:
+                return 0
+
+            paths = [entry.abs_path for entry in stale]
+            if len(paths) >= PARALLEL_THRESHOLD:
+                workers = self.config.workers or None
+                # forkserver: workers don't inherit this (threaded) process via fork
+                context = multiprocessing.get_context("forkserver")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    results = list(pool.map(parse_symbols, paths, chunksize=16))
+            else:
+                results = [parse_symbols(path) for path in paths]
+
+            for rel in removed:
+                del self.files[rel]
+            for entry, symbols in zip(stale, results):
+                self.files[entry.rel_path] = {
+                    "mtime_ns": entry.mtime_ns,
+                    "size": entry.size,
+                    "module": module_name(entry.rel_path),
+                    "symbols": symbols
+                }
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning("Could not save the repository map for %s: %s", self.root, e)
+            return len(stale)
+
+    def _snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """The files as of now; a refresh on another thread may change self.files."""
+        with self._lock:
+            return dict(self.files)
+
+    def matches(
+        self,
+        name: str,
+        kind: Optional[str] = None,
+        prefix: str = ""
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Symbols named name: exact matches (the name, the qualified Class.method
+        name or module.name) and case-insensitive substring matches.
+
+        Args:
+            name: The name to look for.
+            kind: Only "class", "function" or "method" symbols.
+            prefix: Only files below this directory (relative to the root).
+        """
+        needle = name.strip()
+        lowered = needle.lower()
+        exact: List[Dict[str, Any]] = []
+        partial: List[Dict[str, Any]] = []
+        files = self._snapshot()
+        for rel in sorted(files):
+            if prefix and not rel.startswith(prefix + "/"):
+                continue
+            info = files[rel]
+            for symbol in info["symbols"]:
+                if kind and symbol["kind"] != kind:
+                    continue
+                qualified = symbol["name"]
+                short = qualified.rsplit(".", 1)[-1]
+                if needle in (qualified, short, f"{info['module']}.{qualified}"):
+                    target = exact
+                elif lowered in qualified.lower():
+                    target = partial
+                else:
+                    continue
+                target.append({
+                    **symbol,
+                    "path": str(Path(self.root) / rel),
+                    "module": info["module"]
+                })
+        return exact, partial
+
+    def lookup(self, name: str, kind: Optional[str] = None, limit: int = 20, prefix: str = "") -> List[Dict[str, Any]]:
+        """Finds symbols by name: exact matches first, then partial ones (see matches)."""
+        exact, partial = self.matches(name, kind, prefix)
+        return (exact + partial)[:limit]
+
+    def render(self, max_chars: int, prefix: str = "") -> str:
+        """Compact map: one line per module, class and function, cut at max_chars."""
+        lines: List[str] = []
+        size = 0
+        files = self._snapshot()
+        for rel in sorted(files):
+            if prefix and not rel.startswith(prefix + "/"):
+                continue
+            symbols = files[rel]["symbols"]
+            if not symbols:
+                continue
+            block = [f"{Path(self.root) / rel}:"]
+            for symbol in symbols:
+                indent = "    " if symbol["kind"] == "method" else "  "
+                block.append(f"{indent}{symbol['signature']}")
+            text = "\n".join(block)
+            if size + len(text) + 1 > max_chars:
+                lines.append("  ... (map truncated; use code_lookup)")
+                break
+            lines.append(text)
+            size += len(text) + 1
+        return "\n".join(lines)
+
+class RepoMapIndex:
+    """
+    The repository maps of the allowed roots (settings.repo_map).
+
+    There is one map per allowed root. A query for a directory inside a root is
+    answered from that root's map, filtered by path, rather than by a map of its own.
+    """
+
+    def __init__(self):
+        self.config = RepoMapConfig()
+        self._maps: Dict[str, RepoMap] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config: RepoMapConfig) -> None:
+        with self._lock:
+            if config != self.config:
+                self._maps.clear()
+            self.config = config
+
+    def get(self, root: str) -> RepoMap:
+        base = os.path.realpath(os.path.expanduser(root))
+        with self._lock:
+            repo_map = self._maps.get(base)
+            if repo_map is None:
+                repo_map = self._maps[base] = RepoMap(root, self.config)
+            return repo_map
+
+    def _targets(self, paths: List[str]) -> List[Tuple[RepoMap, str]]:
+        """
+        (map, prefix) per path: the map of the outermost allowed root containing
+        it and the path relative to that root. Paths covered twice are merged.
+        """
+        roots = [(os.path.realpath(os.path.expanduser(d)), d) for d in ALLOWED_ROOTS.current_dirs()]
+        targets: Dict[str, Tuple[str, List[str]]] = {}
+        for path in paths:
+            real = os.path.realpath(os.path.expanduser(path))
+            containing = [
+                (base, root) for base, root in roots
+                if real == base or real.startswith(base.rstrip("/") + "/")
+            ]
+            # Outside every root (not expected after validation): a map of its own
+            base, root = min(containing, key=lambda r: len(r[0])) if containing else (real, path)
+            prefix = "" if real == base else os.path.relpath(real, base)
+            prefixes = targets.setdefault(base, (root, []))[1]
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+
+        result = []
+        for root, prefixes in targets.values():
+            repo_map = self.get(root)
+            for prefix in [""] if "" in prefixes else prefixes:
+                result.append((repo_map, prefix))
+        return result
+
+    def lookup(self, paths: List[str], name: str, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Symbols named name below the paths: exact matches (across all paths) first, then partial ones."""
+        exact: List[Dict[str, Any]] = []
+        partial: List[Dict[str, Any]] = []
+        refreshed = set()
+        for repo_map, prefix in self._targets(paths):
+            if id(repo_map) not in refreshed:
+                repo_map.refresh()
+                refreshed.add(id(repo_map))
+            found_exact, found_partial = repo_map.matches(name, kind, prefix)
+            exact.extend(found_exact)
+            partial.extend(found_partial)
+        return (exact + partial)[:limit]
+
+    def render(self, paths: List[str], max_chars: Optional[int] = None) -> str:
+        budget = max_chars or self.config.prompt_max_chars
+        parts = []
+        for repo_map, prefix in self._targets(paths):
+            repo_map.refresh()
+            text = repo_map.render(budget, prefix)
+            if text:
+                parts.append(text)
+                budget -= len(text)
+            if budget <= 0:
+                break
+        return "\n".join(parts)
+
+# Process-wide maps, configured from settings.repo_map by AgentEngine.initialize()
+REPO_MAP = RepoMapIndex()
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from aigent.core.profiles import ProfileManager, get_config_path
+
+# How often (at most) the settings file is checked for changes
+RELOAD_CHECK_SECONDS = 1.0
+
+# (path, mtime_ns, size) of the settings file; None if it doesn't exist
+ConfigKey = Optional[Tuple[str, int, int]]
+
+def _config_key(path: Path) -> ConfigKey:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+class RootTrie:
+    """
+    Prefix tree over the path components of the allowed roots.
+
+    A lookup walks the components of the target path once, so its cost depends
+    on the depth of the path, not on the number of roots.
+    """
+
+    def __init__(self, roots: List[Path]):
+        self._root: Dict[str, dict] = {}
+        for root in roots:
+            node = self._root
+            for part in root.parts:
+                node = node.setdefault(part, {})
+            # A root allows everything below it; deeper roots add nothing
+            node.clear()
+            node[""] = {}
+
+    def contains(self, path: Path) -> bool:
+        node = self._root
+        if "" in node:
+            return True
+        for part in path.parts:
+            node = node.get(part)
+            if node is None:
+                return False
+            if "" in node:
+                return True
+        return False
+
+class AllowedRoots:
+    """
+    The resolved allowed_work_dirs, shared by every file tool.
+
+    Roots are resolved (expanduser + realpath) once when the configuration is
+    loaded, not on every check. Targets are checked by their fully resolved
+    path, so a symlink inside a root that points outside of it is rejected.
+
+    The settings file is watched (checked at most every RELOAD_CHECK_SECONDS),
+    and the roots are rebuilt when it changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.dirs: List[str] = []
+        self._trie: Optional[RootTrie] = None
+        self._watch: Optional[Path] = None
+        self._watch_key: ConfigKey = None
+        self._checked_at = 0.0
+
+    def configure(self, dirs: List[str], watch: Optional[Path] = None) -> None:
+        """
+        Sets the allowed directories.
+
+        Args:
+            dirs: The allowed_work_dirs setting. An empty list means the current directory.
+            watch: Settings file to reload the directories from when it changes.
+        """
+        dirs = list(dirs) or ["."]
+        trie = RootTrie([Path(d).expanduser().resolve() for d in dirs])
+        with self._lock:
+            self.dirs = dirs
+            self._trie = trie
+            self._watch = watch
+            self._watch_key = _config_key(watch) if watch else None
+            self._checked_at = time.monotonic()
+
+    def reset(self) -> None:
+        """Forgets the configuration; the next check loads it from the settings file."""
+        with self._lock:
+            self._trie = None
+            self._watch = None
+
+    def _load(self) -> None:
+        pm = ProfileManager(get_config_path())
+        pm.load_profiles()
+        self.configure(pm.config.allowed_work_dirs, watch=pm.config_path)
+
+    def _refresh(self) -> None:
+        if self._trie is None:
+            self._load()
+            return
+        if self._watch is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        if get_config_path() != self._watch or _config_key(self._watch) != self._watch_key:
+            self._load()
+
+    def current_dirs(self) -> List[str]:
+        """The configured directories (reloading them if the settings changed)."""
+        self._refresh()
+        return list(self.dirs)
+
+    def check(self, path: Path) -> Tuple[bool, List[str]]:
+        """
+        Whether path lies within an allowed root.
+
+        Returns:
+            Tuple[bool, List[str]]: The verdict and the configured directories (for messages).
+        """
+        self._refresh()
+        trie, dirs = self._trie, self.dirs
+        return trie.contains(Path(os.path.realpath(path))), dirs
+
+# Process-wide roots, configured from settings.allowed_work_dirs by AgentEngine.initialize()
+ALLOWED_ROOTS = AllowedRoots()
@@ -14,6 +14,10 @@ class EventType(StrEnum):
     # New events for authorization
     APPROVAL_REQUEST = "approval_request"
     APPROVAL_RESPONSE = "approval_response"
+    # Per-turn timing spans, emitted right before FINISH (see TurnTracer)
+    TRACE = "trace"
+    # Incremental tool output (e.g. bash_execute stdout/stderr) while a tool runs
+    TOOL_OUTPUT = "tool_output"
 
 class PermissionPolicy(StrEnum):
     ALLOW = "allow"
@@ -38,11 +42,23 @@ class AgentEvent(BaseModel):
     def to_json(self) -> str:
         return self.model_dump_json()
 
+class FileEdit(BaseModel):
+    """
+    One edit of a fs_multi_patch call.
+    """
+    path: str
+    target: str # Exact text to replace (first match in the line range)
+    replacement: str
+    start_line: int = 1
+    end_line: int = -1 # -1 means end of file
+
 class ModelProvider(StrEnum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic"
     GOOGLE = "google"
     GROK = "grok"
+    # Offline, deterministic model for tests and benchmarks (see FakeChatModel)
+    FAKE = "fake"
 
 class UserProfile(BaseModel):
     """
@@ -58,22 +74,131 @@ class UserProfile(BaseModel):
     base_prompt: str = "standard" # Presets: standard, minimal, none
     
     # Context Management
+    # History sent to the model is the newest messages that fit in this token
+    # budget (0 = unlimited). max_messages additionally caps the count (0 = unlimited).
+    max_history_tokens: int = 32000
     max_messages: int = 50 # Rolling window size
+    # Fold messages that fall out of the window into a rolling summary
+    # (in the background after each turn) instead of silently dropping them.
+    summarize_history: bool = False
     
     context_files: List[str] = Field(default_factory=list)
     
     model_provider: ModelProvider = ModelProvider.OPENAI
     model_name: str = "gpt-4o"
     temperature: float = 0.7
+    # Extra provider-specific settings (e.g. the script and pacing of the fake provider)
+    provider_options: Dict[str, Any] = Field(default_factory=dict)
     allowed_tools: List[str] = Field(default_factory=lambda: ["*"])
     # Link to a permission schema
     permission_schema: str = "default"
+    # Mark the system prompt and stable history prefix for provider prompt caching
+    # (Anthropic cache breakpoints; OpenAI caches the stable prefix automatically)
+    prompt_caching: bool = False
+    # Max tool calls from one model response executed concurrently (1 = sequential)
+    max_parallel_tools: int = 4
     
 class ServerConfig(BaseModel):
     host: str = "127.0.0.1"
     port: int = 8000
     static_dir: str = "static"
 
+class TokenBatchingConfig(BaseModel):
+    """
+    Coalescing of streamed TOKEN events into micro-batches before fan-out.
+    Opt-in for both the CLI and the server.
+    """
+    enabled: bool = False
+    min_delay_ms: float = 16
+    max_delay_ms: float = 50
+    max_chars: int = 2048
+
+class HttpPoolConfig(BaseModel):
+    """
+    Limits of the process-wide HTTP client pool shared by LLM provider clients.
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0 # Seconds an idle connection is kept open
+    # Open a connection to the provider during initialize(), before the first turn
+    # (OpenAI-compatible providers only; see providers.WARMABLE_PROVIDERS)
+    warm_up: bool = False
+
+class BashConfig(BaseModel):
+    """
+    Limits of the bash_execute tool.
+    """
+    timeout: float = 30.0 # Seconds before the command's process group is killed (0 = none)
+    max_output_bytes: int = 65536 # Per stream; beyond this only head and tail are kept
+    # Stream stdout/stderr to clients as TOOL_OUTPUT events while the command runs
+    stream_output: bool = True
+    # Run commands in one long-lived shell per engine, so cd/export/venvs persist
+    persistent_shell: bool = True
+    shell: str = "/bin/bash"
+    # Seconds a persistent shell may sit unused before it is stopped (0 = never);
+    # the next command starts a new one
+    idle_timeout: float = 600.0
+
+class BlobStoreConfig(BaseModel):
+    """
+    Spilling of oversized tool outputs to a content-addressed blob store.
+    """
+    enabled: bool = True
+    dir: str = "~/.aigent/blobs"
+    # Outputs longer than this (in characters) are stored and replaced by a preview
+    threshold_chars: int = 16000
+    preview_chars: int = 2000
+
+class FileCacheConfig(BaseModel):
+    """
+    In-memory cache of file contents read by fs_read and fs_patch.
+    """
+    enabled: bool = True
+    max_bytes: int = 64 * 1024 * 1024 # Total cached content; least recently used files go first
+    # Answer re-reads of an unchanged file range with a short note instead of the content
+    report_unchanged: bool = True
+
+class SearchConfig(BaseModel):
+    """
+    Limits of the fs_search and fs_glob tools.
+    """
+    max_results: int = 200 # Upper bound on matches (or files) returned per call
+    max_file_bytes: int = 10 * 1024 * 1024 # Larger files are skipped by fs_search
+    workers: int = 8 # Threads searching file contents
+
+class WorkspaceIndexConfig(BaseModel):
+    """
+    Background index of the allowed roots (paths, sizes, mtimes, content trigrams)
+    used by fs_search and fs_glob instead of walking the tree.
+    """
+    enabled: bool = False # Costs memory proportional to the workspace; meant for large repos
+    watch: bool = True # Follow changes with inotify where available, else poll
+    poll_interval: float = 5.0 # Seconds between re-walks when polling
+    max_indexed_file_bytes: int = 1024 * 1024 # Larger files are listed but not content-indexed
+
+class RepoMapConfig(BaseModel):
+    """
+    Repository map: classes, functions and signatures of the Python files in
+    the allowed roots, for the code_lookup tool and the system prompt.
+    """
+    cache_dir: str = "~/.aigent/repomap" # Persisted maps, one JSON file per root
+    include: str = "*.py" # Files parsed (glob)
+    workers: int = 0 # Parser processes for large refreshes (0 = one per CPU)
+    # Append a compact map of the workspace to the system prompt
+    inject_into_prompt: bool = False
+    prompt_max_chars: int = 4000
+
+class TracingConfig(BaseModel):
+    """
+    Per-turn tracing spans (LLM calls, first token, tools, authorization, history).
+    """
+    # Emit a TRACE event with the spans at the end of every turn
+    emit_events: bool = True
+    # If set, every turn is appended to this file as an OTLP/JSON line
+    otlp_file: Optional[str] = None
+    # Number of recent turns kept per session for /api/sessions/{id}/timings
+    keep_recent: int = 20
+
 class AgentConfig(BaseModel):
     """
     Global application configuration.
@@ -84,6 +209,33 @@ class AgentConfig(BaseModel):
     
     # Server Configuration
     server: ServerConfig = Field(default_factory=ServerConfig)
+
+    # Provider HTTP connection pooling (see HttpClientPool)
+    http_pool: HttpPoolConfig = Field(default_factory=HttpPoolConfig)
+
+    # Streaming: batch TOKEN events (see TokenCoalescer)
+    token_batching: TokenBatchingConfig = Field(default_factory=TokenBatchingConfig)
+
+    # Tools: bash_execute limits (see aigent.core.shell)
+    bash: BashConfig = Field(default_factory=BashConfig)
+
+    # Tools: oversized outputs go to the blob store (see BlobStore)
+    blobs: BlobStoreConfig = Field(default_factory=BlobStoreConfig)
+
+    # Tools: cached file reads (see FileCache)
+    file_cache: FileCacheConfig = Field(default_factory=FileCacheConfig)
+
+    # Tools: fs_search / fs_glob limits (see aigent.core.search)
+    search: SearchConfig = Field(default_factory=SearchConfig)
+
+    # Tools: background workspace index (see WorkspaceIndexer)
+    workspace_index: WorkspaceIndexConfig = Field(default_factory=WorkspaceIndexConfig)
+
+    # Tools: code_lookup and the prompt's repository map (see RepoMap)
+    repo_map: RepoMapConfig = Field(default_factory=RepoMapConfig)
+
+    # Observability: per-turn latency spans (see TurnTracer)
+    tracing: TracingConfig = Field(default_factory=TracingConfig)
     
     # Security: Path Restrictions
     # List of allowed root directories for file operations.
@@ -0,0 +1,213 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Pattern
+from aigent.core.files import BINARY_SNIFF_BYTES, is_binary
+from aigent.core.walk import FileEntry, compile_glob, walk_files
+from aigent.core.workspace import WORKSPACE, required_literals
+from aigent.core.schemas import SearchConfig
+
+# Longest line text returned per match
+MAX_LINE_CHARS = 300
+# Files searched per task submitted to the thread pool
+FILES_PER_TASK = 32
+
+# Process-wide search settings (settings.search), set by configure_search()
+_SETTINGS = SearchConfig()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def configure_search(config: SearchConfig) -> None:
+    """Applies settings.search to fs_search and fs_glob."""
+    global _SETTINGS, _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None and config.workers != _SETTINGS.workers:
+            _EXECUTOR.shutdown(wait=False)
+            _EXECUTOR = None
+        _SETTINGS = config
+
+def get_search_settings() -> SearchConfig:
+    return _SETTINGS
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=_SETTINGS.workers, thread_name_prefix="aigent-search")
+        return _EXECUTOR
+
+def list_files(
+    root: str,
+    path_filter: Optional[Pattern] = None,
+    literals: Optional[List[bytes]] = None
+) -> Iterator[FileEntry]:
+    """Files below root: from the workspace index when one is ready, else by walking."""
+    found = WORKSPACE.lookup(root)
+    if found is None:
+        yield from walk_files(root, path_filter)
+        return
+    index, prefix = found
+    yield from index.entries(root, prefix, path_filter, literals)
+
+@dataclass
+class Match:
+    path: str
+    line: int # 1-based
+    column: int # 1-based
+    text: str
+
+def _search_file(entry: FileEntry, regex: Pattern, limit: int, max_file_bytes: int) -> List[Match]:
+    """Matches of regex in one file (first per line), or [] for binary and oversized files."""
+    if entry.size > max_file_bytes:
+        return []
+    try:
+        with open(entry.abs_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    if is_binary(data[:BINARY_SNIFF_BYTES]):
+        return []
+
+    text = data.decode("utf-8", errors="replace")
+    matches: List[Match] = []
+    line_no = 1
+    counted = 0 # Position up to which newlines were counted
+    last_line = 0
+    for m in regex.finditer(text):
+        line_no += text.count("\n", counted, m.start())
+        counted = m.start()
+        if line_no == last_line:
+            continue
+        last_line = line_no
+        line_start = text.rfind("\n", 0, m.start()) + 1
+        line_end = text.find("\n", m.start())
+        line = text[line_start:line_end if line_end >= 0 else len(text)].rstrip("\r")
+        matches.append(Match(
+            path=entry.path,
+            line=line_no,
+            column=m.start() - line_start + 1,
+            text=line[:MAX_LINE_CHARS]
+        ))
+        if len(matches) >= limit:
+            break
+    return matches
+
+def search(
+    roots: List[str],
+    pattern: str,
+    glob: Optional[str] = None,
+    ignore_case: bool = False,
+    max_results: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Searches file contents below the roots for a regular expression.
+
+    Files are listed by the workspace index (narrowed by the pattern's literal
+    parts) or by walk_files, and searched in batches on a thread pool.
+    Results keep walk order, and the search stops once max_results is reached.
+
+    Args:
+        roots: Directories to search.
+        pattern: Python regular expression.
+        glob: Optional file filter (e.g. "*.py", "src/**/test_*.py").
+        ignore_case: Match case-insensitively.
+        max_results: Cap on matches returned (defaults to settings.search.max_results).
+
+    Returns:
+        Dict[str, Any]: {"matches": [{path, line, column, text}], "files_searched", "truncated"}.
+
+    Raises:
+        re.error: If the pattern is not a valid regular expression.
+    """
+    settings = get_search_settings()
+    limit = max(1, min(max_results or settings.max_results, settings.max_results))
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    path_filter = compile_glob(glob) if glob else None
+
+    matches: List[Match] = []
+    files_searched = 0
+    truncated = False
+    executor = _executor()
+
+    # With a workspace index, only files that can contain these are read
+    literals = required_literals(pattern, ignore_case)
+
+    def batches() -> Iterator[List[FileEntry]]:
+        batch: List[FileEntry] = []
+        for root in roots:
+            for entry in list_files(root, path_filter, literals):
+                batch.append(entry)
+                if len(batch) >= FILES_PER_TASK:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    # One match past the cap tells whether the results were truncated
+    wanted = limit + 1
+
+    def search_batch(batch: List[FileEntry]) -> List[Match]:
+        found: List[Match] = []
+        for entry in batch:
+            found.extend(_search_file(entry, regex, wanted, settings.max_file_bytes))
+            if len(found) >= wanted:
+                break
+        return found
+
+    # Keep a bounded number of batches in flight so an early stop stops the walk too
+    in_flight = []
+    source = batches()
+    exhausted = False
+    while True:
+        while not exhausted and len(in_flight) < settings.workers * 2:
+            batch = next(source, None)
+            if batch is None:
+                exhausted = True
+                break
+            in_flight.append((len(batch), executor.submit(search_batch, batch)))
+        if not in_flight:
+            break
+        count, future = in_flight.pop(0)
+        files_searched += count
+        matches.extend(future.result())
+        if len(matches) >= wanted:
+            truncated = True
+            for _, pending in in_flight:
+                pending.cancel()
+            break
+
+    return {
+        "matches": [asdict(m) for m in matches[:limit]],
+        "files_searched": files_searched,
+        "truncated": truncated
+    }
+
+def glob_files(roots: List[str], pattern: str, max_results: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lists files below the roots whose relative path matches a glob.
+
+    Args:
+        roots: Directories to search.
+        pattern: Glob such as "*.py" (any depth) or "src/**/models/*.py".
+        max_results: Cap on files returned (defaults to settings.search.max_results).
+
+    Returns:
+        Dict[str, Any]: {"files": [{path, size}], "truncated"}.
+    """
+    settings = get_search_settings()
+    limit = max(1, min(max_results or settings.max_results, settings.max_results))
+    path_filter = compile_glob(pattern)
+
+    found: List[Dict[str, Any]] = []
+    truncated = False
+    for root in roots:
+        for entry in list_files(root, path_filter):
+            if len(found) >= limit:
+                truncated = True
+                break
+            found.append({"path": entry.path, "size": entry.size})
+        if truncated:
+            break
+    return {"files": found, "truncated": truncated}
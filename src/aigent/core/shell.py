@@ -0,0 +1,384 @@
+import asyncio
+import codecs
+import os
+import shlex
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+from aigent.core.schemas import BashConfig
+from aigent.core.processes import CURRENT_PROCESSES, kill_process_tree
+
+# Bytes read from a pipe per chunk (and the granularity of TOOL_OUTPUT events)
+READ_CHUNK_BYTES = 4096
+
+# Called with (stream name, decoded chunk) while the command runs
+OutputCallback = Callable[[str, str], Awaitable[None]]
+
+# Process-wide bash_execute settings (settings.bash), set by configure_shell()
+_SETTINGS = BashConfig()
+
+def configure_shell(config: BashConfig) -> None:
+    """Applies settings.bash to bash_execute."""
+    global _SETTINGS
+    _SETTINGS = config
+
+def get_shell_settings() -> BashConfig:
+    return _SETTINGS
+
+class OutputBuffer:
+    """
+    Collects a stream's output up to max_bytes, keeping the head and the tail.
+
+    Bytes beyond the limit are dropped from the middle: the first half of the
+    budget is kept as the head, and the tail is a rolling window over the last
+    half, so memory stays bounded no matter how much the command prints.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, max_bytes)
+        self.head_limit = self.max_bytes // 2
+        self.tail_limit = self.max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def write(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    @property
+    def truncated_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.truncated_bytes:
+            return head + tail
+        return f"{head}\n... [{self.truncated_bytes} bytes truncated] ...\n{tail}"
+
+@dataclass
+class CommandResult:
+    stdout: str
+    stderr: str
+    returncode: Optional[int]
+    timed_out: bool = False
+    # Persistent shells only: the shell ended during the command (e.g. `exit`)
+    shell_exited: bool = False
+
+async def _pump(
+    stream: asyncio.StreamReader,
+    name: str,
+    buffer: OutputBuffer,
+    on_output: Optional[OutputCallback]
+) -> None:
+    """Reads a pipe to EOF into the buffer, forwarding decoded chunks to on_output."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = await stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer.write(chunk)
+        if on_output is not None:
+            text = decoder.decode(chunk)
+            if text:
+                await on_output(name, text)
+    if on_output is not None:
+        rest = decoder.decode(b"", final=True)
+        if rest:
+            await on_output(name, rest)
+
+async def run_command(
+    command: str,
+    timeout: float,
+    max_output_bytes: int,
+    on_output: Optional[OutputCallback] = None
+) -> CommandResult:
+    """
+    Runs a shell command as an asyncio subprocess and streams its output.
+
+    The command runs in its own process group, which is killed as a whole on
+    timeout or when the calling task is cancelled. The process is also registered
+    with the current turn's ProcessRegistry (see aigent.core.processes).
+
+    Args:
+        command: The shell command line.
+        timeout: Seconds before the process group is killed. 0 disables the timeout.
+        max_output_bytes: Per-stream output cap; head and tail are kept beyond it.
+        on_output: Optional coroutine called with (stream name, text) per chunk.
+
+    Returns:
+        CommandResult: The (possibly truncated) output and exit status.
+    """
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    registry = CURRENT_PROCESSES.get()
+    if registry is not None:
+        registry.add(process)
+
+    stdout = OutputBuffer(max_output_bytes)
+    stderr = OutputBuffer(max_output_bytes)
+    pumps = asyncio.gather(
+        _pump(process.stdout, "stdout", stdout, on_output),
+        _pump(process.stderr, "stderr", stderr, on_output),
+        process.wait()
+    )
+    timed_out = False
+    try:
+        await asyncio.wait_for(pumps, timeout=timeout or None)
+    except asyncio.TimeoutError:
+        timed_out = True
+        kill_process_tree(process)
+        await process.wait()
+    except BaseException:
+        # Cancelled (or the callback failed): don't leave the command running
+        kill_process_tree(process)
+        raise
+    finally:
+        if registry is not None:
+            registry.discard(process)
+
+    return CommandResult(
+        stdout=stdout.text(),
+        stderr=stderr.text(),
+        returncode=process.returncode,
+        timed_out=timed_out
+    )
+
+# Shell session of the turn running in the current context (see AgentEngine)
+CURRENT_SHELL: ContextVar[Optional["ShellSession"]] = ContextVar("aigent_current_shell", default=None)
+
+class ShellSession:
+    """
+    A long-lived shell that runs bash_execute commands one after another.
+
+    State such as the working directory, exported variables and activated
+    virtualenvs carries over between commands, and no shell is spawned per call.
+    Each command is sent as `eval '<command>' </dev/null` followed by a unique
+    marker on stdout (carrying the exit code) and stderr, which frames its
+    output on the shared pipes. Quoting the command for eval means a syntax
+    error in it cannot break the framing.
+
+    On timeout or cancellation the shell's process group is killed; the next
+    command starts a fresh shell. So is a shell left unused for idle_timeout
+    seconds.
+
+    The shell's working directory is its own: a `cd` moves later commands, but
+    not the agent process, so the fs_* tools keep resolving relative paths
+    against the directory the agent was started in.
+    """
+
+    def __init__(self, shell: str = "/bin/bash", cwd: Optional[str] = None, idle_timeout: float = 0.0):
+        self.shell = shell
+        self.cwd = cwd
+        self.idle_timeout = idle_timeout
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._last_used = 0.0
+        self._idle_timer: Optional[asyncio.TimerHandle] = None
+        self._idle_task: Optional[asyncio.Task] = None
+        # Commands share one shell, so they run one at a time
+        self._lock = asyncio.Lock()
+        # Bytes read past a marker (e.g. from a background job), kept for the next command
+        self._pending = {"stdout": bytearray(), "stderr": bytearray()}
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def _start(self) -> None:
+        self._process = await asyncio.create_subprocess_exec(
+            self.shell,
+            *(["--noprofile", "--norc"] if os.path.basename(self.shell) == "bash" else []),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            start_new_session=True
+        )
+        self._pending = {"stdout": bytearray(), "stderr": bytearray()}
+
+    async def _kill(self) -> None:
+        process, self._process = self._process, None
+        if process is not None:
+            kill_process_tree(process)
+            await process.wait()
+
+    async def _read_until(
+        self,
+        stream: asyncio.StreamReader,
+        name: str,
+        marker: bytes,
+        buffer: OutputBuffer,
+        on_output: Optional[OutputCallback]
+    ) -> Optional[bytearray]:
+        """
+        Reads command output up to the marker into the buffer (forwarding it to
+        on_output). Returns the bytes after the marker, or None if the shell exited.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        async def emit(data: bytes) -> None:
+            if not data:
+                return
+            buffer.write(data)
+            if on_output is not None:
+                text = decoder.decode(data)
+                if text:
+                    await on_output(name, text)
+
+        data = self._pending[name]
+        self._pending[name] = bytearray()
+        # A partial marker may sit at the end of the data; never forward it
+        keep = len(marker) - 1
+        while True:
+            idx = data.find(marker)
+            if idx >= 0:
+                await emit(bytes(data[:idx]))
+                return data[idx + len(marker):]
+            if len(data) > keep:
+                await emit(bytes(data[:len(data) - keep]))
+                del data[:len(data) - keep]
+            chunk = await stream.read(READ_CHUNK_BYTES)
+            if not chunk:
+                await emit(bytes(data))
+                return None
+            data += chunk
+
+    async def _read_exit_code(self, stream: asyncio.StreamReader, rest: bytearray) -> Optional[int]:
+        """Reads the ' <code>\\n' that follows the stdout marker."""
+        while b"\n" not in rest:
+            chunk = await stream.read(READ_CHUNK_BYTES)
+            if not chunk:
+                return None
+            rest += chunk
+        line, _, after = rest.partition(b"\n")
+        self._pending["stdout"] = bytearray(after)
+        try:
+            return int(line.strip())
+        except ValueError:
+            return None
+
+    async def run(
+        self,
+        command: str,
+        timeout: float,
+        max_output_bytes: int,
+        on_output: Optional[OutputCallback] = None
+    ) -> CommandResult:
+        """
+        Runs a command in the session and returns its output and exit code.
+
+        Args:
+            command: The shell command line.
+            timeout: Seconds before the shell is killed. 0 disables the timeout.
+            max_output_bytes: Per-stream output cap; head and tail are kept beyond it.
+            on_output: Optional coroutine called with (stream name, text) per chunk.
+
+        Returns:
+            CommandResult: The (possibly truncated) output and exit status.
+        """
+        async with self._lock:
+            if not self.alive:
+                await self._start()
+            process = self._process
+
+            token = f"__AIGENT_DONE_{uuid.uuid4().hex}__"
+            script = (
+                f"eval {shlex.quote(command)} </dev/null\n"
+                f"printf '%s %d\\n' '{token}' \"$?\"\n"
+                f"printf '%s' '{token}' >&2\n"
+            )
+            marker = token.encode()
+
+            registry = CURRENT_PROCESSES.get()
+            if registry is not None:
+                registry.add(process)
+
+            stdout = OutputBuffer(max_output_bytes)
+            stderr = OutputBuffer(max_output_bytes)
+
+            async def communicate() -> Optional[int]:
+                process.stdin.write(script.encode())
+                await process.stdin.drain()
+                out_rest, err_rest = await asyncio.gather(
+                    self._read_until(process.stdout, "stdout", marker, stdout, on_output),
+                    self._read_until(process.stderr, "stderr", marker, stderr, on_output)
+                )
+                if err_rest is not None:
+                    self._pending["stderr"] = err_rest
+                if out_rest is None:
+                    return None
+                return await self._read_exit_code(process.stdout, out_rest)
+
+            timed_out = False
+            returncode: Optional[int] = None
+            try:
+                returncode = await asyncio.wait_for(communicate(), timeout=timeout or None)
+            except asyncio.TimeoutError:
+                timed_out = True
+                await self._kill()
+            except (BrokenPipeError, ConnectionResetError):
+                # The shell died before the command could be sent
+                await self._kill()
+            except BaseException:
+                # Cancelled: the command may still be running in the shell
+                await self._kill()
+                raise
+            finally:
+                if registry is not None:
+                    registry.discard(process)
+
+            exited = not timed_out and returncode is None
+            if exited:
+                # The command ended the shell itself (e.g. `exit`)
+                await self._kill()
+
+            self._schedule_idle_close()
+            return CommandResult(
+                stdout=stdout.text(),
+                stderr=stderr.text(),
+                returncode=returncode,
+                timed_out=timed_out,
+                shell_exited=exited
+            )
+
+    def _schedule_idle_close(self) -> None:
+        """(Re)arms the timer that stops the shell after idle_timeout seconds unused."""
+        self._last_used = time.monotonic()
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self.idle_timeout > 0 and self.alive:
+            self._idle_timer = asyncio.get_running_loop().call_later(self.idle_timeout, self._on_idle)
+
+    def _on_idle(self) -> None:
+        self._idle_timer = None
+        self._idle_task = asyncio.create_task(self._close_if_idle())
+
+    async def _close_if_idle(self) -> None:
+        async with self._lock:
+            # A command may have run while this task waited for the lock
+            if time.monotonic() - self._last_used >= self.idle_timeout:
+                await self._kill()
+
+    async def close(self) -> None:
+        """Terminates the shell (and anything it started)."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        async with self._lock:
+            await self._kill()
@@ -1,10 +1,19 @@
 from langchain_core.tools import tool
-import subprocess
+from langchain_core.callbacks import adispatch_custom_event
+import json
 import os
+import re
 from pathlib import Path
-import difflib
-from typing import Optional
-from aigent.core.profiles import ProfileManager
+from typing import List, Optional, Union
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.search import search, glob_files
+from aigent.core.workspace import WORKSPACE
+from aigent.core.repomap import REPO_MAP
+from aigent.core.shell import run_command, get_shell_settings, CURRENT_SHELL
+from aigent.core.blobs import BLOB_STORE
+from aigent.core.files import read_slice, BinaryFileError, FILE_CACHE, CURRENT_READS, MAX_READ_BYTES
+from aigent.core.patching import patch_file, patch_files, TextEdit, PatchError
+from aigent.core.schemas import FileEdit
 
 def validate_path(p: Path) -> Optional[str]:
     """
@@ -12,27 +21,10 @@ def validate_path(p: Path) -> Optional[str]:
     Returns Error string if invalid, None if valid.
     """
     try:
-        # Resolve absolute path of target
-        abs_path = p.resolve()
-        
-        # Get allowed dirs from config
-        # Note: ProfileManager is a singleton-ish (loads from same config file)
-        pm = ProfileManager()
-        # Ensure loaded (might duplicate load if not careful, but ProfileManager handles it gracefully usually)
-        # Actually ProfileManager logic: if not loaded, returns empty config?
-        # We assume it's initialized by the time tools run.
-        # If config not loaded, fallback to CWD (safe default).
-        
-        allowed_dirs = pm.config.allowed_work_dirs or ["."]
-        
-        # Check if path matches ANY allowed root
-        is_allowed = False
-        for allowed in allowed_dirs:
-            root = Path(allowed).expanduser().resolve()
-            if abs_path.is_relative_to(root):
-                is_allowed = True
-                break
-        
+        # Roots are resolved once per configuration (see AllowedRoots);
+        # the target is resolved through symlinks before the check
+        is_allowed, allowed_dirs = ALLOWED_ROOTS.check(p)
+
         if not is_allowed:
             return f"Error: Access Denied. Path '{p}' is outside the allowed working directories: {allowed_dirs}"
             
@@ -40,16 +32,51 @@ def validate_path(p: Path) -> Optional[str]:
     except Exception as e:
         return f"Error validating path: {e}"
 
+# Room a page leaves for its header, besides the path (line/byte counts, next offset)
+_PAGE_HEADER_CHARS = 200
+
+def _page_bytes(path: str) -> int:
+    """
+    Largest fs_read page that reaches the model whole.
+
+    Tool outputs over the blob store's threshold are replaced by a short preview,
+    so a page (plus its header) must stay under it or the header would point past
+    lines the model never saw. Bytes bound characters: decoding never yields more
+    characters than bytes.
+    """
+    if not BLOB_STORE.config.enabled:
+        return MAX_READ_BYTES
+    budget = BLOB_STORE.config.threshold_chars - len(path) - _PAGE_HEADER_CHARS
+    return max(1, min(MAX_READ_BYTES, budget))
+
 @tool
-def fs_read(path: str) -> str:
+def fs_read(
+    path: str,
+    offset: int = 1,
+    limit: int = 0,
+    byte_start: Optional[int] = None,
+    byte_end: Optional[int] = None,
+    fresh: bool = False
+) -> str:
     """
     Reads the content of a file from the local filesystem.
 
+    Small files are returned whole. Large files are returned a page at a time,
+    preceded by a header with the line range, total line count and size, and
+    the offset to pass to read the next page. Binary files are rejected.
+    Re-reading a range that hasn't changed since it was last read in this
+    session returns a short note instead of the content.
+
     Args:
         path (str): The relative or absolute path to the file to read.
+        offset (int): The 1-based line number to start reading from. Defaults to 1.
+        limit (int): The number of lines to read. Defaults to 0 (to the end of the file).
+        byte_start (Optional[int]): Read a byte range starting here instead of lines.
+        byte_end (Optional[int]): End of the byte range (exclusive).
+        fresh (bool): Return the content even if it is unchanged since the last read.
 
     Returns:
-        str: The text content of the file.
+        str: The text content of the file (or of the requested range).
 
     Raises:
         Exception: If the file does not exist or cannot be read.
@@ -64,10 +91,142 @@ def fs_read(path: str) -> str:
 
         if not p.exists():
             return f"Error: File {path} does not exist."
-        return p.read_text()
+        if not p.is_file():
+            return f"Error: {path} is not a file."
+
+        try:
+            part = read_slice(
+                p, offset=offset, limit=limit, byte_start=byte_start, byte_end=byte_end,
+                max_bytes=_page_bytes(path)
+            )
+        except BinaryFileError as e:
+            return f"Error: {e}"
+
+        reads = CURRENT_READS.get()
+        if reads is not None and FILE_CACHE.config.report_unchanged:
+            if not fresh and reads.seen(part.key, part.start_byte, part.end_byte):
+                return (
+                    f"[{path}: unchanged since last read (bytes {part.start_byte}-{part.end_byte} "
+                    f"of {part.size}); the content above is current. Pass fresh=True to read it again.]"
+                )
+            # A spilled result only showed the model a preview; don't claim it has the rest
+            if not BLOB_STORE.needs_spill(part.text):
+                reads.record(part.key, part.start_byte, part.end_byte)
+
+        # Whole file in one page: return it as-is
+        if part.complete and part.line_count is not None:
+            return part.text
+
+        if part.line_count is None:
+            header = f"[{path}: bytes {part.start_byte}-{part.end_byte} of {part.size}]"
+            if part.end_byte < part.size:
+                header += f" Use byte_start={part.end_byte} to continue."
+        elif not part.first_line:
+            header = f"[{path}: no lines at offset {offset}; the file has {part.line_count} lines | {part.size} bytes]"
+        else:
+            header = f"[{path}: lines {part.first_line}-{part.last_line} of {part.line_count} | {part.size} bytes]"
+            if part.end_byte < part.size and not part.text.endswith("\n"):
+                # A single line longer than a page: continue by bytes
+                header += f" Line {part.last_line} is cut; use byte_start={part.end_byte} to continue."
+            elif part.end_byte < part.size:
+                header += f" Use offset={part.last_line + 1} to continue."
+        return f"{header}\n{part.text}"
     except Exception as e:
         return f"Error reading file: {e}"
 
+def _search_roots(path: Optional[str]) -> Union[List[str], str]:
+    """The directories a search covers: path if given, else every allowed root."""
+    if not path:
+        return ALLOWED_ROOTS.current_dirs()
+    p = Path(path).expanduser()
+    error = validate_path(p)
+    if error:
+        return error
+    if not p.is_dir():
+        return f"Error: Directory {path} does not exist."
+    return [path]
+
+@tool
+def fs_search(
+    pattern: str,
+    path: Optional[str] = None,
+    glob: Optional[str] = None,
+    ignore_case: bool = False,
+    max_results: int = 100
+) -> str:
+    """
+    Searches file contents for a regular expression (like grep -rn), respecting .gitignore.
+
+    Binary files are skipped. Use this instead of grep via bash_execute.
+
+    Args:
+        pattern (str): Python regular expression to search for.
+        path (Optional[str]): Directory to search. Defaults to all allowed working directories.
+        glob (Optional[str]): Only search files matching this glob, e.g. "*.py" or "src/**/*.ts".
+        ignore_case (bool): Case-insensitive matching. Defaults to False.
+        max_results (int): Maximum number of matches to return. Defaults to 100.
+
+    Returns:
+        str: JSON with "matches" (path, line, column, text), "files_searched" and "truncated".
+    """
+    try:
+        roots = _search_roots(path)
+        if isinstance(roots, str):
+            return roots
+        return json.dumps(search(roots, pattern, glob=glob, ignore_case=ignore_case, max_results=max_results))
+    except re.error as e:
+        return f"Error: Invalid regular expression: {e}"
+    except Exception as e:
+        return f"Error searching files: {e}"
+
+@tool
+def fs_glob(pattern: str, path: Optional[str] = None, max_results: int = 200) -> str:
+    """
+    Finds files by name or path pattern (like find), respecting .gitignore.
+
+    Use this instead of ls/find via bash_execute.
+
+    Args:
+        pattern (str): Glob such as "*.py" (any depth), "src/**/models/*.py" or "**/README*".
+        path (Optional[str]): Directory to search. Defaults to all allowed working directories.
+        max_results (int): Maximum number of files to return. Defaults to 200.
+
+    Returns:
+        str: JSON with "files" (path, size) and "truncated".
+    """
+    try:
+        roots = _search_roots(path)
+        if isinstance(roots, str):
+            return roots
+        return json.dumps(glob_files(roots, pattern, max_results=max_results))
+    except Exception as e:
+        return f"Error listing files: {e}"
+
+@tool
+def code_lookup(name: str, kind: Optional[str] = None, path: Optional[str] = None, max_results: int = 20) -> str:
+    """
+    Finds where Python classes, functions and methods are defined, with their signatures.
+
+    Much cheaper than searching with grep. Exact name matches come first, then
+    partial (case-insensitive) matches.
+
+    Args:
+        name (str): Symbol name, e.g. "AgentEngine", "initialize", "AgentEngine.initialize" or "aigent.core.tools.fs_read".
+        kind (Optional[str]): Only return "class", "function" or "method" symbols.
+        path (Optional[str]): Directory to look in. Defaults to all allowed working directories.
+        max_results (int): Maximum number of symbols to return. Defaults to 20.
+
+    Returns:
+        str: JSON list of symbols (name, kind, signature, path, line, module, doc).
+    """
+    try:
+        roots = _search_roots(path)
+        if isinstance(roots, str):
+            return roots
+        return json.dumps(REPO_MAP.lookup(roots, name, kind=kind, limit=max(1, max_results)))
+    except Exception as e:
+        return f"Error looking up code: {e}"
+
 @tool
 def fs_write(path: str, content: str, append: bool = False) -> str:
     """
@@ -95,6 +254,12 @@ def fs_write(path: str, content: str, append: bool = False) -> str:
         mode = "a" if append else "w"
         with open(p, mode) as f:
             f.write(content)
+        FILE_CACHE.invalidate(p)
+        # Written in place: mtime and size alone may not tell the versions apart
+        reads = CURRENT_READS.get()
+        if reads is not None:
+            reads.forget(p)
+        WORKSPACE.notify(p)
         return f"Successfully wrote to {path} (mode={mode})"
     except Exception as e:
         return f"Error writing file: {e}"
@@ -133,49 +298,14 @@ def fs_patch(
 
         if not p.exists():
             return f"Error: File {path} not found."
-            
-        original_content = p.read_text()
-        lines = original_content.splitlines(keepends=True)
-        
-        # Calculate line indices (0-based)
-        start_idx = max(0, start_line - 1)
-        end_idx = len(lines) if end_line == -1 else end_line
-        
-        # Extract the segment to search within
-        segment_lines = lines[start_idx:end_idx]
-        segment_text = "".join(segment_lines)
-        
-        if target not in segment_text:
-            return (
-                f"Error: Target text not found in lines {start_line}-{end_line} of {path}. "
-                "Please ensure exact match (whitespace matters)."
-            )
-            
-        # Perform replacement on the segment only
-        # We only replace the FIRST occurrence within the scope to be safe
-        new_segment_text = segment_text.replace(target, replacement, 1)
-        
-        # Reconstruct full file content
-        new_lines = lines[:start_idx] + new_segment_text.splitlines(keepends=True) + lines[end_idx:]
-        new_content = "".join(new_lines)
-        
-        p.write_text(new_content)
-        
-        # Generate Diff
-        diff = difflib.unified_diff(
-            original_content.splitlines(),
-            new_content.splitlines(),
-            fromfile=f"a/{path}",
-            tofile=f"b/{path}",
-            lineterm=""
-        )
-        
-        # Filter out file headers (---, +++) but keep hunk headers (@@) and content
-        diff_lines = [
-            line for line in diff 
-            if not line.startswith(('---', '+++'))
-        ]
-        
+
+        # Only the region around the match is diffed; the file is rewritten
+        # atomically, keeping its permissions and line endings
+        try:
+            diff_lines = patch_file(p, TextEdit(target, replacement, start_line, end_line))
+        except PatchError as e:
+            return f"Error: {e}"
+
         if not diff_lines:
              return f"Successfully patched {path} (No effective changes)."
 
@@ -185,10 +315,73 @@ def fs_patch(
         return f"Error patching file: {e}"
 
 @tool
-def bash_execute(command: str) -> str:
+def fs_multi_patch(edits: List[FileEdit]) -> str:
+    """
+    Applies several find-and-replace edits, across one or more files, in one call.
+
+    All targets are checked first: if any is not found, nothing is changed and
+    every failing edit is reported. Edits to the same file are matched against
+    its original content; several edits with the same target replace successive
+    matches. Each file is read and written once.
+
+    Args:
+        edits (List[FileEdit]): The edits, each with path, target, replacement and
+            optional start_line/end_line (1-based, end_line -1 = end of file).
+
+    Returns:
+        str: A combined unified diff of all changed files.
+    """
+    try:
+        if not edits:
+            return "Error: No edits given."
+
+        pairs = []
+        labels = {}
+        for edit in edits:
+            # Tool calls may arrive as plain dicts
+            if isinstance(edit, dict):
+                edit = FileEdit(**edit)
+            p = Path(edit.path).expanduser()
+
+            # Security Check
+            error = validate_path(p)
+            if error:
+                return error
+            if not p.is_file():
+                return f"Error: File {edit.path} not found."
+
+            labels.setdefault(p.resolve(), edit.path)
+            pairs.append((p, TextEdit(edit.target, edit.replacement, edit.start_line, edit.end_line)))
+
+        try:
+            diffs = patch_files(pairs)
+        except PatchError as e:
+            return f"Error: {e}"
+
+        if not diffs:
+            return f"Successfully applied {len(edits)} edits (No effective changes)."
+
+        output = []
+        for resolved, diff_lines in diffs.items():
+            label = labels[resolved]
+            output.append(f"--- a/{label}")
+            output.append(f"+++ b/{label}")
+            output.extend(diff_lines)
+        return "\n".join(output)
+
+    except Exception as e:
+        return f"Error patching files: {e}"
+
+@tool
+async def bash_execute(command: str) -> str:
     """
     Executes a bash command on the local system.
 
+    By default commands run in one shell per session, so `cd`, exported variables
+    and activated virtualenvs carry over to later commands. A `cd` does not affect
+    the fs_* tools, which resolve relative paths against the agent's starting
+    directory; pass them absolute paths after changing directory.
+
     Args:
         command (str): The bash command to execute.
 
@@ -198,19 +391,71 @@ def bash_execute(command: str) -> str:
     Raises:
         Exception: If the command fails or times out.
     """
+    settings = get_shell_settings()
+
+    forwarding = settings.stream_output
+
+    async def forward_output(stream: str, text: str) -> None:
+        nonlocal forwarding
+        if not forwarding:
+            return
+        try:
+            # Surfaces as an on_custom_event in the engine's event stream
+            await adispatch_custom_event(
+                "tool_output",
+                {"tool": "bash_execute", "stream": stream, "content": text}
+            )
+        except RuntimeError:
+            # Not running inside a traced tool run (e.g. called directly)
+            forwarding = False
+
     try:
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            capture_output=True, 
-            text=True, 
-            timeout=30
+        # The engine's persistent shell if there is one, else a one-off shell
+        shell = CURRENT_SHELL.get()
+        run = shell.run if shell is not None else run_command
+        result = await run(
+            command,
+            timeout=settings.timeout,
+            max_output_bytes=settings.max_output_bytes,
+            on_output=forward_output if forwarding else None
         )
-        output = result.stdout
-        if result.stderr:
-            output += f"\nSTDERR:\n{result.stderr}"
-        return output
-    except subprocess.TimeoutExpired:
-        return "Error: Command timed out after 30 seconds."
     except Exception as e:
         return f"Error executing command: {e}"
+
+    output = result.stdout
+    if result.stderr:
+        output += f"\nSTDERR:\n{result.stderr}"
+    if result.timed_out:
+        output += f"\nError: Command timed out after {settings.timeout:g} seconds."
+        if shell is not None:
+            output += " The shell was restarted; its state (cwd, variables) was reset."
+    elif result.shell_exited:
+        output += "\nNote: The shell exited; the next command starts a new shell."
+    elif result.returncode:
+        output += f"\nExit code: {result.returncode}"
+    return output
+
+@tool
+def blob_read(handle: str, offset: int = 0, length: int = 8000) -> str:
+    """
+    Reads part of a tool output that was too large to show in full.
+
+    Args:
+        handle (str): The blob handle given in the truncated output.
+        offset (int): Byte offset to start reading at. Defaults to 0.
+        length (int): Number of bytes to read. Defaults to 8000.
+
+    Returns:
+        str: The requested range, with the blob's total size.
+    """
+    try:
+        size = BLOB_STORE.size(handle)
+        # Never return more than would itself be spilled
+        length = max(0, min(length, BLOB_STORE.config.threshold_chars))
+        content = BLOB_STORE.read_range(handle, offset, length)
+        end = min(size, offset + length)
+        return f"[blob {handle}: bytes {offset}-{end} of {size}]\n{content}"
+    except FileNotFoundError:
+        return f"Error: Blob {handle} not found."
+    except Exception as e:
+        return f"Error reading blob: {e}"
@@ -0,0 +1,171 @@
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Protocol
+
+@dataclass
+class Span:
+    """A timed operation within a turn (OpenTelemetry-style)."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+
+class SpanExporter(Protocol):
+    def export(self, spans: List[Span], summary: Dict[str, Any]) -> None:
+        ...
+
+class TurnTracer:
+    """
+    Collects the spans of a single turn.
+
+    Span names:
+        turn             the whole turn (root)
+        llm              one model call (attribute ttft_ms)
+        first_token      turn start -> first streamed token (absent if none was streamed)
+        tool             one tool call (attribute tool)
+        authorization    permission check of a tool call, incl. waiting on the user
+        history_update   appending the turn's messages to the history
+    """
+
+    def __init__(self, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self.root = self.start_span("turn", **(attributes or {}))
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+        """Starts a span; the parent defaults to the turn's root span."""
+        parent = parent or self.root
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes)
+        )
+        self.spans.append(span)
+        return span
+
+    def end_span(self, span: Span, **attributes: Any) -> None:
+        if span.end_ns is None:
+            span.end_ns = time.time_ns()
+        span.attributes.update(attributes)
+
+    def mark(self, name: str, **attributes: Any) -> Span:
+        """Records a finished span from the start of the turn to now (e.g. first_token)."""
+        span = self.start_span(name, **attributes)
+        span.start_ns = self.root.start_ns
+        self.end_span(span)
+        return span
+
+    def finish(self) -> None:
+        """Ends the root span and any span left open (e.g. by an error)."""
+        for span in self.spans:
+            self.end_span(span)
+
+    def summary(self) -> Dict[str, Any]:
+        """Latency breakdown of the turn in milliseconds."""
+        def total(name: str) -> float:
+            return round(sum(s.duration_ms for s in self.spans if s.name == name), 3)
+
+        first_token = next((s for s in self.spans if s.name == "first_token"), None)
+        return {
+            "total_ms": round(self.root.duration_ms, 3),
+            "ttft_ms": round(first_token.duration_ms, 3) if first_token else None,
+            "llm_ms": total("llm"),
+            "llm_calls": sum(1 for s in self.spans if s.name == "llm"),
+            "tool_ms": total("tool"),
+            "tool_calls": sum(1 for s in self.spans if s.name == "tool"),
+            "authorization_ms": total("authorization"),
+            "history_ms": total("history_update"),
+            "streamed_tokens": self.root.attributes.get("streamed_tokens", 0),
+        }
+
+class InMemorySpanExporter:
+    """Keeps the spans and breakdown of the most recent turns in process."""
+
+    def __init__(self, max_turns: int = 50):
+        self.turns: Deque[Dict[str, Any]] = deque(maxlen=max_turns)
+
+    def export(self, spans: List[Span], summary: Dict[str, Any]) -> None:
+        self.turns.append({
+            "trace_id": spans[0].trace_id if spans else None,
+            "summary": summary,
+            "spans": [s.to_dict() for s in spans],
+        })
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return list(self.turns)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}
+
+class OTLPFileSpanExporter:
+    """
+    Appends each turn as one OTLP/JSON `ExportTraceServiceRequest` line, the format
+    read by the OpenTelemetry Collector's file receiver and most trace viewers.
+    """
+
+    def __init__(self, path: str, service_name: str = "aigent"):
+        self.path = Path(path).expanduser()
+        self.service_name = service_name
+
+    def export(self, spans: List[Span], summary: Dict[str, Any]) -> None:
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(self.service_name)}]},
+            "scopeSpans": [{
+                "scope": {"name": "aigent"},
+                "spans": [
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                        "name": s.name,
+                        "kind": 1, # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                        "attributes": [
+                            {"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None
+                        ],
+                    }
+                    for s in spans
+                ],
+            }],
+        }]}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(payload) + "\n")
+        except Exception as e:
+            print(f"Failed to export trace to {self.path}: {e}")
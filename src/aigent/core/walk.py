@@ -0,0 +1,206 @@
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+
+# Directories never searched, whatever .gitignore says
+ALWAYS_SKIPPED_DIRS = {".git", ".hg", ".svn"}
+
+def translate_glob(pattern: str) -> str:
+    """
+    Regex body for a gitignore-style glob: `*` and `?` stop at `/`, `**`
+    crosses directories, and `[...]` is a character class.
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("(?:/.*)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end < 0:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+def compile_glob(pattern: str) -> Pattern:
+    """
+    Compiles a path filter. Patterns containing `/` match the whole relative
+    path; others match the file name at any depth.
+    """
+    pattern = pattern.lstrip("/")
+    if "/" in pattern:
+        return re.compile(f"^{translate_glob(pattern)}$")
+    return re.compile(f"^(?:.*/)?{translate_glob(pattern)}$")
+
+class IgnoreRules:
+    """The patterns of one .gitignore file, relative to its directory."""
+
+    def __init__(self, base: str, lines: List[str]):
+        self.base = base # Relative to the search root, "" for the root itself
+        # (regex, negated, directories only)
+        self.rules: List[Tuple[Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            if "/" in line:
+                # Anchored to the .gitignore's directory
+                regex = re.compile(f"^{translate_glob(line.lstrip('/'))}$")
+            else:
+                regex = re.compile(f"^(?:.*/)?{translate_glob(line)}$")
+            self.rules.append((regex, negated, dir_only))
+
+    @classmethod
+    def load(cls, directory: str, base: str) -> Optional["IgnoreRules"]:
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r", errors="replace") as f:
+                rules = cls(base, f.readlines())
+        except OSError:
+            return None
+        return rules if rules.rules else None
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True (ignored), False (re-included by `!`), or None if no rule applies."""
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        result = None
+        # The last matching rule wins
+        for regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negated
+        return result
+
+def is_ignored(stack: List[IgnoreRules], rel_path: str, is_dir: bool) -> bool:
+    ignored = False
+    # Deeper .gitignore files override shallower ones
+    for rules in stack:
+        verdict = rules.match(rel_path, is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+@dataclass
+class FileEntry:
+    path: str # As shown to the model: the root joined with the relative path
+    rel_path: str
+    abs_path: str
+    size: int
+    mtime_ns: int = 0
+
+def ignore_stack(base: str, rel_dir: str) -> List[IgnoreRules]:
+    """The .gitignore rules that apply inside rel_dir (those of base and every directory down to it)."""
+    stack: List[IgnoreRules] = []
+    parts = rel_dir.split("/") if rel_dir else []
+    for depth in range(len(parts) + 1):
+        rel = "/".join(parts[:depth])
+        rules = IgnoreRules.load(os.path.join(base, rel) if rel else base, rel)
+        if rules is not None:
+            stack.append(rules)
+    return stack
+
+def walk_order_key(rel_path: str) -> Tuple[Tuple[int, str], ...]:
+    """Sort key reproducing walk_files' order: a directory's files, then its subdirectories."""
+    parts = rel_path.split("/")
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+def walk_files(
+    root: str,
+    path_filter: Optional[Pattern] = None,
+    start: str = "",
+    dirs: Optional[Dict[str, List[IgnoreRules]]] = None
+) -> Iterator[FileEntry]:
+    """
+    Yields the files below root that .gitignore doesn't exclude, in sorted order.
+
+    Symlinks are not followed, so the walk cannot leave the root.
+
+    Args:
+        root: The directory to walk (as configured or given by the model).
+        path_filter: Optional compiled glob matched against each relative path.
+        start: Only walk this subdirectory (relative to root); paths stay relative to root.
+        dirs: If given, filled with the .gitignore stack of every directory walked.
+    """
+    base = os.path.abspath(os.path.expanduser(root))
+    # (absolute dir, relative dir, .gitignore stack of its parent)
+    start_stack = ignore_stack(base, start.rsplit("/", 1)[0] if "/" in start else "") if start else []
+    pending: List[Tuple[str, str, List[IgnoreRules]]] = [(os.path.join(base, start) if start else base, start, start_stack)]
+    while pending:
+        directory, rel_dir, stack = pending.pop()
+        rules = IgnoreRules.load(directory, rel_dir)
+        if rules is not None:
+            stack = stack + [rules]
+        if dirs is not None:
+            dirs[rel_dir] = stack
+
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    if entry.name in ALWAYS_SKIPPED_DIRS or is_ignored(stack, rel, True):
+                        continue
+                    subdirs.append((entry.path, rel, stack))
+                elif entry.is_file():
+                    if is_ignored(stack, rel, False):
+                        continue
+                    if path_filter is not None and not path_filter.match(rel):
+                        continue
+                    stat = entry.stat()
+                    yield FileEntry(
+                        path=str(Path(root) / rel),
+                        rel_path=rel,
+                        abs_path=entry.path,
+                        size=stat.st_size,
+                        mtime_ns=stat.st_mtime_ns
+                    )
+            except OSError:
+                continue
+        # Depth-first, in name order
+        pending.extend(reversed(subdirs))
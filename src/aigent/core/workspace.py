@@ -0,0 +1,620 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import re
+import select
+import stat as stat_module
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+from aigent.core.files import BINARY_SNIFF_BYTES, is_binary
+from aigent.core.schemas import WorkspaceIndexConfig
+from aigent.core.walk import (
+    ALWAYS_SKIPPED_DIRS, FileEntry, IgnoreRules, is_ignored, walk_files, walk_order_key
+)
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+# struct inotify_event header: wd, mask, cookie, len (name follows)
+_EVENT = struct.Struct("iIII")
+
+# Changes are applied once events have been quiet for this long (seconds)
+SETTLE_SECONDS = 0.05
+
+class Inotify:
+    """Minimal ctypes binding of Linux inotify (no third-party watcher needed)."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+        if libc is None or not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """Waits up to timeout seconds and returns (wd, mask, name) events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+# Array typecode of a 4-byte unsigned int
+_WORD = "I" if array("I").itemsize == 4 else "L"
+
+def gram(data: bytes, i: int = 0) -> int:
+    """The trigram at data[i:i + 3] as an int (b0 << 16 | b1 << 8 | b2)."""
+    return data[i] << 16 | data[i + 1] << 8 | data[i + 2]
+
+def trigrams(data: bytes) -> Set[int]:
+    """
+    Distinct 3-byte sequences of (ASCII-lowercased) content, as ints (see gram).
+
+    The 4-byte words at every offset are collected by array in C; source code
+    repeats heavily, so only the distinct words are split into their two trigrams
+    in Python.
+    """
+    data = data.lower()
+    n = len(data)
+    if n < 4:
+        return {gram(data)} if n == 3 else set()
+    words: Set[int] = set()
+    for k in range(4):
+        chunk = array(_WORD)
+        chunk.frombytes(data[k:k + (n - k) // 4 * 4])
+        if sys.byteorder == "little":
+            chunk.byteswap()
+        words.update(chunk)
+    return {w >> 8 for w in words} | {w & 0xFFFFFF for w in words}
+
+# Characters with a meaning of their own outside a character class
+_REGEX_SPECIAL = frozenset(".^$*+?{}[]\\|()")
+# Escapes followed by a fixed number of argument characters (\x41, \u0041, \U00000041)
+_ESCAPE_ARGS = {"x": 2, "u": 4, "U": 8}
+# A counted repetition such as {3}, {2,} or {,5}
+_QUANTIFIER_RE = re.compile(r"\{\d*(,\d*)?\}")
+# Inline flag groups ((?i), (?x), (?ai:...)), global or scoped
+_INLINE_FLAGS_RE = re.compile(r"\(\?([a-zA-Z]+)[:)]")
+
+def _skip_class(pattern: str, i: int) -> int:
+    """Index just past the character class starting at pattern[i] ("[")."""
+    i += 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    if i < len(pattern) and pattern[i] == "]":
+        # A leading "]" is a literal member
+        i += 1
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            i += 2
+        elif pattern[i] == "]":
+            return i + 1
+        else:
+            i += 1
+    raise ValueError("unterminated character class")
+
+def _skip_group(pattern: str, i: int) -> int:
+    """Index just past the group starting at pattern[i] ("("), nested groups included."""
+    depth = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            i = _skip_class(pattern, i)
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("unbalanced parenthesis")
+
+def _skip_escape(pattern: str, i: int) -> int:
+    """Index just past the (non-literal) escape starting at pattern[i] ("\\")."""
+    kind = pattern[i + 1]
+    i += 2
+    if kind in _ESCAPE_ARGS:
+        return i + _ESCAPE_ARGS[kind]
+    if kind == "N":
+        end = pattern.find("}", i)
+        if end < 0:
+            raise ValueError("unterminated named escape")
+        return end + 1
+    if kind.isdigit():
+        # Octal escape or group reference
+        while i < len(pattern) and pattern[i].isdigit():
+            i += 1
+    return i
+
+def required_literals(pattern: str, ignore_case: bool = False) -> List[bytes]:
+    """
+    Literal runs (3+ bytes) every match of the regular expression must contain.
+
+    A conservative scan of the pattern text: only literal characters outside of
+    groups and character classes are used, a character followed by an optional
+    quantifier is dropped, and a top-level alternation (or verbose mode, or
+    anything the scan doesn't understand) yields an empty list, which means
+    "no filter". Used to narrow a search with the trigram index.
+    """
+    flags = "".join(_INLINE_FLAGS_RE.findall(pattern))
+    if "x" in flags:
+        # Verbose mode: whitespace and comments are not literal
+        return []
+    ignore_case = ignore_case or "i" in flags
+
+    literals: List[bytes] = []
+    run: List[str] = []
+
+    def flush() -> None:
+        text = "".join(run)
+        run.clear()
+        # The index lowercases ASCII only; non-ASCII case folding can't be narrowed
+        if len(text.encode("utf-8")) >= 3 and (text.isascii() or not ignore_case):
+            literals.append(text.encode("utf-8").lower())
+
+    try:
+        i = 0
+        while i < len(pattern):
+            c = pattern[i]
+            if c not in _REGEX_SPECIAL:
+                run.append(c)
+                i += 1
+            elif c == "\\":
+                escaped = pattern[i + 1]
+                if not escaped.isalnum():
+                    # Escaped punctuation (\. \( ...) is itself
+                    run.append(escaped)
+                    i += 2
+                else:
+                    flush()
+                    i = _skip_escape(pattern, i)
+            elif c in "*?":
+                # The preceding character may be absent (x*, x?)
+                if run:
+                    run.pop()
+                flush()
+                i += 1
+            elif c == "{":
+                quantifier = _QUANTIFIER_RE.match(pattern, i)
+                if quantifier is not None:
+                    # Counted repetition, possibly {0}: don't rely on the character
+                    if run:
+                        run.pop()
+                    i = quantifier.end()
+                else:
+                    # A literal "{"; leaving it out is safe
+                    i += 1
+                flush()
+            elif c == "+":
+                # The preceding character is there at least once
+                flush()
+                i += 1
+            elif c == "[":
+                flush()
+                i = _skip_class(pattern, i)
+            elif c == "(":
+                flush()
+                i = _skip_group(pattern, i)
+            elif c == "|":
+                return []
+            elif c == ")":
+                raise ValueError("unbalanced parenthesis")
+            else: # . ^ $ }
+                flush()
+                i += 1
+        flush()
+    except (ValueError, IndexError):
+        # Not understood (or invalid): search every file
+        return []
+    return literals
+
+def _under(rel: str, prefix: str) -> bool:
+    return not prefix or rel == prefix or rel.startswith(prefix + "/")
+
+class WorkspaceIndex:
+    """
+    In-memory index of one allowed root: every file the walk would list (with
+    size and mtime) and a trigram index of text file contents.
+
+    Built by a background thread, then kept current from inotify events (or by
+    re-walking the tree every poll_interval seconds where inotify isn't
+    available, e.g. when the watch limit is reached). Only changed files are
+    re-read. fs_search and fs_glob use a ready index instead of walking the
+    tree: listing is a filter over the paths, and content search only reads the
+    files whose trigrams contain the pattern's literal parts.
+    """
+
+    def __init__(self, root: str, config: WorkspaceIndexConfig):
+        self.root = root
+        self.base = os.path.realpath(os.path.expanduser(root))
+        self.config = config
+        self.ready = threading.Event()
+        self.mode = "starting" # then "inotify" or "polling"
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, int]] = {} # rel path -> (size, mtime_ns)
+        # Trigram -> ids of the file versions containing it. Each indexed version
+        # of a file gets a new id; replaced and removed ones are only marked dead
+        # (their content may be gone) and swept from the postings in batches
+        self._postings: Dict[int, Set[int]] = {}
+        self._ids: Dict[str, int] = {} # rel path -> id of its indexed version
+        self._paths: Dict[int, str] = {} # Live ids -> rel path
+        self._dead: Set[int] = set()
+        self._next_id = 0
+        # Files too large to index: always candidates
+        self._unindexed: Set[str] = set()
+        self._dirs: Dict[str, List[IgnoreRules]] = {} # Walked directories and their .gitignore stacks
+        self._order: Optional[List[str]] = None # Paths in walk order, rebuilt lazily
+        self._wds: Dict[int, str] = {}
+        # Bumped on every change to the file list or contents, so consumers
+        # (e.g. RepoMap) can tell that nothing changed without listing
+        self.generation = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"aigent-index:{self.root}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
+        try:
+            self._rescan("")
+            self.ready.set()
+            if self.config.watch:
+                try:
+                    self._watch()
+                    return
+                except OSError as e:
+                    logger.info("Workspace index for %s falls back to polling: %s", self.root, e)
+            self.mode = "polling"
+            while not self._stop.wait(self.config.poll_interval):
+                self._rescan("")
+        except Exception:
+            logger.exception("Workspace index for %s stopped", self.root)
+            # Searches fall back to walking the tree
+            self.ready.clear()
+
+    # --- Updates ---
+
+    def _index_file(self, rel: str, size: int, mtime_ns: int) -> None:
+        grams: Optional[Set[int]] = None
+        if size <= self.config.max_indexed_file_bytes:
+            try:
+                with open(os.path.join(self.base, rel), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return
+            # Binary files never match a trigram query (and are skipped by search)
+            grams = set() if is_binary(data[:BINARY_SNIFF_BYTES]) else trigrams(data)
+
+        with self._lock:
+            if rel not in self._files:
+                self._order = None
+            self._retire(rel)
+            self._files[rel] = (size, mtime_ns)
+            self.generation += 1
+            if grams is None:
+                self._unindexed.add(rel)
+                return
+            file_id = self._next_id
+            self._next_id += 1
+            self._ids[rel] = file_id
+            self._paths[file_id] = rel
+            for g in grams:
+                posting = self._postings.get(g)
+                if posting is None:
+                    self._postings[g] = {file_id}
+                else:
+                    posting.add(file_id)
+
+    def _retire(self, rel: str) -> None:
+        """Marks the indexed version of rel dead. Called with the lock held."""
+        self._unindexed.discard(rel)
+        file_id = self._ids.pop(rel, None)
+        if file_id is None:
+            return
+        del self._paths[file_id]
+        self._dead.add(file_id)
+        if len(self._dead) > max(64, len(self._paths) // 4):
+            dead, self._dead = self._dead, set()
+            for g in list(self._postings):
+                posting = self._postings[g]
+                posting -= dead
+                if not posting:
+                    del self._postings[g]
+
+    def _remove(self, rel: str) -> None:
+        with self._lock:
+            if self._files.pop(rel, None) is not None:
+                self._order = None
+                self.generation += 1
+            self._retire(rel)
+
+    def _rescan(self, rel_dir: str) -> List[str]:
+        """
+        Re-walks a directory (the whole root for ""), indexing new and changed
+        files and dropping vanished ones. Returns the directories walked.
+        """
+        dirs: Dict[str, List[IgnoreRules]] = {}
+        seen: Dict[str, FileEntry] = {}
+        if self._dir_included(rel_dir):
+            for entry in walk_files(self.base, start=rel_dir, dirs=dirs):
+                if self._stop.is_set():
+                    return []
+                seen[entry.rel_path] = entry
+
+        with self._lock:
+            stale = [rel for rel in self._files if _under(rel, rel_dir) and rel not in seen]
+            for old in [d for d in self._dirs if _under(d, rel_dir)]:
+                del self._dirs[old]
+            self._dirs.update(dirs)
+        for rel in stale:
+            self._remove(rel)
+        for rel, entry in seen.items():
+            if self._files.get(rel) != (entry.size, entry.mtime_ns):
+                self._index_file(rel, entry.size, entry.mtime_ns)
+        return list(dirs)
+
+    def _dir_included(self, rel_dir: str) -> bool:
+        """Whether the walk would enter rel_dir (it exists and isn't ignored)."""
+        if not rel_dir:
+            return os.path.isdir(self.base)
+        parent, _, name = rel_dir.rpartition("/")
+        stack = self._dirs.get(parent)
+        path = os.path.join(self.base, rel_dir)
+        return (
+            stack is not None
+            and name not in ALWAYS_SKIPPED_DIRS
+            and os.path.isdir(path) and not os.path.islink(path)
+            and not is_ignored(stack, rel_dir, True)
+        )
+
+    def _refresh_file(self, rel: str) -> None:
+        """Re-checks one file after a change notification."""
+        stack = self._dirs.get(os.path.dirname(rel))
+        try:
+            stat = os.lstat(os.path.join(self.base, rel))
+        except OSError:
+            stat = None
+        if stack is None or stat is None or not stat_module.S_ISREG(stat.st_mode) \
+                or is_ignored(stack, rel, False):
+            self._remove(rel)
+        elif self._files.get(rel) != (stat.st_size, stat.st_mtime_ns):
+            self._index_file(rel, stat.st_size, stat.st_mtime_ns)
+
+    def _watch(self) -> None:
+        inotify = Inotify()
+        try:
+            for rel_dir in list(self._dirs):
+                self._add_watch(inotify, rel_dir)
+            self.mode = "inotify"
+            # Catch changes made between the initial walk and the watches
+            self._add_watches(inotify, self._rescan(""))
+
+            files: Set[str] = set()
+            dirs: Set[str] = set()
+            while not self._stop.is_set():
+                events = inotify.read(SETTLE_SECONDS if files or dirs else 0.5)
+                if not events:
+                    for rel_dir in sorted(dirs):
+                        self._add_watches(inotify, self._rescan(rel_dir))
+                    for rel in files:
+                        self._refresh_file(rel)
+                    files.clear()
+                    dirs.clear()
+                    continue
+                for wd, mask, name in events:
+                    if mask & IN_Q_OVERFLOW:
+                        # Events were lost: re-walk everything
+                        dirs.add("")
+                        continue
+                    rel_dir = self._wds.get(wd)
+                    if rel_dir is None:
+                        continue
+                    if mask & IN_IGNORED:
+                        del self._wds[wd]
+                        continue
+                    if not name:
+                        continue
+                    rel = f"{rel_dir}/{name}" if rel_dir else name
+                    if name == ".gitignore":
+                        # The rules of the whole subtree may have changed
+                        dirs.add(rel_dir)
+                    elif mask & IN_ISDIR:
+                        dirs.add(rel)
+                    else:
+                        files.add(rel)
+        finally:
+            inotify.close()
+
+    def _add_watch(self, inotify: Inotify, rel_dir: str) -> None:
+        wd = inotify.add_watch(os.path.join(self.base, rel_dir) if rel_dir else self.base)
+        self._wds[wd] = rel_dir
+
+    def _add_watches(self, inotify: Inotify, rel_dirs: List[str]) -> None:
+        watched = set(self._wds.values())
+        for rel_dir in rel_dirs:
+            if rel_dir not in watched:
+                try:
+                    self._add_watch(inotify, rel_dir)
+                except FileNotFoundError:
+                    # Removed again already; its own event will follow
+                    pass
+
+    # --- Queries ---
+
+    def covers(self, prefix: str) -> bool:
+        """Whether the directory prefix (relative to the root) was walked."""
+        return prefix in self._dirs
+
+    def entries(
+        self,
+        display_root: str,
+        prefix: str = "",
+        path_filter: Optional[Pattern] = None,
+        literals: Optional[List[bytes]] = None
+    ) -> List[FileEntry]:
+        """
+        The indexed files below prefix, in walk order, as walk_files(display_root) would list them.
+
+        Args:
+            display_root: The directory the caller asked for; paths are shown relative to it.
+            prefix: That directory relative to the index root ("" for the root itself).
+            path_filter: Optional compiled glob, matched against paths relative to display_root.
+            literals: If given, only files that may contain all of these byte strings.
+        """
+        with self._lock:
+            candidates = self._candidates(literals) if literals else None
+            if self._order is None:
+                self._order = sorted(self._files, key=walk_order_key)
+            order = self._order
+            files = self._files
+
+            result = []
+            for rel in order:
+                if prefix and not rel.startswith(prefix + "/"):
+                    continue
+                if candidates is not None and rel not in candidates:
+                    continue
+                sub = rel[len(prefix) + 1:] if prefix else rel
+                if path_filter is not None and not path_filter.match(sub):
+                    continue
+                size, mtime_ns = files[rel]
+                result.append(FileEntry(
+                    path=str(Path(display_root) / sub),
+                    rel_path=sub,
+                    abs_path=os.path.join(self.base, rel),
+                    size=size,
+                    mtime_ns=mtime_ns
+                ))
+            return result
+
+    def _candidates(self, literals: List[bytes]) -> Set[str]:
+        """Files whose trigrams include every trigram of every literal, plus unindexed files."""
+        grams = {gram(lit, i) for lit in literals for i in range(len(lit) - 2)}
+        if not grams:
+            return set(self._files)
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            ids &= posting
+            if not ids:
+                break
+        found = {self._paths[i] for i in ids if i in self._paths}
+        found |= self._unindexed
+        return found
+
+class WorkspaceIndexer:
+    """The workspace indexes of all allowed roots (settings.workspace_index)."""
+
+    def __init__(self):
+        self.config = WorkspaceIndexConfig()
+        self._indexes: Dict[str, WorkspaceIndex] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config: WorkspaceIndexConfig, dirs: List[str]) -> None:
+        """Starts an index per root (if enabled) and stops those of removed roots."""
+        with self._lock:
+            self.config = config
+            wanted = {}
+            if config.enabled:
+                wanted = {os.path.realpath(os.path.expanduser(d)): d for d in dirs}
+            for base in list(self._indexes):
+                if base not in wanted or self._indexes[base].config != config:
+                    self._indexes.pop(base).stop()
+            for base, root in wanted.items():
+                if base not in self._indexes:
+                    index = WorkspaceIndex(root, config)
+                    self._indexes[base] = index
+                    index.start()
+
+    def lookup(self, path: str) -> Optional[Tuple[WorkspaceIndex, str]]:
+        """
+        The ready index covering path, and path relative to its root.
+        None if no index covers it yet (callers walk the tree instead).
+        """
+        if not self._indexes:
+            return None
+        real = os.path.realpath(os.path.expanduser(path))
+        for base, index in list(self._indexes.items()):
+            if real != base and not real.startswith(base.rstrip("/") + "/"):
+                continue
+            prefix = "" if real == base else os.path.relpath(real, base)
+            if index.ready.is_set() and index.covers(prefix):
+                return index, prefix
+        return None
+
+    def notify(self, path: Path) -> None:
+        """Updates the index right away after we changed a file (fs_write, fs_patch)."""
+        if not self._indexes:
+            return
+        real = os.path.realpath(path)
+        for base, index in list(self._indexes.items()):
+            if real.startswith(base.rstrip("/") + "/") and index.ready.is_set():
+                index._refresh_file(os.path.relpath(real, base))
+
+    def stop_all(self) -> None:
+        with self._lock:
+            for index in self._indexes.values():
+                index.stop()
+            self._indexes.clear()
+
+# Process-wide indexer, configured from settings.workspace_index by AgentEngine.initialize()
+WORKSPACE = WorkspaceIndexer()
@@ -1,4 +1,5 @@
 import asyncio
+import signal
 import sys
 from prompt_toolkit import PromptSession, print_formatted_text as print
 from prompt_toolkit.patch_stdout import patch_stdout
@@ -11,6 +12,7 @@ from rich.live import Live
 
 from aigent.core.profiles import ProfileManager
 from aigent.core.engine import AgentEngine
+from aigent.core.coalescer import TokenCoalescer
 from aigent.core.schemas import EventType
 from aigent.interfaces.commands import REGISTRY, get_command_names, handle_command, CommandContext
 
@@ -44,6 +46,8 @@ async def run_cli(args):
     print(HTML("<b><green>Ready! Type '/help' for commands.</green></b>"))
 
     cmd_context = CommandContext(console=console, engine=engine)
+    # Optional TOKEN micro-batching (fewer Markdown re-renders at high token rates)
+    token_coalescer = TokenCoalescer.from_config(profile_manager.config.token_batching)
 
     while True:
         with patch_stdout():
@@ -67,14 +71,23 @@ async def run_cli(args):
                     continue
 
             # Process input
+            interrupt_installed = False
             try:
                 # print(HTML(f"<skyblue>Thinking...</skyblue>"))
                 
                 # Markdown Streaming Buffer
                 current_text = ""
                 live_display = None
+                streamed_tool_output = False
                 
-                async for event in engine.stream(user_input):
+                events = engine.stream(user_input)
+                if token_coalescer:
+                    events = token_coalescer.coalesce(events)
+
+                # Ctrl-C while the agent is working cancels the turn (not the CLI)
+                interrupt_installed = _install_interrupt_handler(engine)
+
+                async for event in events:
                     
                     if event.type == EventType.TOKEN:
                         current_text += event.content
@@ -108,7 +121,17 @@ async def run_cli(args):
                             tool_name = event.content.replace("Calling tool: ", "")
                             print(HTML(f"<yellow>🛠  {tool_name}({formatted_args})</yellow>"))
                             
+                        elif event.type == EventType.TOOL_OUTPUT:
+                            # Live output of a running tool, printed as it arrives
+                            streamed_tool_output = True
+                            console.print(event.content, end="", style="grey50", markup=False, highlight=False)
+
                         elif event.type == EventType.TOOL_END:
+                            if streamed_tool_output:
+                                # Output was already shown live
+                                streamed_tool_output = False
+                                console.print()
+                                continue
                             # Format output
                             content = event.content
                             # Truncate total length if massive
@@ -119,6 +142,17 @@ async def run_cli(args):
                         elif event.type == EventType.ERROR:
                             print(HTML(f"<red>Error: {event.content}</red>"))
 
+                        elif event.type == EventType.FINISH:
+                            if event.metadata.get("cancelled"):
+                                print(HTML("<orange>Turn cancelled.</orange>"))
+                            # Report prompt cache hits for the turn, if any
+                            usage = event.metadata.get("usage", {})
+                            if usage.get("cache_read_tokens"):
+                                print(HTML(
+                                    f"<grey>(prompt cache: {usage['cache_read_tokens']} of "
+                                    f"{usage['input_tokens']} input tokens read from cache)</grey>"
+                                ))
+
                         elif event.type == EventType.APPROVAL_REQUEST:
                             tool = event.metadata.get("tool")
                             args = event.metadata.get("input")
@@ -129,7 +163,12 @@ async def run_cli(args):
                             
                             decision = "deny"
                             while True:
-                                ans = await session.prompt_async(HTML("   <orange>Allow? [y/n/a(lways tool)/s(smart)]: </orange>"))
+                                try:
+                                    ans = await session.prompt_async(HTML("   <orange>Allow? [y/n/a(lways tool)/s(smart)]: </orange>"))
+                                except (EOFError, KeyboardInterrupt):
+                                    # Ctrl-C at the prompt cancels the whole turn
+                                    engine.cancel()
+                                    break
                                 ans = ans.lower().strip()
                                 if ans in ['y', 'yes']:
                                     decision = "allow"
@@ -154,3 +193,20 @@ async def run_cli(args):
                     
             except Exception as e:
                 print(f"Error during execution: {e}")
+            finally:
+                if interrupt_installed:
+                    asyncio.get_running_loop().remove_signal_handler(signal.SIGINT)
+
+    # Stop the persistent shell (and anything it started)
+    await engine.aclose()
+
+def _install_interrupt_handler(engine: AgentEngine) -> bool:
+    """
+    Routes SIGINT (Ctrl-C) to engine.cancel() while a turn is streaming.
+    Returns False where signal handlers are unsupported (e.g. Windows).
+    """
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGINT, engine.cancel)
+        return True
+    except (NotImplementedError, RuntimeError):
+        return False
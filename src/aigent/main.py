@@ -3,8 +3,6 @@ import argparse
 import asyncio
 from pathlib import Path
 
-from aigent.interfaces.cli import run_cli
-from aigent.server.api import run_server
 from aigent.core.profiles import ProfileManager, set_config_path
 
 def entry_point() -> None:
@@ -49,13 +47,17 @@ def entry_point() -> None:
 
     args = parser.parse_args()
 
+    # Each subcommand imports its own stack, so `aigent chat` never loads
+    # FastAPI/uvicorn and `aigent serve` never loads prompt_toolkit
     if args.command == "serve":
+        from aigent.server.api import run_server
         print(f"Starting server on {args.host}:{args.port}...")
         try:
             asyncio.run(run_server(args))
         except KeyboardInterrupt:
             print("\nServer stopped by user.")
     elif args.command == "chat":
+        from aigent.interfaces.cli import run_cli
         print(f"Starting chat with profile: {args.profile}")
         asyncio.run(run_cli(args))
     else:
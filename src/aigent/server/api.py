@@ -1,16 +1,20 @@
 import asyncio
 import json
+import time
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Set
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, messages_to_dict, messages_from_dict
 
 from aigent.core.engine import AgentEngine
+from aigent.core.coalescer import TokenCoalescer
+from aigent.core.tracing import InMemorySpanExporter
+from aigent.server.metrics import ServerMetrics, MetricsSpanExporter, CONTENT_TYPE
 from aigent.core.profiles import ProfileManager
 from aigent.core.schemas import AgentEvent, EventType
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import uvicorn
 
 app = FastAPI()
@@ -27,6 +31,21 @@ class ConnectionManager:
         # session_id -> Lock (to prevent concurrent engine runs in same session)
         self.locks: Dict[str, asyncio.Lock] = {}
         self.yolo_mode: bool = False
+        # Optional TOKEN micro-batching before broadcast (settings.token_batching)
+        self.token_coalescer: Optional[TokenCoalescer] = None
+        # session_id -> recent per-turn timings (see /api/sessions/{id}/timings)
+        self.timings: Dict[str, InMemorySpanExporter] = {}
+        self.timings_keep_recent: int = 20 # settings.tracing.keep_recent
+        # Background tasks (e.g. releasing a left session), kept until done
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Operational metrics (see /metrics). Sizes are computed at scrape time.
+        self.metrics = ServerMetrics()
+        self.metrics.active_sessions.set_function(lambda: len(self.sessions))
+        self.metrics.active_sockets.set_function(
+            lambda: sum(len(sockets) for sockets in self.active_connections.values())
+        )
+        self.metrics.pending_approvals.set_function(self._count_pending_approvals)
 
     async def connect(self, websocket: WebSocket, session_id: str, profile_name: str = "default") -> bool:
         await websocket.accept()
@@ -50,7 +69,7 @@ class ConnectionManager:
                         
                     engine = AgentEngine(profile, yolo=self.yolo_mode)
                     await engine.initialize()
-                    self.sessions[session_id] = engine
+                    self._register_session(session_id, engine)
                 except Exception as e:
                     print(f"Failed to initialize engine: {e}")
                     await websocket.close(code=1000, reason=f"Init failed: {str(e)}")
@@ -62,14 +81,59 @@ class ConnectionManager:
         await self.replay_history(session_id, websocket)
         return True
 
+    def _register_session(self, session_id: str, engine: AgentEngine):
+        """Attaches per-session archive, compaction saves and timing collection, then registers the engine."""
+        engine.archive_path = SESSIONS_DIR / f"{session_id}.archive.jsonl"
+        # Compaction finishes after the turn's save; save its result too
+        engine.on_compacted = lambda: self._save_session_to_disk(session_id)
+
+        exporter = InMemorySpanExporter(max_turns=self.timings_keep_recent)
+        engine.span_exporters.append(exporter)
+        engine.span_exporters.append(MetricsSpanExporter(self.metrics))
+        self.timings[session_id] = exporter
+
+        self.sessions[session_id] = engine
+
+    def _count_pending_approvals(self) -> int:
+        return sum(
+            len(engine.authorizer.pending_requests)
+            for engine in self.sessions.values()
+            if engine.authorizer is not None
+        )
+
     def disconnect(self, websocket: WebSocket, session_id: str):
         if session_id in self.active_connections:
             if websocket in self.active_connections[session_id]:
                 self.active_connections[session_id].remove(websocket)
             if not self.active_connections[session_id]:
-                # Optional: Clean up session engine if empty? 
-                # For now, keep it alive for persistence.
-                pass
+                # The engine (and its history) stays for persistence, but its
+                # shell process is released once nobody is connected
+                task = asyncio.create_task(self._release_session(session_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _release_session(self, session_id: str):
+        """Closes the engine's resources (the shell) after its running turn, if still unwatched."""
+        engine = self.sessions.get(session_id)
+        lock = self.locks.get(session_id)
+        if engine is None or lock is None:
+            return
+        async with lock:
+            if self.active_connections.get(session_id):
+                # Someone reconnected in the meantime
+                return
+            try:
+                await engine.aclose()
+            except Exception as e:
+                print(f"Failed to release session {session_id}: {e}")
+
+    async def close_all(self):
+        """Releases every session's resources (server shutdown)."""
+        for session_id, engine in list(self.sessions.items()):
+            try:
+                await engine.aclose()
+            except Exception as e:
+                print(f"Failed to close session {session_id}: {e}")
 
     async def broadcast(self, session_id: str, message: str):
         """Sends a raw string (JSON) to all sockets in a session"""
@@ -82,7 +146,7 @@ class ConnectionManager:
                 await connection.send_text(message)
             except Exception:
                 # Handle dead sockets
-                pass
+                self.metrics.broadcast_failures.inc()
 
     async def replay_history(self, session_id: str, websocket: WebSocket):
         """Converts LangChain history to AgentEvents and sends them"""
@@ -136,6 +200,7 @@ class ConnectionManager:
         if session_id not in self.sessions:
             return
             
+        start = time.perf_counter()
         engine = self.sessions[session_id]
         # Convert messages to dicts
         history_dicts = messages_to_dict(engine.history)
@@ -149,6 +214,7 @@ class ConnectionManager:
         try:
             with open(file_path, "w") as f:
                 json.dump(data, f, indent=2)
+            self.metrics.session_save.observe(time.perf_counter() - start)
         except Exception as e:
             print(f"Failed to save session {session_id}: {e}")
 
@@ -158,6 +224,7 @@ class ConnectionManager:
         if not file_path.exists():
             return False
             
+        start = time.perf_counter()
         try:
             with open(file_path, "r") as f:
                 data = json.load(f)
@@ -184,7 +251,8 @@ class ConnectionManager:
             
             # Inject history
             engine.history = messages
-            self.sessions[session_id] = engine
+            self._register_session(session_id, engine)
+            self.metrics.session_load.observe(time.perf_counter() - start)
             return True
             
         except Exception as e:
@@ -208,6 +276,19 @@ async def get_config():
         pm.load_profiles()
     return pm.config.dict()
 
+@app.get("/api/sessions/{session_id}/timings")
+async def get_session_timings(session_id: str):
+    """Latency breakdown and spans of the session's most recent turns (oldest first)."""
+    exporter = manager.timings.get(session_id)
+    if exporter is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return exporter.recent()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Operational metrics in the Prometheus text exposition format."""
+    return Response(content=manager.metrics.render(), media_type=CONTENT_TYPE)
+
 @app.websocket("/ws/chat/{session_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
@@ -233,6 +314,11 @@ async def websocket_endpoint(
                     if engine.authorizer and req_id:
                         engine.authorizer.resolve_request(str(req_id), msg)
                     continue
+                if isinstance(msg, dict) and msg.get("type") == "cancel":
+                    # Stop the in-flight turn; its task then records the partial
+                    # history and releases the session lock
+                    manager.sessions[session_id].cancel()
+                    continue
             except json.JSONDecodeError:
                 pass # Treat as raw chat message
 
@@ -269,9 +355,15 @@ async def process_chat_message(session_id: str, user_input: str, user_name: str
         return
         
     # Acquire lock to ensure we don't run multiple turns at once
+    wait_start = time.perf_counter()
     async with lock:
+        manager.metrics.lock_wait.observe(time.perf_counter() - wait_start)
         try:
-            async for event in engine.stream(user_input, user_name=user_name):
+            events = engine.stream(user_input, user_name=user_name)
+            if manager.token_coalescer:
+                events = manager.token_coalescer.coalesce(events)
+
+            async for event in events:
                 await manager.broadcast(session_id, event.to_json())
             
             await manager._save_session_to_disk(session_id)
@@ -294,6 +386,9 @@ async def run_server(args) -> None:
     # Dynamic Static Mount
     pm = ProfileManager()
     pm.load_profiles()
+    manager.token_coalescer = TokenCoalescer.from_config(pm.config.token_batching)
+    manager.timings_keep_recent = pm.config.tracing.keep_recent
+
     static_dir = pm.config.server.static_dir
     static_path = Path(static_dir).expanduser().resolve()
     
@@ -308,4 +403,8 @@ async def run_server(args) -> None:
         
     config = uvicorn.Config(app, host=args.host, port=args.port, log_level="info")
     server = uvicorn.Server(config)
-    await server.serve()
\ No newline at end of file
+    try:
+        await server.serve()
+    finally:
+        # Don't leave session shells running after the server stops
+        await manager.close_all()
\ No newline at end of file
@@ -0,0 +1,228 @@
+import bisect
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds (sub-ms lock waits up to multi-minute turns)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class _Metric:
+    """
+    Base class for metrics. A metric without label names is its own (single)
+    child; with label names, `labels(...)` returns the child for those values,
+    created on first use and reused afterwards, so hot paths can hold on to a
+    child and update it without allocating.
+    """
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str) -> Any:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._new_child()
+            self._children[values] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        return type(self)(self.name, self.documentation)
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def _samples(self, labels: str) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self._series():
+            lines.extend(child._samples(_format_labels(self.labelnames, values)))
+        return lines
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def _samples(self, labels: str) -> List[str]:
+        return [f"{self.name}{labels} {_format_value(self.value)}"]
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. If a function is set, it is called at scrape
+    time instead, which keeps derived values (e.g. sizes of dicts) off hot paths.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def _samples(self, labels: str) -> List[str]:
+        value = self._function() if self._function is not None else self.value
+        return [f"{self.name}{labels} {_format_value(value)}"]
+
+class Histogram(_Metric):
+    """A distribution of observations in cumulative buckets."""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _samples(self, labels: str) -> List[str]:
+        # "le" goes last, after the metric's own labels
+        prefix = labels[:-1] + "," if labels else "{"
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{prefix}le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+        return lines
+
+class MetricsRegistry:
+    """A set of metrics rendered together by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class ServerMetrics:
+    """The API server's operational metrics."""
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        r = self.registry
+
+        self.active_sessions = r.gauge("aigent_active_sessions", "Sessions with an engine in memory.")
+        self.active_sockets = r.gauge("aigent_active_websockets", "Connected WebSockets across all sessions.")
+        self.pending_approvals = r.gauge("aigent_pending_approvals", "Tool calls waiting for a user decision.")
+
+        self.lock_wait = r.histogram(
+            "aigent_session_lock_wait_seconds", "Time a chat message waited for its session lock."
+        )
+        self.turn_duration = r.histogram("aigent_turn_duration_seconds", "Duration of agent turns.")
+        self.turn_ttft = r.histogram("aigent_turn_ttft_seconds", "Time from turn start to the first streamed token.")
+        self.turn_errors = r.counter("aigent_turn_errors_total", "Turns that ended with an error.")
+        self.tokens_streamed = r.counter("aigent_tokens_streamed_total", "Tokens streamed by the model (TOKEN chunks).")
+        self.tool_duration = r.histogram(
+            "aigent_tool_duration_seconds", "Duration of tool calls by tool.", labelnames=("tool",)
+        )
+        self.session_save = r.histogram("aigent_session_save_seconds", "Time to save a session to disk.")
+        self.session_load = r.histogram("aigent_session_load_seconds", "Time to load a session from disk.")
+        self.broadcast_failures = r.counter(
+            "aigent_broadcast_send_failures_total", "WebSocket sends that failed during broadcast."
+        )
+
+    def render(self) -> str:
+        return self.registry.render()
+
+class MetricsSpanExporter:
+    """Span exporter (see aigent.core.tracing) that feeds turn and tool timings into ServerMetrics."""
+
+    def __init__(self, metrics: ServerMetrics):
+        self.metrics = metrics
+
+    def export(self, spans: List[Any], summary: Dict[str, Any]) -> None:
+        # Tokens are counted by the engine and added once per turn, not per token
+        self.metrics.tokens_streamed.inc(summary.get("streamed_tokens", 0))
+        self.metrics.turn_duration.observe(summary["total_ms"] / 1000)
+        if summary.get("ttft_ms") is not None:
+            self.metrics.turn_ttft.observe(summary["ttft_ms"] / 1000)
+        for span in spans:
+            if span.name == "turn" and "error" in span.attributes:
+                self.metrics.turn_errors.inc()
+            elif span.name == "tool":
+                self.metrics.tool_duration.labels(span.attributes.get("tool", "unknown")).observe(span.duration_ms / 1000)
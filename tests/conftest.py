@@ -9,6 +9,14 @@ def event_loop():
     yield loop
     loop.close()
 
+@pytest.fixture(autouse=True)
+def fresh_agent_cache():
+    """Compiled agents and chat models are cached process-wide; start each test without them."""
+    from aigent.core.engine import clear_agent_cache
+    clear_agent_cache()
+    yield
+    clear_agent_cache()
+
 def pytest_addoption(parser):
     parser.addoption(
         "--live", action="store_true", default=False, help="Run live API tests"
@@ -0,0 +1,72 @@
+import pytest
+from aigent.core import profiles
+from aigent.core.blobs import BlobStore, BLOB_STORE
+from aigent.core.engine import AgentEngine
+from aigent.core.schemas import BlobStoreConfig, EventType
+from aigent.core.tools import blob_read
+from langchain_core.messages import ToolMessage
+
+def test_put_is_content_addressed_and_ranged(tmp_path):
+    store = BlobStore(BlobStoreConfig(dir=str(tmp_path)))
+    handle = store.put("hello blob world")
+
+    assert store.put("hello blob world") == handle
+    assert len(list(tmp_path.rglob("*"))) == 2 # fan-out dir + blob
+    assert store.size(handle) == 16
+    assert store.read_range(handle, offset=6, length=4) == "blob"
+
+    with pytest.raises(ValueError):
+        store.read_range("../../etc/passwd")
+
+def test_spill_keeps_preview_and_handle(tmp_path):
+    store = BlobStore(BlobStoreConfig(dir=str(tmp_path), threshold_chars=50, preview_chars=10))
+    output = "x" * 10 + "y" * 90
+
+    assert not store.needs_spill("short")
+    assert store.needs_spill(output)
+    preview = store.spill(output)
+    assert preview.startswith("x" * 10 + "\n")
+    assert "y" not in preview.split("\n")[0]
+
+    handle = preview.split("stored as blob ")[1].split(".")[0]
+    assert store.read_range(handle, 0, 1000) == output
+
+@pytest.mark.asyncio
+async def test_engine_spills_large_tool_output(tmp_path):
+    config_path = tmp_path / "settings.yaml"
+    config_path.write_text(f"""
+settings:
+  blobs:
+    dir: "{tmp_path / 'blobs'}"
+    threshold_chars: 1000
+    preview_chars: 100
+profiles:
+  offline:
+    model_provider: fake
+    provider_options:
+      script:
+        - tool_calls: [{{name: bash_execute, args: {{command: "printf 'a%.0s' $(seq 5000)"}}}}]
+        - Done.
+""")
+    previous = profiles.get_config_path()
+    profiles.set_config_path(config_path)
+    try:
+        profile = profiles.ProfileManager().get_profile("offline")
+        engine = AgentEngine(profile, yolo=True)
+        await engine.initialize()
+
+        events = [event async for event in engine.stream("Print a lot")]
+        tool_end = next(e for e in events if e.type == EventType.TOOL_END)
+        assert len(tool_end.content) < 1000
+        assert "stored as blob" in tool_end.content
+
+        tool_msg = next(m for m in engine.history if isinstance(m, ToolMessage))
+        assert tool_msg.content == tool_end.content
+
+        handle = tool_msg.content.split("stored as blob ")[1].split(".")[0]
+        result = await blob_read.ainvoke({"handle": handle, "offset": 4990, "length": 100})
+        assert result.endswith("a" * 10)
+        assert "of 5000]" in result
+    finally:
+        profiles.set_config_path(previous)
+        BLOB_STORE.configure(BlobStoreConfig())
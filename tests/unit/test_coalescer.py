@@ -0,0 +1,65 @@
+import pytest
+import asyncio
+from aigent.core.coalescer import TokenCoalescer
+from aigent.core.schemas import AgentEvent, EventType, TokenBatchingConfig
+
+async def source(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+def token(text):
+    return AgentEvent(type=EventType.TOKEN, content=text)
+
+@pytest.mark.asyncio
+async def test_burst_is_batched_and_order_kept():
+    events = [token("a"), token("b"), token("c"), AgentEvent(type=EventType.TOOL_START, content="x"), token("d")]
+    coalescer = TokenCoalescer(min_delay=0.05, max_delay=0.05)
+
+    out = [e async for e in coalescer.coalesce(source(events))]
+
+    # First token passes straight through, the rest of the burst is merged and
+    # flushed before the tool event
+    assert [(e.type, e.content) for e in out] == [
+        (EventType.TOKEN, "a"),
+        (EventType.TOKEN, "bc"),
+        (EventType.TOOL_START, "x"),
+        (EventType.TOKEN, "d"),
+    ]
+
+@pytest.mark.asyncio
+async def test_size_limit_flushes():
+    coalescer = TokenCoalescer(min_delay=1.0, max_delay=1.0, max_chars=4)
+    out = [e.content async for e in coalescer.coalesce(source([token("x")] + [token("yy")] * 4))]
+    assert out == ["x", "yyyy", "yyyy"]
+
+@pytest.mark.asyncio
+async def test_slow_stream_flushes_on_timer():
+    coalescer = TokenCoalescer(min_delay=0.005, max_delay=0.005)
+    out = [e.content async for e in coalescer.coalesce(source([token("a"), token("b"), token("c")], delay=0.03))]
+    assert out == ["a", "b", "c"]
+
+def test_disabled_by_default():
+    assert TokenCoalescer.from_config(TokenBatchingConfig()) is None
+    assert TokenCoalescer.from_config(TokenBatchingConfig(enabled=True, max_chars=10)).max_chars == 10
+
+@pytest.mark.asyncio
+async def test_early_exit_closes_source():
+    closed = []
+
+    async def endless():
+        try:
+            yield token("a")
+            while True:
+                await asyncio.sleep(0.01)
+                yield token("b")
+        finally:
+            closed.append(True)
+
+    stream = TokenCoalescer(min_delay=1.0, max_delay=1.0).coalesce(endless())
+    assert (await stream.__anext__()).content == "a"
+    await asyncio.sleep(0.03) # leaves a pending __anext__ and buffered tokens
+    await stream.aclose()
+
+    assert closed == [True]
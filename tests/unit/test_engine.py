@@ -1,8 +1,10 @@
 import pytest
+import asyncio
+import time
 from unittest.mock import MagicMock, AsyncMock, patch
 from aigent.core.engine import AgentEngine
-from aigent.core.schemas import UserProfile, EventType
-from langchain_core.messages import HumanMessage, AIMessage
+from aigent.core.schemas import UserProfile, EventType, AgentEvent
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
 @pytest.fixture
 def mock_profile():
@@ -10,7 +12,7 @@ def mock_profile():
 
 @pytest.mark.asyncio
 async def test_engine_initialization(mock_profile):
-    with patch("aigent.core.engine.ChatOpenAI") as MockLLM:
+    with patch("langchain_openai.ChatOpenAI") as MockLLM:
         engine = AgentEngine(mock_profile)
         await engine.initialize()
         
@@ -64,9 +66,10 @@ async def test_engine_stream_captures_history(mock_profile):
             events.append(event)
 
     # Verify Events
-    assert len(events) == 3 # Token, Token, Finish
+    assert len(events) == 4 # Token, Token, Trace, Finish
     assert events[0].content == "Hello"
-    assert events[2].type == EventType.FINISH
+    assert events[2].type == EventType.TRACE
+    assert events[3].type == EventType.FINISH
     
     # Verify History Capture (The Fix)
     # History should have: [HumanMessage("Hi"), AIMessage("Hello World")]
@@ -105,3 +108,277 @@ async def test_stream_persists_user_name(mock_profile):
         assert isinstance(human_msg, HumanMessage)
         assert human_msg.content == "Hello Aigent"
         assert human_msg.name == "Bob"
+
+@pytest.mark.asyncio
+async def test_agent_executor_is_cached(mock_profile):
+    with patch("langchain_openai.ChatOpenAI"):
+        engine_a = AgentEngine(mock_profile)
+        await engine_a.initialize()
+        engine_b = AgentEngine(mock_profile)
+        await engine_b.initialize()
+
+    # Same profile -> same model instance
+    assert engine_a.llm is engine_b.llm
+
+    with patch("langchain.agents.create_tool_calling_agent") as mock_create, \
+         patch("langchain.agents.AgentExecutor", side_effect=lambda **kwargs: MagicMock()):
+        executor = engine_a._get_agent_executor()
+        assert engine_a._get_agent_executor() is executor
+        # Shared across engines with the same profile and tools
+        assert engine_b._get_agent_executor() is executor
+        assert mock_create.call_count == 1
+
+        # Changing the tool set compiles a new agent
+        engine_b.tools = engine_b.tools[:1]
+        assert engine_b._get_agent_executor() is not executor
+        assert mock_create.call_count == 2
+
+        # So does another tool object under the same name (e.g. a plugin's own instance)
+        own_tool = engine_a.tools[0].model_copy()
+        assert own_tool.name == engine_a.tools[0].name
+        engine_b.tools = [own_tool] + engine_a.tools[1:]
+        assert engine_b._get_agent_executor() is not executor
+        assert mock_create.call_count == 3
+
+@pytest.mark.asyncio
+async def test_stream_reports_crash_and_terminates(mock_profile):
+    engine = AgentEngine(mock_profile)
+    engine.llm = MagicMock()
+    engine.history = []
+
+    async def crash(*args, **kwargs):
+        await engine._emit_event(AgentEvent(type=EventType.TOKEN, content="partial"))
+        raise RuntimeError("boom")
+
+    engine._run_agent_executor = crash
+
+    events = [event async for event in engine.stream("Hi")]
+
+    assert [e.type for e in events] == [EventType.TOKEN, EventType.ERROR]
+    assert "boom" in events[1].content
+
+@pytest.mark.asyncio
+async def test_stream_channels_are_per_turn(mock_profile):
+    engine = AgentEngine(mock_profile)
+    engine.llm = MagicMock()
+    engine.history = []
+
+    async def finish(*args, **kwargs):
+        await engine._emit_event(AgentEvent(type=EventType.FINISH))
+
+    engine._run_agent_executor = finish
+
+    # Events emitted outside a turn are dropped rather than queued for the next one
+    await engine._emit_event(AgentEvent(type=EventType.ERROR, content="stale"))
+
+    events = [event async for event in engine.stream("Hi")]
+    assert [e.type for e in events] == [EventType.FINISH]
+
+@pytest.mark.asyncio
+async def test_compaction_folds_old_turns_into_summary(mock_profile, tmp_path):
+    from langchain_core.messages import SystemMessage
+    from aigent.core.history import SUMMARY_MESSAGE_ID
+
+    mock_profile.max_messages = 2
+    mock_profile.summarize_history = True
+    engine = AgentEngine(mock_profile)
+    engine.llm = MagicMock()
+    engine.llm.ainvoke = AsyncMock(return_value=AIMessage(content="- user said hi"))
+    engine.archive_path = tmp_path / "archive.jsonl"
+    engine.history = [
+        SystemMessage(content="sys"),
+        HumanMessage(content="hi"),
+        AIMessage(content="hello"),
+        HumanMessage(content="next"),
+        AIMessage(content="sure"),
+    ]
+
+    await engine._compact_history()
+
+    # A full window is trimmed to the low watermark (1 of 2 messages)
+    assert [m.content for m in engine.history] == ["sys", "- user said hi", "sure"]
+    assert engine.history[1].id == SUMMARY_MESSAGE_ID
+    assert len(engine.history.summary().content) > 0
+    assert len(engine.archive_path.read_text().splitlines()) == 3
+
+    # Incremental: the next compaction is seeded with the previous summary
+    engine.history.extend([HumanMessage(content="more"), AIMessage(content="ok")])
+    engine.llm.ainvoke.return_value = AIMessage(content="- merged")
+    await engine._compact_history()
+
+    prompt = engine.llm.ainvoke.call_args[0][0][1].content
+    assert "- user said hi" in prompt
+    assert "Assistant: sure\nUser: more" in prompt
+    assert [m.content for m in engine.history] == ["sys", "- merged", "ok"]
+
+@pytest.mark.asyncio
+async def test_compaction_reports_and_is_cancelled_by_aclose(mock_profile):
+    from langchain_core.messages import SystemMessage
+
+    mock_profile.max_messages = 2
+    mock_profile.summarize_history = True
+    engine = AgentEngine(mock_profile)
+    engine.llm = MagicMock()
+    engine.llm.ainvoke = AsyncMock(return_value=AIMessage(content="- summary"))
+    engine.on_compacted = AsyncMock()
+    engine.history = [SystemMessage(content="sys")] + [HumanMessage(content=str(i)) for i in range(4)]
+
+    await engine._compact_history()
+    engine.on_compacted.assert_awaited_once()
+
+    # A compaction still summarizing when the engine is closed is cancelled
+    started = asyncio.Event()
+
+    async def slow_summary(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    engine.llm.ainvoke = slow_summary
+    engine.history.extend([HumanMessage(content="5"), HumanMessage(content="6")])
+    engine._schedule_compaction()
+    await started.wait()
+    await engine.aclose()
+
+    assert engine._compaction_task.cancelled()
+    engine.on_compacted.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_wrapped_tools_run_concurrently_up_to_cap(mock_profile):
+    from langchain_core.tools import tool
+    from aigent.core.engine import _ACTIVE_ENGINE
+    from aigent.core.schemas import PermissionSchema, PermissionPolicy
+    from aigent.core.permissions import Authorizer
+
+    running = 0
+    peak = 0
+
+    @tool
+    async def slow_read(path: str) -> str:
+        """Reads slowly."""
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return path
+
+    mock_profile.max_parallel_tools = 2
+    engine = AgentEngine(mock_profile)
+    engine.authorizer = Authorizer(PermissionSchema(name="t", default_policy=PermissionPolicy.ALLOW), AsyncMock())
+    wrapped = engine._wrap_tool(slow_read)
+    _ACTIVE_ENGINE.set(engine)
+
+    results = await asyncio.gather(*[wrapped.ainvoke({"path": str(i)}) for i in range(5)])
+
+    assert results == ["0", "1", "2", "3", "4"]
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_cancel_kills_tool_process_and_records_partial_history():
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": [
+            {"content": "Running it. ", "tool_calls": [{"name": "bash_execute", "args": {"command": "sleep 20"}}]},
+            "Done.",
+        ]},
+    )
+    engine = AgentEngine(profile, yolo=True)
+    await engine.initialize()
+
+    events = []
+    start = time.perf_counter()
+    async for event in engine.stream("Run the slow command"):
+        events.append(event)
+        if event.type == EventType.TOOL_START:
+            # Let the subprocess start before cancelling
+            await asyncio.sleep(0.3)
+            assert engine.cancel() is True
+
+    assert time.perf_counter() - start < 5
+    assert events[-1].type == EventType.FINISH
+    assert events[-1].metadata["cancelled"] is True
+    assert engine.cancel() is False
+
+    # Every tool call keeps a matching result, so the next turn is valid
+    human, ai_tools, tool_result, partial = engine.history[1:]
+    assert isinstance(ai_tools, AIMessage) and ai_tools.tool_calls[0]["name"] == "bash_execute"
+    assert isinstance(tool_result, ToolMessage) and "cancelled" in tool_result.content
+    assert tool_result.tool_call_id == ai_tools.tool_calls[0]["id"]
+    assert partial.content == "Running it. "
+
+    # The engine is immediately usable again
+    events = [e async for e in engine.stream("Next")]
+    assert events[-1].type == EventType.FINISH
+    assert not events[-1].metadata.get("cancelled")
+
+@pytest.fixture
+def read_engine(mock_profile, tmp_path):
+    """An engine whose turns call fs_read on a file, then either answer or fail."""
+    from aigent.core.roots import ALLOWED_ROOTS
+    from aigent.core.tools import fs_read
+
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+    target = tmp_path / "main.py"
+    target.write_text("print('hi')\n")
+    engine = AgentEngine(mock_profile)
+    engine.llm = MagicMock()
+    engine.history = []
+    outputs = []
+
+    async def run_turn(fail: bool = False):
+        async def astream(*args, **kwargs):
+            output = fs_read.invoke({"path": str(target)})
+            outputs.append(output)
+            yield {"event": "on_tool_start", "run_id": "r1", "name": "fs_read", "data": {"input": {"path": str(target)}}}
+            if fail:
+                raise RuntimeError("provider down")
+            yield {"event": "on_tool_end", "run_id": "r1", "name": "fs_read", "data": {"output": output}}
+
+        executor = MagicMock()
+        executor.astream_events = astream
+        engine._get_agent_executor = MagicMock(return_value=executor)
+        return [e async for e in engine.stream("Read it")]
+
+    yield engine, run_turn, outputs
+    ALLOWED_ROOTS.reset()
+
+@pytest.mark.asyncio
+async def test_reads_count_as_sent_once_in_history(read_engine):
+    engine, run_turn, outputs = read_engine
+    await run_turn()
+    await run_turn()
+    assert outputs[0] == "print('hi')\n"
+    assert "unchanged since last read" in outputs[1]
+
+@pytest.mark.asyncio
+async def test_errored_turn_does_not_mark_reads_sent(read_engine):
+    engine, run_turn, outputs = read_engine
+    events = await run_turn(fail=True)
+    assert events[-1].type == EventType.ERROR
+    await run_turn()
+    assert outputs[1] == "print('hi')\n"
+
+@pytest.mark.asyncio
+async def test_history_reset_forgets_reads(read_engine):
+    engine, run_turn, outputs = read_engine
+    await run_turn()
+    # What /reset does
+    engine.history = [engine.history[0]]
+    await run_turn()
+    assert outputs[1] == "print('hi')\n"
+
+@pytest.mark.asyncio
+async def test_compaction_forgets_reads(read_engine):
+    engine, run_turn, outputs = read_engine
+    from langchain_core.messages import SystemMessage
+    engine.history = [SystemMessage(content="sys")]
+    await run_turn()
+    engine.profile.max_messages = 1
+    engine.llm.ainvoke = AsyncMock(return_value=AIMessage(content="- read main.py"))
+    await engine._compact_history()
+    assert engine.history.summary() is not None
+
+    engine.profile.max_messages = 50
+    await run_turn()
+    assert outputs[1] == "print('hi')\n"
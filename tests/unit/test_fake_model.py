@@ -0,0 +1,80 @@
+import pytest
+import time
+from aigent.core.engine import AgentEngine
+from aigent.core.fake_model import FakeChatModel
+from aigent.core.schemas import UserProfile, EventType
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+@pytest.mark.asyncio
+async def test_script_streams_tokens_and_cycles():
+    model = FakeChatModel(script=["hello there world", "second"])
+
+    chunks = [c.content async for c in model.astream("hi")]
+    assert chunks == ["hello ", "there ", "world"]
+    assert (await model.ainvoke("hi")).content == "second"
+    assert (await model.ainvoke("hi")).content == "hello there world"
+
+@pytest.mark.asyncio
+async def test_generated_responses_are_deterministic():
+    a = await FakeChatModel(seed=7, generated_tokens=10).ainvoke("hi")
+    b = await FakeChatModel(seed=7, generated_tokens=10).ainvoke("hi")
+    assert a.content == b.content
+    assert len(a.content.split()) == 10
+
+@pytest.mark.asyncio
+async def test_token_rate_paces_stream():
+    model = FakeChatModel(script=["a b c d e"], tokens_per_second=100, latency_ms=20)
+    start = time.perf_counter()
+    async for _ in model.astream("hi"):
+        pass
+    # 20 ms to first token + 4 gaps of 10 ms
+    assert time.perf_counter() - start >= 0.055
+
+@pytest.mark.asyncio
+async def test_engine_runs_offline_with_tool_calls():
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": [
+            {"tool_calls": [{"name": "fs_read", "args": {"path": "pyproject.toml"}}]},
+            "The project is aigent.",
+        ]},
+    )
+    engine = AgentEngine(profile, yolo=True)
+    await engine.initialize()
+
+    events = [event async for event in engine.stream("What is this project?")]
+    types = [e.type for e in events]
+
+    assert EventType.TOOL_START in types
+    tool_end = next(e for e in events if e.type == EventType.TOOL_END)
+    assert 'name = "aigent"' in tool_end.content
+    assert "".join(e.content for e in events if e.type == EventType.TOKEN) == "The project is aigent."
+    assert types[-1] == EventType.FINISH
+
+    # Human, tool call, tool result, final answer
+    assert [type(m) for m in engine.history[1:]] == [HumanMessage, AIMessage, ToolMessage, AIMessage]
+
+@pytest.mark.asyncio
+async def test_concurrent_engines_each_follow_the_full_script():
+    import asyncio
+
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": ["one", "two", "three"], "tokens_per_second": 500},
+    )
+    engines = [AgentEngine(profile, yolo=True) for _ in range(2)]
+    for engine in engines:
+        await engine.initialize()
+    assert engines[0].llm is not engines[1].llm
+
+    async def converse(engine):
+        answers = []
+        for question in ["a", "b", "c"]:
+            events = [e async for e in engine.stream(question)]
+            answers.append("".join(e.content for e in events if e.type == EventType.TOKEN))
+        return answers
+
+    results = await asyncio.gather(*[converse(e) for e in engines])
+    assert results == [["one", "two", "three"]] * 2
@@ -0,0 +1,149 @@
+import pytest
+from aigent.core import files
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.files import (
+    LineIndex, FileCache, ReadTracker, CURRENT_READS, FILE_CACHE,
+    read_slice, BinaryFileError, clear_line_index_cache
+)
+from aigent.core.schemas import FileCacheConfig
+from aigent.core.tools import fs_read, fs_write
+
+@pytest.fixture
+def workdir(tmp_path):
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+    yield tmp_path
+    ALLOWED_ROOTS.reset()
+    clear_line_index_cache()
+    FILE_CACHE.clear()
+
+def test_line_index_offsets():
+    index = LineIndex(b"a\nbb\nccc\n", 9)
+    assert list(index.starts) == [0, 2, 5]
+    assert index.line_count == 3
+    assert index.span(1, 1) == (2, 5)
+    assert index.span(1, 0) == (2, 9)
+
+    # No trailing newline: the last line still counts
+    assert LineIndex(b"a\nb", 3).line_count == 2
+    assert LineIndex(b"", 0).line_count == 0
+
+def test_read_slice_lines_and_bytes(workdir):
+    f = workdir / "log.txt"
+    f.write_text("".join(f"line {i}\n" for i in range(1, 101)))
+
+    part = read_slice(f, offset=10, limit=3)
+    assert part.text == "line 10\nline 11\nline 12\n"
+    assert (part.first_line, part.last_line, part.line_count) == (10, 12, 100)
+
+    part = read_slice(f, byte_start=0, byte_end=6)
+    assert part.text == "line 1"
+    assert part.line_count is None
+
+    # Pages are cut at a line boundary
+    part = read_slice(f, max_bytes=22)
+    assert part.text == "line 1\nline 2\nline 3\n"
+    assert part.last_line == 3
+
+def test_read_slice_uses_mmap_and_caches_index(workdir, monkeypatch):
+    monkeypatch.setattr(files, "MMAP_THRESHOLD_BYTES", 0)
+    f = workdir / "big.txt"
+    f.write_text("".join(f"{i}\n" for i in range(1000)))
+
+    assert read_slice(f, offset=500, limit=1).text == "499\n"
+    built = []
+    monkeypatch.setattr(files, "LineIndex", lambda *args: built.append(args))
+    assert read_slice(f, offset=1000, limit=1).text == "999\n"
+    assert built == []
+
+def test_fs_read_rejects_binary(workdir):
+    f = workdir / "blob.bin"
+    f.write_bytes(b"\x7fELF\0\0\1")
+    with pytest.raises(BinaryFileError):
+        read_slice(f)
+    assert fs_read.invoke({"path": str(f)}).startswith("Error:")
+
+def test_fs_read_reports_position(workdir):
+    f = workdir / "notes.txt"
+    f.write_text("one\ntwo\nthree\n")
+
+    # Whole small files come back unchanged
+    assert fs_read.invoke({"path": str(f)}) == "one\ntwo\nthree\n"
+
+    result = fs_read.invoke({"path": str(f), "offset": 2, "limit": 1})
+    assert result == f"[{f}: lines 2-2 of 3 | 14 bytes] Use offset=3 to continue.\ntwo\n"
+
+    result = fs_read.invoke({"path": str(f), "byte_start": 4, "byte_end": 7})
+    assert result == f"[{f}: bytes 4-7 of 14] Use byte_start=7 to continue.\ntwo"
+
+def test_file_cache_validates_and_evicts(tmp_path):
+    cache = FileCache(FileCacheConfig(max_bytes=10))
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    a.write_text("aaaaaa")
+    b.write_text("bbbbbb")
+
+    data, key = cache.read(a)
+    assert data == b"aaaaaa"
+    assert cache.read(a) == (data, key)
+    assert cache.total_bytes == 6
+
+    # Over budget: the least recently used file goes
+    cache.read(b)
+    assert cache.total_bytes == 6
+
+    a.write_text("changed!")
+    data, new_key = cache.read(a)
+    assert data == b"changed!"
+    assert new_key != key
+
+    cache.invalidate(a)
+    assert cache.total_bytes == 0
+
+def test_fs_read_reports_unchanged(workdir):
+    f = workdir / "main.py"
+    f.write_text("print('hi')\n")
+    reads = ReadTracker()
+    token = CURRENT_READS.set(reads)
+    try:
+        assert fs_read.invoke({"path": str(f)}) == "print('hi')\n"
+        assert "unchanged since last read" in fs_read.invoke({"path": str(f)})
+        assert fs_read.invoke({"path": str(f), "fresh": True}) == "print('hi')\n"
+
+        # Our own writes invalidate the cache, and the new version is sent
+        fs_write.invoke({"path": str(f), "content": "print('bye')\n"})
+        assert fs_read.invoke({"path": str(f)}) == "print('bye')\n"
+    finally:
+        CURRENT_READS.reset(token)
+
+@pytest.mark.asyncio
+async def test_fs_read_pages_are_never_spilled(workdir):
+    from unittest.mock import AsyncMock
+    from aigent.core.blobs import BLOB_STORE
+    from aigent.core.engine import AgentEngine, _ACTIVE_ENGINE
+    from aigent.core.permissions import Authorizer
+    from aigent.core.schemas import BlobStoreConfig, PermissionSchema, PermissionPolicy, UserProfile
+
+    BLOB_STORE.configure(BlobStoreConfig(dir=str(workdir / "blobs")))
+    engine = AgentEngine(UserProfile(name="pages", model_provider="fake"))
+    engine.authorizer = Authorizer(PermissionSchema(name="t", default_policy=PermissionPolicy.ALLOW), AsyncMock())
+    wrapped = engine._wrap_tool(fs_read)
+    token = _ACTIVE_ENGINE.set(engine)
+
+    f = workdir / "big.log"
+    f.write_text("".join(f"log line {i:06d} with some padding text\n" for i in range(1, 35001)))
+    assert f.stat().st_size > 1 << 20
+    try:
+        result = await wrapped.arun({"path": str(f)})
+        assert "stored as blob" not in result
+        header, text = result.split("\n", 1)
+        lines = text.splitlines()
+        last = int(lines[-1].split()[2])
+        assert last == len(lines)
+        assert header.endswith(f"Use offset={last + 1} to continue.")
+
+        result = await wrapped.arun({"path": str(f), "offset": last + 1})
+        assert "stored as blob" not in result
+        assert result.split("\n", 2)[1] == f"log line {last + 1:06d} with some padding text"
+    finally:
+        _ACTIVE_ENGINE.reset(token)
+        BLOB_STORE.configure(BlobStoreConfig())
@@ -0,0 +1,47 @@
+import pytest
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
+from aigent.core.history import ChatHistory, estimate_tokens
+
+def test_token_counts_cached_on_append():
+    history = ChatHistory([SystemMessage(content="sys")])
+    msg = HumanMessage(content="x" * 400)
+    history.append(msg)
+
+    assert history.token_count(msg) == estimate_tokens(msg)
+    assert id(msg) in history._token_counts
+
+def test_window_fills_budget_from_newest():
+    small = [HumanMessage(content=f"msg {i}") for i in range(10)]
+    huge = ToolMessage(content="x" * 40000, tool_call_id="1")
+    call = AIMessage(content="", tool_calls=[{"name": "fs_read", "args": {"path": "big.log"}, "id": "1"}])
+    history = ChatHistory([call, huge] + small)
+
+    window = history.window(list(history), max_tokens=200)
+
+    # The oversized tool result doesn't fit, the small messages all do
+    assert window == small
+
+def test_window_never_splits_tool_calls():
+    call = AIMessage(content="", tool_calls=[
+        {"name": "fs_read", "args": {"path": "a"}, "id": "1"},
+        {"name": "fs_read", "args": {"path": "b"}, "id": "2"},
+    ])
+    results = [ToolMessage(content="a" * 200, tool_call_id="1"), ToolMessage(content="b" * 200, tool_call_id="2")]
+    final = AIMessage(content="done")
+    history = ChatHistory([HumanMessage(content="read"), call] + results + [final])
+
+    # Budget fits the final answer and one tool result, but not the whole group
+    budget = history.token_count(final) + history.token_count(results[1]) + history.token_count(call)
+    assert history.window(list(history), max_tokens=budget) == [final]
+
+    # Enough budget for the group keeps it intact
+    budget += history.token_count(results[0])
+    assert history.window(list(history), max_tokens=budget) == [call] + results + [final]
+
+def test_window_drops_orphaned_tool_messages():
+    history = ChatHistory([ToolMessage(content="late", tool_call_id="9"), HumanMessage(content="hi")])
+    assert [m.content for m in history.window(list(history), max_tokens=0)] == ["hi"]
+
+def test_window_respects_message_cap():
+    history = ChatHistory([HumanMessage(content=str(i)) for i in range(5)])
+    assert [m.content for m in history.window(list(history), max_tokens=0, max_messages=2)] == ["3", "4"]
@@ -0,0 +1,97 @@
+import pytest
+import httpx
+from aigent.core.http_pool import HttpClientPool
+from aigent.core.schemas import HttpPoolConfig
+
+@pytest.mark.asyncio
+async def test_clients_shared_per_endpoint_and_credentials():
+    pool = HttpClientPool(HttpPoolConfig(max_connections=7))
+
+    a = pool.get("openai", "https://api.openai.com/v1", "key-1")
+    b = pool.get("openai", "https://api.openai.com/v1", "key-1")
+    c = pool.get("openai", "https://api.openai.com/v1", "key-2")
+    d = pool.get("grok", "https://api.x.ai/v1", "key-1")
+
+    assert a is b
+    assert a is not c
+    assert a is not d
+    # Raw credentials are not kept in the pool keys
+    assert all("key-1" not in key for key in pool._clients)
+
+    await pool.aclose()
+    assert pool._clients == {}
+
+@pytest.mark.asyncio
+async def test_warm_up_touches_each_client_once():
+    pool = HttpClientPool()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, str(request.url)))
+        return httpx.Response(404)
+
+    clients = pool.get("openai", "https://api.example.com/v1", "k")
+    clients.async_ = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    await pool.warm_up()
+    await pool.warm_up()
+
+    assert requests == [("HEAD", "https://api.example.com/v1")]
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_warm_up_limited_to_provider():
+    pool = HttpClientPool()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url))
+        return httpx.Response(404)
+
+    for provider in ("openai", "grok"):
+        clients = pool.get(provider, f"https://{provider}.example.com/v1", "k")
+        clients.async_ = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    await pool.warm_up("grok")
+
+    assert requests == ["https://grok.example.com/v1"]
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_engine_keeps_and_cancels_warm_up(monkeypatch, capsys, tmp_path):
+    import asyncio
+    from aigent.core import profiles
+    from aigent.core import engine as engine_module
+    from aigent.core.engine import AgentEngine, _report_warm_up
+    from aigent.core.schemas import UserProfile
+
+    started = asyncio.Event()
+
+    async def slow_warm_up(provider=None, timeout=5.0):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(engine_module.HTTP_POOL, "warm_up", slow_warm_up)
+    monkeypatch.setattr(engine_module, "WARMABLE_PROVIDERS", {"fake"})
+    config = tmp_path / "settings.yaml"
+    config.write_text("settings:\n  http_pool:\n    warm_up: true\n")
+    monkeypatch.setattr(profiles, "_ACTIVE_CONFIG_PATH", config)
+    engine = AgentEngine(UserProfile(name="warm", model_provider="fake"), yolo=True)
+    await engine.initialize()
+
+    task = engine._warm_up_task
+    assert task is not None
+    await started.wait()
+    await engine.aclose()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert task.cancelled()
+
+    # Failures are retrieved and reported instead of being lost with the task
+    async def fail():
+        raise ConnectionError("unreachable")
+
+    failed = asyncio.create_task(fail())
+    await asyncio.gather(failed, return_exceptions=True)
+    _report_warm_up(failed)
+    assert "HTTP warm-up failed: unreachable" in capsys.readouterr().out
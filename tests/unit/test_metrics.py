@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import MagicMock
+from aigent.core.tracing import TurnTracer
+from aigent.server.api import ConnectionManager
+from aigent.server.metrics import MetricsRegistry, MetricsSpanExporter
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    hist = registry.histogram("op_seconds", "Op duration.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        hist.observe(value)
+
+    text = registry.render()
+    assert 'op_seconds_bucket{le="0.1"} 2' in text
+    assert 'op_seconds_bucket{le="1"} 3' in text
+    assert 'op_seconds_bucket{le="+Inf"} 4' in text
+    assert "op_seconds_count 4" in text
+    assert "# TYPE op_seconds histogram" in text
+
+def test_labeled_children_are_reused_and_escaped():
+    registry = MetricsRegistry()
+    hist = registry.histogram("tool_seconds", "Tool duration.", labelnames=("tool",), buckets=(1.0,))
+    assert hist.labels("fs_read") is hist.labels("fs_read")
+    hist.labels('we"ird').observe(0.5)
+
+    text = registry.render()
+    assert 'tool_seconds_bucket{tool="we\\"ird",le="1"} 1' in text
+    assert 'tool_seconds_sum{tool="we\\"ird"} 0.5' in text
+    with pytest.raises(ValueError):
+        hist.labels("a", "b")
+
+def test_server_metrics_from_manager_and_spans():
+    cm = ConnectionManager()
+    engine = MagicMock()
+    engine.authorizer.pending_requests = {"req-1": object()}
+    cm.sessions["s1"] = engine
+    cm.active_connections["s1"] = [MagicMock(), MagicMock()]
+
+    tracer = TurnTracer()
+    tracer.start_span("tool", tool="bash_execute")
+    tracer.root.attributes["streamed_tokens"] = 12
+    tracer.finish()
+    MetricsSpanExporter(cm.metrics).export(tracer.spans, tracer.summary())
+
+    text = cm.metrics.render()
+    assert "aigent_active_sessions 1" in text
+    assert "aigent_active_websockets 2" in text
+    assert "aigent_pending_approvals 1" in text
+    assert "aigent_tokens_streamed_total 12" in text
+    assert "aigent_turn_duration_seconds_count 1" in text
+    assert 'aigent_tool_duration_seconds_count{tool="bash_execute"} 1' in text
+
+@pytest.mark.asyncio
+async def test_broadcast_failures_are_counted():
+    cm = ConnectionManager()
+    dead = MagicMock()
+    dead.send_text.side_effect = RuntimeError("closed")
+    cm.active_connections["s1"] = [dead]
+
+    await cm.broadcast("s1", "{}")
+    assert cm.metrics.broadcast_failures.value == 1
@@ -0,0 +1,118 @@
+import difflib
+import os
+import pytest
+from aigent.core import files
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.files import FILE_CACHE, clear_line_index_cache
+from aigent.core.patching import TextEdit, PatchError, patch_file
+from aigent.core.tools import fs_patch, fs_multi_patch
+
+@pytest.fixture
+def workdir(tmp_path):
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+    yield tmp_path
+    ALLOWED_ROOTS.reset()
+    clear_line_index_cache()
+    FILE_CACHE.clear()
+
+def full_diff(old: str, new: str):
+    diff = difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="")
+    return [line for line in diff if not line.startswith(("---", "+++"))]
+
+def test_patch_diff_matches_full_file_diff(workdir):
+    f = workdir / "module.py"
+    old = "".join(f"line {i}\n" for i in range(1, 201))
+    f.write_text(old)
+
+    diff = patch_file(f, TextEdit("line 100\n", "line one hundred\nline 100.5\n"))
+
+    new = f.read_text()
+    assert new == old.replace("line 100\n", "line one hundred\nline 100.5\n")
+    assert diff == full_diff(old, new)
+    assert diff[0] == "@@ -97,7 +97,8 @@"
+
+@pytest.mark.parametrize("target,replacement", [
+    ("line 100\n", "joined "), # Replacement runs into the next line
+    ("line 99\nline 100\n", ""), # Whole lines deleted
+    ("100\nline 101\n", "100 and "), # Target starts mid-line
+    ("line 200\n", "last"), # Ends at end of file
+])
+def test_patch_diff_matches_full_file_diff_for_newline_targets(workdir, target, replacement):
+    f = workdir / "module.py"
+    old = "".join(f"line {i}\n" for i in range(1, 201))
+    f.write_text(old)
+
+    diff = patch_file(f, TextEdit(target, replacement))
+
+    assert diff == full_diff(old, f.read_text())
+
+def test_patch_respects_line_range(workdir):
+    f = workdir / "dup.txt"
+    f.write_text("x\ny\nx\n")
+
+    patch_file(f, TextEdit("x", "z", start_line=2))
+    assert f.read_text() == "x\ny\nz\n"
+
+    with pytest.raises(PatchError):
+        patch_file(f, TextEdit("y", "w", start_line=3, end_line=3))
+    assert "Target text not found" in fs_patch.invoke({"path": str(f), "target": "nope", "replacement": ""})
+
+def test_patch_keeps_crlf_and_permissions(workdir):
+    f = workdir / "script.sh"
+    f.write_bytes(b"#!/bin/sh\r\necho a\r\necho b\r\n")
+    os.chmod(f, 0o750)
+
+    result = fs_patch.invoke({"path": str(f), "target": "echo a\necho b", "replacement": "echo c\necho d"})
+
+    assert f.read_bytes() == b"#!/bin/sh\r\necho c\r\necho d\r\n"
+    assert os.stat(f).st_mode & 0o777 == 0o750
+    assert "+echo c" in result
+    # No temp files left behind
+    assert [p.name for p in workdir.iterdir()] == ["script.sh"]
+
+def test_patch_streams_large_files(workdir, monkeypatch):
+    monkeypatch.setattr(files, "MMAP_THRESHOLD_BYTES", 0)
+    monkeypatch.setattr("aigent.core.patching.COPY_CHUNK_BYTES", 7)
+    f = workdir / "big.log"
+    old = "".join(f"entry {i}\n" for i in range(500))
+    f.write_text(old)
+
+    diff = patch_file(f, TextEdit("entry 499\n", "last\n"))
+
+    assert f.read_text() == old.replace("entry 499\n", "last\n")
+    assert diff == full_diff(old, f.read_text())
+
+def test_multi_patch_combines_edits(workdir):
+    a = workdir / "a.py"
+    b = workdir / "b.py"
+    a.write_text("import old\n\nold.run()\nold.stop()\n")
+    b.write_text("from old import x\n")
+
+    result = fs_multi_patch.invoke({"edits": [
+        {"path": str(a), "target": "old", "replacement": "new"},
+        {"path": str(b), "target": "from old", "replacement": "from new"},
+        {"path": str(a), "target": "old", "replacement": "new"},
+        {"path": str(a), "target": "old", "replacement": "new"},
+    ]})
+
+    assert a.read_text() == "import new\n\nnew.run()\nnew.stop()\n"
+    assert b.read_text() == "from new import x\n"
+    assert result.startswith(f"--- a/{a}\n+++ b/{a}\n@@ -1,4 +1,4 @@")
+    assert f"--- a/{b}" in result
+
+def test_multi_patch_is_all_or_nothing(workdir):
+    a = workdir / "a.txt"
+    b = workdir / "b.txt"
+    a.write_text("alpha\n")
+    b.write_text("beta\n")
+
+    result = fs_multi_patch.invoke({"edits": [
+        {"path": str(a), "target": "alpha", "replacement": "ALPHA"},
+        {"path": str(b), "target": "gamma", "replacement": "GAMMA"},
+        {"path": str(a), "target": "alpha", "replacement": "again"},
+    ]})
+
+    assert result.startswith("Error: No files were changed.")
+    assert "Edit 2:" in result and "Edit 3:" in result
+    assert a.read_text() == "alpha\n"
+    assert b.read_text() == "beta\n"
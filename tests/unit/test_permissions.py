@@ -1,5 +1,6 @@
 import pytest
 import asyncio
+from unittest.mock import AsyncMock
 from aigent.core.permissions import Authorizer, AuthorizationStrategy, PermissionSchema, PermissionPolicy
 from aigent.core.schemas import AgentEvent, EventType
 
@@ -90,3 +91,37 @@ async def test_authorizer_always_allow():
     events.clear()
     assert await auth.check("my_tool", {"arg": "2"}) is True
     assert len(events) == 0
+
+@pytest.mark.asyncio
+async def test_authorizer_serializes_approvals():
+    events = []
+    async def callback(event):
+        events.append(event)
+
+    schema = PermissionSchema(name="test", default_policy=PermissionPolicy.ASK)
+    auth = Authorizer(schema, callback)
+
+    # Two concurrent calls that both need approval
+    first = asyncio.create_task(auth.check("my_tool", {"arg": "1"}))
+    second = asyncio.create_task(auth.check("my_tool", {"arg": "2"}))
+    await asyncio.sleep(0.01)
+
+    # Only one question is asked at a time
+    assert len(events) == 1
+
+    # "Always" for the first call also covers the queued one
+    auth.resolve_request(events[0].metadata["request_id"], {"decision": "always_tool"})
+    assert await first is True
+    assert await second is True
+    assert len(events) == 1
+
+@pytest.mark.asyncio
+async def test_cancel_denies_pending_approvals():
+    authorizer = Authorizer(PermissionSchema(name="ask", default_policy=PermissionPolicy.ASK), AsyncMock())
+    check = asyncio.create_task(authorizer.check("bash_execute", {"command": "ls"}))
+    await asyncio.sleep(0)
+    assert len(authorizer.pending_requests) == 1
+
+    assert authorizer.cancel_pending() == 1
+    assert await check is False
+    assert authorizer.pending_requests == {}
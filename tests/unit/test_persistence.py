@@ -51,4 +51,53 @@ async def test_persistence_logic(tmp_path):
             
             # Verify history restored
             assert len(loaded_engine.history) == 1
-            assert loaded_engine.history[0].content == "Save me"
\ No newline at end of file
+            assert loaded_engine.history[0].content == "Save me"
+
+
+@pytest.mark.asyncio
+async def test_last_disconnect_releases_the_engine_shell():
+    import asyncio
+
+    cm = ConnectionManager()
+    engine = MagicMock()
+    engine.aclose = AsyncMock()
+    cm.sessions["s1"] = engine
+    cm.locks["s1"] = asyncio.Lock()
+    first, second = MagicMock(), MagicMock()
+    cm.active_connections["s1"] = [first, second]
+
+    cm.disconnect(first, "s1")
+    await asyncio.sleep(0)
+    engine.aclose.assert_not_awaited()
+
+    # Released only after the running turn (holding the lock) ends
+    async with cm.locks["s1"]:
+        cm.disconnect(second, "s1")
+        await asyncio.sleep(0.01)
+        engine.aclose.assert_not_awaited()
+    await asyncio.gather(*cm._tasks)
+    engine.aclose.assert_awaited_once()
+
+    # A client reconnecting before the release keeps the shell
+    cm.active_connections["s1"] = [first]
+    async with cm.locks["s1"]:
+        cm.disconnect(first, "s1")
+        cm.active_connections["s1"].append(second)
+    await asyncio.gather(*cm._tasks)
+    engine.aclose.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_compaction_saves_the_session(tmp_path):
+    with patch("aigent.server.api.SESSIONS_DIR", tmp_path):
+        cm = ConnectionManager()
+        engine = MagicMock()
+        engine.profile.name = "cheap"
+        engine.span_exporters = []
+        cm._register_session("s1", engine)
+
+        engine.history = [HumanMessage(content="compacted")]
+        await engine.on_compacted()
+
+        data = json.loads((tmp_path / "s1.json").read_text())
+        assert data["history"][0]["data"]["content"] == "compacted"
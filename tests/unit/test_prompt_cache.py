@@ -0,0 +1,64 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from aigent.core.history import ChatHistory, WINDOW_LOW_WATERMARK
+from aigent.core.prompt_cache import build_system_message, mark_history_prefix, extract_usage, CACHE_CONTROL
+
+def test_system_message_breakpoint_for_anthropic():
+    msg = build_system_message("static prompt", "summary", "anthropic", enabled=True)
+
+    assert msg.content[0] == {"type": "text", "text": "static prompt", "cache_control": CACHE_CONTROL}
+    # The changing summary comes after the cached prefix
+    assert "summary" in msg.content[1]["text"]
+    assert "cache_control" not in msg.content[1]
+
+def test_system_message_plain_for_other_providers():
+    msg = build_system_message("static prompt", "summary", "openai", enabled=True)
+    assert isinstance(msg.content, str)
+    assert msg.content.startswith("static prompt")
+    assert msg.content.endswith("summary\n")
+
+    assert build_system_message("static", None, "anthropic", enabled=False).content == "static"
+
+def test_history_prefix_marks_copy_of_last_text_message():
+    call = AIMessage(content="", tool_calls=[{"name": "fs_read", "args": {}, "id": "1"}])
+    history = [HumanMessage(content="read it"), call, ToolMessage(content="data", tool_call_id="1")]
+
+    marked = mark_history_prefix(history, "anthropic", enabled=True)
+
+    assert marked[2].content == [{"type": "text", "text": "data", "cache_control": CACHE_CONTROL}]
+    assert marked[2].tool_call_id == "1"
+    # Stored history untouched
+    assert history[2].content == "data"
+    assert mark_history_prefix(history, "openai", enabled=True) is history
+
+def test_history_prefix_stable_at_window_limit():
+    history = ChatHistory()
+    prompts = []
+    for turn in range(30):
+        history.append(HumanMessage(content=f"question {turn}"))
+        window = history.window(
+            list(history)[:-1], max_tokens=0, max_messages=16, low_watermark=WINDOW_LOW_WATERMARK
+        )
+        prompts.append(mark_history_prefix(window, "anthropic", enabled=True))
+        history.append(AIMessage(content=f"answer {turn}"))
+
+    def texts(messages):
+        return [m.content[0]["text"] if isinstance(m.content, list) else m.content for m in messages]
+
+    # At the limit, the window is trimmed from 16 to 12 messages and then holds
+    # its start until it is full again: the prefix marked on one turn starts the
+    # next turn's prompt (a cache hit) on every turn but the one that trims
+    assert [len(p) for p in prompts[8:15]] == [16, 12, 14, 16, 12, 14, 16]
+    assert len({p[0].content for p in prompts[9:12]}) == 1
+    for previous, current in zip(prompts[8:], prompts[9:]):
+        if len(current) > len(previous):
+            assert texts(current[:len(previous)]) == texts(previous)
+
+def test_extract_usage_reads_cache_details():
+    msg = AIMessage(content="hi", usage_metadata={
+        "input_tokens": 1500, "output_tokens": 10, "total_tokens": 1510,
+        "input_token_details": {"cache_read": 1400, "cache_creation": 0},
+    })
+    assert extract_usage(msg) == {
+        "input_tokens": 1500, "output_tokens": 10, "cache_read_tokens": 1400, "cache_creation_tokens": 0
+    }
+    assert extract_usage(AIMessage(content="hi")) == {}
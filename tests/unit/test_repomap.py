@@ -0,0 +1,189 @@
+import json
+import os
+import pytest
+from aigent.core import repomap
+from aigent.core.repomap import REPO_MAP, RepoMap, module_name, parse_symbols
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.schemas import RepoMapConfig
+from aigent.core.tools import code_lookup
+
+SOURCE = '''
+class Engine(Base, metaclass=Meta):
+    """Runs the agent.
+
+    More detail."""
+
+    async def initialize(self, fast: bool = False) -> None:
+        pass
+
+def helper(x, *args, key=None, **kwargs) -> int:
+    return 1
+'''
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    (tmp_path / "src" / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "src" / "pkg" / "engine.py").write_text(SOURCE)
+    (tmp_path / "src" / "pkg" / "broken.py").write_text("def oops(:\n")
+    (tmp_path / "notes.txt").write_text("def helper(): pass\n")
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+    config = RepoMapConfig(cache_dir=str(tmp_path / "cache"))
+    REPO_MAP.configure(config)
+    yield tmp_path, config
+    ALLOWED_ROOTS.reset()
+    REPO_MAP.configure(RepoMapConfig())
+
+def test_module_name():
+    assert module_name("src/pkg/engine.py") == "pkg.engine"
+    assert module_name("src/pkg/__init__.py") == "pkg"
+    assert module_name("tools.py") == "tools"
+
+def test_parse_symbols(repo):
+    root, _ = repo
+    symbols = {s["name"]: s for s in parse_symbols(str(root / "src" / "pkg" / "engine.py"))}
+    assert symbols["Engine"]["signature"] == "class Engine(Base, metaclass=Meta)"
+    assert symbols["Engine"]["doc"] == "Runs the agent."
+    assert symbols["Engine.initialize"]["kind"] == "method"
+    assert symbols["Engine.initialize"]["signature"] == "async def initialize(self, fast: bool=False) -> None"
+    assert symbols["helper"]["signature"] == "def helper(x, *args, key=None, **kwargs) -> int"
+    assert symbols["helper"]["line"] == 10
+    assert parse_symbols(str(root / "src" / "pkg" / "broken.py")) == []
+
+def test_lookup_order_and_kind(repo):
+    root, config = repo
+    (root / "src" / "pkg" / "helpers.py").write_text("def helper_two(): pass\n")
+    repo_map = RepoMap(str(root), config)
+    repo_map.refresh()
+
+    names = [s["name"] for s in repo_map.lookup("helper")]
+    assert names == ["helper", "helper_two"]
+    assert repo_map.lookup("initialize")[0]["name"] == "Engine.initialize"
+    assert repo_map.lookup("pkg.engine.Engine")[0]["module"] == "pkg.engine"
+    assert [s["name"] for s in repo_map.lookup("engine", kind="class")] == ["Engine"]
+    assert repo_map.lookup("helper", kind="class") == []
+    assert [s["name"] for s in repo_map.lookup("init", kind="method")] == ["Engine.initialize"]
+
+def test_persistence_and_invalidation(repo):
+    root, config = repo
+    source = root / "src" / "pkg" / "engine.py"
+    repo_map = RepoMap(str(root), config)
+    assert repo_map.refresh() == 3
+    assert repo_map.refresh() == 0
+    assert repo_map.cache_path.exists()
+
+    # A new instance starts from the saved map
+    reloaded = RepoMap(str(root), config)
+    assert reloaded.refresh() == 0
+    assert reloaded.lookup("helper")[0]["path"] == str(root / "src/pkg/engine.py")
+
+    # Only the changed file is re-parsed; deleted files drop out
+    source.write_text("def renamed(): pass\n")
+    os.utime(source, ns=(1, 1))
+    (root / "src" / "pkg" / "broken.py").unlink()
+    assert reloaded.refresh() == 1
+    assert reloaded.lookup("helper") == []
+    assert reloaded.lookup("renamed")[0]["line"] == 1
+    saved = json.loads(reloaded.cache_path.read_text())
+    assert set(saved["files"]) == {"src/pkg/__init__.py", "src/pkg/engine.py"}
+
+def test_process_pool(repo, monkeypatch):
+    root, config = repo
+    monkeypatch.setattr(repomap, "PARALLEL_THRESHOLD", 0)
+    repo_map = RepoMap(str(root), config.model_copy(update={"workers": 2}))
+    assert repo_map.refresh() == 3
+    assert repo_map.lookup("Engine")[0]["kind"] == "class"
+
+def test_render(repo):
+    root, _ = repo
+    text = REPO_MAP.render([str(root)])
+    assert "class Engine(Base, metaclass=Meta)" in text
+    assert "    async def initialize" in text
+    assert "broken.py" not in text
+    assert "map truncated" in REPO_MAP.render([str(root)], max_chars=10)
+
+def test_code_lookup_tool(repo):
+    root, _ = repo
+    found = json.loads(code_lookup.invoke({"name": "helper"}))
+    assert [s["name"] for s in found] == ["helper"]
+    assert found[0]["path"] == str(root / "src/pkg/engine.py")
+    assert json.loads(code_lookup.invoke({"name": "helper", "kind": "method"})) == []
+    assert "Access Denied" in code_lookup.invoke({"name": "x", "path": "/"})
+
+def test_subdirectory_lookup_reuses_the_root_map(repo):
+    root, config = repo
+    (root / "tools").mkdir()
+    (root / "tools" / "helpers.py").write_text("def helper(): pass\n")
+
+    found = json.loads(code_lookup.invoke({"name": "helper", "path": str(root / "tools")}))
+    assert [s["path"] for s in found] == [str(root / "tools" / "helpers.py")]
+    found = json.loads(code_lookup.invoke({"name": "helper", "path": str(root / "src")}))
+    assert [s["path"] for s in found] == [str(root / "src" / "pkg" / "engine.py")]
+
+    # One map (and one cache file) for the allowed root, not one per directory
+    assert len(REPO_MAP._maps) == 1
+    assert len(list((root / "cache").iterdir())) == 1
+
+def test_exact_matches_across_roots_come_first(tmp_path):
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+    (first / "many.py").write_text("".join(f"def helper_{i}(): pass\n" for i in range(5)))
+    (second / "one.py").write_text("def helper(): pass\n")
+    ALLOWED_ROOTS.configure([str(first), str(second)])
+    REPO_MAP.configure(RepoMapConfig(cache_dir=str(tmp_path / "cache")))
+    try:
+        found = REPO_MAP.lookup([str(first), str(second)], "helper", limit=2)
+        assert [s["name"] for s in found] == ["helper", "helper_0"]
+    finally:
+        ALLOWED_ROOTS.reset()
+        REPO_MAP.configure(RepoMapConfig())
+
+def test_refresh_skips_listing_while_the_workspace_index_is_unchanged(repo, monkeypatch):
+    import time
+    from aigent.core.schemas import WorkspaceIndexConfig
+    from aigent.core.workspace import WORKSPACE
+
+    root, config = repo
+    WORKSPACE.configure(WorkspaceIndexConfig(enabled=True, watch=False), [str(root)])
+    try:
+        deadline = time.monotonic() + 5
+        while WORKSPACE.lookup(str(root)) is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        repo_map = RepoMap(str(root), config)
+        assert repo_map.refresh() == 3
+
+        listed = []
+        real_list_files = repomap.list_files
+        monkeypatch.setattr(repomap, "list_files", lambda *a, **k: listed.append(1) or real_list_files(*a, **k))
+        assert repo_map.refresh() == 0
+        assert listed == []
+
+        # A change seen by the index (here: reported by our own write) triggers a refresh
+        source = root / "src" / "pkg" / "engine.py"
+        source.write_text("def renamed(): pass\n")
+        os.utime(source, ns=(1, 1))
+        WORKSPACE.notify(source)
+        assert repo_map.refresh() == 1
+        assert listed == [1]
+        assert repo_map.lookup("renamed")
+    finally:
+        WORKSPACE.stop_all()
+
+def test_queries_read_a_consistent_snapshot(repo):
+    import threading
+    root, config = repo
+    repo_map = RepoMap(str(root), config)
+    repo_map.refresh()
+
+    # A query started during a refresh waits for it instead of reading files
+    # that the refresh is removing
+    results = []
+    with repo_map._lock:
+        thread = threading.Thread(target=lambda: results.append(repo_map.render(10000)))
+        thread.start()
+        thread.join(timeout=0.1)
+        assert thread.is_alive()
+        del repo_map.files["src/pkg/engine.py"]
+    thread.join()
+    assert results == [""]
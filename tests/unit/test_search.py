@@ -0,0 +1,67 @@
+import json
+import pytest
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.search import search, glob_files
+from aigent.core.walk import IgnoreRules, compile_glob, walk_files
+from aigent.core.tools import fs_search, fs_glob
+
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n!keep.log\n")
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    (tmp_path / "src" / "pkg" / "core.py").write_text("def run():\n    return helper()\n")
+    (tmp_path / "src" / "pkg" / "util.py").write_text("def helper():\n    return 1\n")
+    (tmp_path / "src" / ".gitignore").write_text("generated.py\n")
+    (tmp_path / "src" / "generated.py").write_text("def helper(): pass\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "out.py").write_text("def helper(): pass\n")
+    (tmp_path / "debug.log").write_text("helper failed\n")
+    (tmp_path / "keep.log").write_text("helper kept\n")
+    (tmp_path / "image.bin").write_bytes(b"helper\0\0\0")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("helper\n")
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+    yield tmp_path
+    ALLOWED_ROOTS.reset()
+
+def test_glob_patterns():
+    assert compile_glob("*.py").match("a/b/c.py")
+    assert not compile_glob("src/*.py").match("src/a/b.py")
+    assert compile_glob("src/**/*.py").match("src/a/b.py")
+    assert compile_glob("src/**/*.py").match("src/b.py")
+
+    rules = IgnoreRules("", ["# comment", "node_modules/", "/top.txt", "*.pyc", "!keep.pyc"])
+    assert rules.match("a/node_modules", True) is True
+    assert rules.match("a/node_modules", False) is None
+    assert rules.match("top.txt", False) is True
+    assert rules.match("sub/top.txt", False) is None
+    assert rules.match("x/y.pyc", False) is True
+    assert rules.match("keep.pyc", False) is False
+
+def test_walk_respects_gitignore(repo):
+    paths = [e.rel_path for e in walk_files(str(repo))]
+    assert paths == [".gitignore", "image.bin", "keep.log", "src/.gitignore", "src/pkg/core.py", "src/pkg/util.py"]
+
+def test_search_returns_structured_matches(repo):
+    result = search([str(repo)], r"helper\(")
+    assert result["matches"] == [
+        {"path": str(repo / "src/pkg/core.py"), "line": 2, "column": 12, "text": "    return helper()"},
+        {"path": str(repo / "src/pkg/util.py"), "line": 1, "column": 5, "text": "def helper():"},
+    ]
+    assert result["truncated"] is False
+
+    # Binary files are skipped, globs filter, results are capped
+    assert [m["path"] for m in search([str(repo)], "helper")["matches"]][0].endswith("keep.log")
+    assert len(search([str(repo)], "helper", glob="*.py")["matches"]) == 2
+    capped = search([str(repo)], "helper", max_results=1)
+    assert len(capped["matches"]) == 1 and capped["truncated"] is True
+
+def test_search_tools(repo):
+    result = json.loads(fs_search.invoke({"pattern": "HELPER", "ignore_case": True, "glob": "util.py"}))
+    assert result["matches"][0]["line"] == 1
+
+    files = json.loads(fs_glob.invoke({"pattern": "src/**/*.py"}))["files"]
+    assert [f["path"] for f in files] == [str(repo / "src/pkg/core.py"), str(repo / "src/pkg/util.py")]
+
+    assert "Invalid regular expression" in fs_search.invoke({"pattern": "("})
+    assert "Access Denied" in fs_glob.invoke({"pattern": "*", "path": "/etc"})
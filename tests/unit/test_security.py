@@ -1,19 +1,18 @@
 import pytest
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from aigent.core.roots import ALLOWED_ROOTS, RootTrie
 from aigent.core.tools import validate_path, fs_read, fs_write
 
 @pytest.fixture
-def mock_profile_manager():
-    with patch("aigent.core.tools.ProfileManager") as MockPM:
-        pm_instance = MockPM.return_value
-        # Default to allow only current directory
-        pm_instance.config.allowed_work_dirs = ["."]
-        yield pm_instance
-
-def test_path_validation_success(tmp_path, mock_profile_manager):
+def allow_dirs():
+    # Default to allow only current directory
+    ALLOWED_ROOTS.configure(["."])
+    yield ALLOWED_ROOTS.configure
+    ALLOWED_ROOTS.reset()
+
+def test_path_validation_success(tmp_path, allow_dirs):
     # Override allowed dirs to tmp_path for this test
-    mock_profile_manager.config.allowed_work_dirs = [str(tmp_path)]
+    allow_dirs([str(tmp_path)])
     
     allowed_file = tmp_path / "safe.txt"
     allowed_file.touch()
@@ -27,9 +26,9 @@ def test_path_validation_success(tmp_path, mock_profile_manager):
     subfile = subdir / "nested.txt"
     assert validate_path(subfile) is None
 
-def test_path_validation_failure(tmp_path, mock_profile_manager):
+def test_path_validation_failure(tmp_path, allow_dirs):
     # Override allowed dirs to tmp_path
-    mock_profile_manager.config.allowed_work_dirs = [str(tmp_path)]
+    allow_dirs([str(tmp_path)])
     
     # Access /etc/passwd
     forbidden = Path("/etc/passwd")
@@ -43,8 +42,8 @@ def test_path_validation_failure(tmp_path, mock_profile_manager):
     assert error is not None
     assert "Access Denied" in error
 
-def test_fs_read_security(tmp_path, mock_profile_manager):
-    mock_profile_manager.config.allowed_work_dirs = [str(tmp_path)]
+def test_fs_read_security(tmp_path, allow_dirs):
+    allow_dirs([str(tmp_path)])
     
     # Safe
     f = tmp_path / "ok.txt"
@@ -53,3 +52,45 @@ def test_fs_read_security(tmp_path, mock_profile_manager):
     
     # Unsafe
     assert "Access Denied" in fs_read("/etc/passwd")
+
+def test_root_trie_prefix_matching():
+    trie = RootTrie([Path("/srv/app"), Path("/srv/app/sub"), Path("/home/me/proj")])
+
+    assert trie.contains(Path("/srv/app"))
+    assert trie.contains(Path("/srv/app/src/main.py"))
+    assert trie.contains(Path("/home/me/proj/x"))
+    # Component-wise: /srv/application is not under /srv/app
+    assert not trie.contains(Path("/srv/application"))
+    assert not trie.contains(Path("/srv"))
+    assert RootTrie([Path("/")]).contains(Path("/etc/passwd"))
+
+def test_symlink_escape_denied(tmp_path, allow_dirs):
+    root = tmp_path / "root"
+    root.mkdir()
+    (tmp_path / "secret.txt").write_text("secret")
+    (root / "link.txt").symlink_to(tmp_path / "secret.txt")
+    allow_dirs([str(root)])
+
+    assert "Access Denied" in validate_path(root / "link.txt")
+    assert "Access Denied" in fs_read.invoke({"path": str(root / "link.txt")})
+
+def test_roots_reload_when_settings_change(tmp_path, monkeypatch):
+    from aigent.core import roots
+    from aigent.core.profiles import get_config_path, set_config_path
+
+    settings = tmp_path / "settings.yaml"
+    settings.write_text(f"settings:\n  allowed_work_dirs: ['{tmp_path / 'a'}']\n")
+    previous = get_config_path()
+    set_config_path(settings)
+    monkeypatch.setattr(roots, "RELOAD_CHECK_SECONDS", 0)
+    try:
+        ALLOWED_ROOTS.reset()
+        assert validate_path(tmp_path / "a" / "f") is None
+        assert validate_path(tmp_path / "b" / "f") is not None
+
+        settings.write_text(f"settings:\n  allowed_work_dirs: ['{tmp_path / 'b'}', '{tmp_path / 'c'}']\n")
+        assert validate_path(tmp_path / "b" / "f") is None
+        assert validate_path(tmp_path / "a" / "f") is not None
+    finally:
+        set_config_path(previous)
+        ALLOWED_ROOTS.reset()
@@ -0,0 +1,157 @@
+import pytest
+import time
+from aigent.core.engine import AgentEngine
+from aigent.core.schemas import UserProfile, EventType
+from aigent.core.shell import OutputBuffer, ShellSession, run_command
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(max_bytes=10)
+    for _ in range(10):
+        buffer.write(b"0123456789")
+
+    assert buffer.total_bytes == 100
+    assert buffer.truncated_bytes == 90
+    assert buffer.text() == "01234\n... [90 bytes truncated] ...\n56789"
+
+    small = OutputBuffer(max_bytes=10)
+    small.write(b"abc")
+    assert small.text() == "abc"
+
+@pytest.mark.asyncio
+async def test_run_command_streams_chunks():
+    chunks = []
+
+    async def on_output(stream, text):
+        chunks.append((stream, text))
+
+    result = await run_command("echo out; echo err >&2", timeout=5, max_output_bytes=1024, on_output=on_output)
+
+    assert result.returncode == 0
+    assert result.stdout == "out\n"
+    assert result.stderr == "err\n"
+    assert ("stdout", "out\n") in chunks
+    assert ("stderr", "err\n") in chunks
+
+@pytest.mark.asyncio
+async def test_run_command_timeout_kills_process_group():
+    start = time.perf_counter()
+    # The background sleep inherits the pipes; only killing the group ends it
+    result = await run_command("echo started; sleep 30 & sleep 30", timeout=0.5, max_output_bytes=1024)
+
+    assert time.perf_counter() - start < 5
+    assert result.timed_out is True
+    assert result.stdout == "started\n"
+
+@pytest.mark.asyncio
+async def test_engine_emits_tool_output_events():
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": [
+            {"tool_calls": [{"name": "bash_execute", "args": {"command": "echo one; echo two"}}]},
+            "Done.",
+        ]},
+    )
+    engine = AgentEngine(profile, yolo=True)
+    await engine.initialize()
+
+    events = [event async for event in engine.stream("Run it")]
+    types = [e.type for e in events]
+
+    streamed = "".join(e.content for e in events if e.type == EventType.TOOL_OUTPUT)
+    assert streamed == "one\ntwo\n"
+    assert types.index(EventType.TOOL_START) < types.index(EventType.TOOL_OUTPUT) < types.index(EventType.TOOL_END)
+    assert next(e for e in events if e.type == EventType.TOOL_END).content == "one\ntwo\n"
+
+@pytest.mark.asyncio
+async def test_shell_session_keeps_state_between_commands(tmp_path):
+    shell = ShellSession(cwd=str(tmp_path))
+    try:
+        await shell.run("mkdir sub && cd sub && export GREETING=hi", timeout=5, max_output_bytes=1024)
+        result = await shell.run("pwd; echo $GREETING", timeout=5, max_output_bytes=1024)
+        assert result.stdout == f"{tmp_path / 'sub'}\nhi\n"
+        assert result.returncode == 0
+
+        # Exit codes, stderr and output without a trailing newline are framed exactly
+        result = await shell.run("printf partial; echo oops >&2; false", timeout=5, max_output_bytes=1024)
+        assert (result.stdout, result.stderr, result.returncode) == ("partial", "oops\n", 1)
+
+        # A syntax error fails the command, not the session
+        result = await shell.run("echo 'unterminated", timeout=5, max_output_bytes=1024)
+        assert result.returncode != 0
+        assert (await shell.run("echo ok", timeout=5, max_output_bytes=1024)).stdout == "ok\n"
+    finally:
+        await shell.close()
+
+@pytest.mark.asyncio
+async def test_shell_session_restarts_after_timeout_and_exit():
+    shell = ShellSession()
+    try:
+        await shell.run("export MARK=1", timeout=5, max_output_bytes=1024)
+        start = time.perf_counter()
+        result = await shell.run("sleep 30", timeout=0.5, max_output_bytes=1024)
+        assert result.timed_out is True
+        assert time.perf_counter() - start < 5
+
+        # Fresh shell: previous state is gone
+        assert (await shell.run("echo ${MARK:-unset}", timeout=5, max_output_bytes=1024)).stdout == "unset\n"
+
+        result = await shell.run("echo bye; exit 3", timeout=5, max_output_bytes=1024)
+        assert result.shell_exited is True
+        assert result.stdout == "bye\n"
+        assert (await shell.run("echo back", timeout=5, max_output_bytes=1024)).stdout == "back\n"
+    finally:
+        await shell.close()
+
+@pytest.mark.asyncio
+async def test_shell_session_stops_when_idle():
+    import asyncio
+
+    shell = ShellSession(idle_timeout=0.2)
+    try:
+        await shell.run("export MARK=1", timeout=5, max_output_bytes=1024)
+        assert shell.alive
+        await asyncio.sleep(0.1)
+        # Using the shell re-arms the timer
+        await shell.run("true", timeout=5, max_output_bytes=1024)
+        await asyncio.sleep(0.15)
+        assert shell.alive
+
+        await asyncio.sleep(0.3)
+        assert not shell.alive
+        assert (await shell.run("echo ${MARK:-unset}", timeout=5, max_output_bytes=1024)).stdout == "unset\n"
+    finally:
+        await shell.close()
+
+@pytest.mark.asyncio
+async def test_shell_cd_does_not_move_file_tools(tmp_path, monkeypatch):
+    import os
+    from aigent.core.roots import ALLOWED_ROOTS
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "where.txt").write_text("top\n")
+    (tmp_path / "sub" / "where.txt").write_text("sub\n")
+    monkeypatch.chdir(tmp_path)
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": [
+            {"tool_calls": [{"name": "bash_execute", "args": {"command": "cd sub && cat where.txt"}}]},
+            {"tool_calls": [{"name": "bash_execute", "args": {"command": "cat where.txt"}}]},
+            {"tool_calls": [{"name": "fs_read", "args": {"path": "where.txt"}}]},
+            "Done.",
+        ]},
+    )
+    engine = AgentEngine(profile, yolo=True)
+    await engine.initialize()
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+    try:
+        events = [event async for event in engine.stream("Where am I?")]
+        outputs = [e.content for e in events if e.type == EventType.TOOL_END]
+
+        # The shell stays in sub/; fs_read still resolves against the agent's cwd
+        assert outputs == ["sub\n", "sub\n", "top\n"]
+        assert os.getcwd() == str(tmp_path)
+    finally:
+        await engine.aclose()
+        ALLOWED_ROOTS.reset()
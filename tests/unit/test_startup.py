@@ -0,0 +1,26 @@
+import subprocess
+import sys
+import pytest
+
+HEAVY_MODULES = ["langchain_openai", "langchain_anthropic", "langchain_google_genai", "fastapi", "uvicorn"]
+
+@pytest.mark.parametrize("module", ["aigent.main", "aigent.interfaces.cli", "aigent.core.engine"])
+def test_import_does_not_load_heavy_modules(module):
+    # Fresh interpreter: the test process has likely imported these already
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+def test_provider_sdk_loaded_on_demand():
+    code = (
+        "import sys\n"
+        "from aigent.core.providers import create_chat_model\n"
+        "from aigent.core.schemas import UserProfile\n"
+        "create_chat_model(UserProfile(name='t', model_provider='anthropic', model_name='x'))\n"
+        "print('langchain_anthropic' in sys.modules, 'langchain_openai' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        env={"ANTHROPIC_API_KEY": "test", "PATH": ""}
+    )
+    assert result.stdout.strip() == "True False"
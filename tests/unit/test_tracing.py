@@ -0,0 +1,105 @@
+import json
+import pytest
+from aigent.core.engine import AgentEngine
+from aigent.core.schemas import UserProfile, EventType
+from aigent.core.tracing import TurnTracer, InMemorySpanExporter, OTLPFileSpanExporter
+
+def test_tracer_parents_and_summary():
+    tracer = TurnTracer({"profile": "p"})
+    llm = tracer.start_span("llm")
+    tracer.end_span(llm, ttft_ms=1.0)
+    tool = tracer.start_span("tool", tool="fs_read")
+    tracer.finish()
+
+    assert tool.end_ns is not None # open spans are closed by finish()
+    assert all(s.parent_id == tracer.root.span_id for s in tracer.spans[1:])
+    summary = tracer.summary()
+    assert summary["llm_calls"] == 1
+    assert summary["tool_calls"] == 1
+    assert summary["ttft_ms"] is None
+    assert summary["total_ms"] >= summary["llm_ms"]
+
+def test_mark_spans_from_turn_start():
+    tracer = TurnTracer()
+    first = tracer.mark("first_token")
+    tracer.finish()
+
+    assert first.start_ns == tracer.root.start_ns
+    assert first.end_ns <= tracer.root.end_ns
+    assert tracer.summary()["ttft_ms"] == round(first.duration_ms, 3)
+
+def test_otlp_file_exporter_writes_one_line_per_turn(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = OTLPFileSpanExporter(str(path))
+    for _ in range(2):
+        tracer = TurnTracer()
+        tracer.start_span("tool", tool="fs_read", ok=True)
+        tracer.finish()
+        exporter.export(tracer.spans, tracer.summary())
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["turn", "tool"]
+    assert "parentSpanId" not in spans[0]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    assert {"key": "ok", "value": {"boolValue": True}} in spans[1]["attributes"]
+
+@pytest.mark.asyncio
+async def test_engine_emits_trace_and_exports_turn():
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": [
+            {"tool_calls": [{"name": "fs_read", "args": {"path": "pyproject.toml"}}]},
+            "Done.",
+        ]},
+    )
+    engine = AgentEngine(profile, yolo=True)
+    await engine.initialize()
+    exporter = InMemorySpanExporter(max_turns=1)
+    engine.span_exporters.append(exporter)
+
+    events = [event async for event in engine.stream("Read it")]
+    types = [e.type for e in events]
+    assert types[-2:] == [EventType.TRACE, EventType.FINISH]
+
+    trace = events[-2].metadata
+    names = [s["name"] for s in trace["spans"]]
+    assert names.count("llm") == 2
+    assert {"turn", "first_token", "tool", "authorization", "history_update"} <= set(names)
+    assert trace["summary"]["tool_calls"] == 1
+    assert trace["summary"]["ttft_ms"] is not None
+
+    # Only the most recent turn is kept
+    async for _ in engine.stream("Again"):
+        pass
+    recent = exporter.recent()
+    assert len(recent) == 1
+    assert recent[0]["trace_id"] != trace["trace_id"]
+
+@pytest.mark.asyncio
+async def test_turn_without_tokens_has_no_ttft():
+    from aigent.server.metrics import ServerMetrics, MetricsSpanExporter
+
+    profile = UserProfile(
+        name="bench",
+        model_provider="fake",
+        provider_options={"script": [
+            {"tool_calls": [{"name": "fs_read", "args": {"path": "pyproject.toml"}}]},
+            {"content": ""},
+        ]},
+    )
+    engine = AgentEngine(profile, yolo=True)
+    await engine.initialize()
+    metrics = ServerMetrics()
+    engine.span_exporters.append(MetricsSpanExporter(metrics))
+
+    events = [event async for event in engine.stream("Read it")]
+    trace = next(e for e in events if e.type == EventType.TRACE).metadata
+
+    assert "first_token" not in [s["name"] for s in trace["spans"]]
+    assert trace["summary"]["ttft_ms"] is None
+    text = metrics.render()
+    assert "aigent_turn_duration_seconds_count 1" in text
+    assert "aigent_turn_ttft_seconds_count 0" in text
@@ -0,0 +1,122 @@
+import json
+import time
+import pytest
+from aigent.core import search as search_module
+from aigent.core.roots import ALLOWED_ROOTS
+from aigent.core.schemas import WorkspaceIndexConfig
+from aigent.core.search import search, glob_files
+from aigent.core.tools import fs_write
+from aigent.core.workspace import WORKSPACE, WorkspaceIndex, gram, required_literals, trigrams
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+@pytest.fixture
+def indexed(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.tmp\n")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "models.py").write_text("class UserModel:\n    pass\n")
+    (tmp_path / "pkg" / "views.py").write_text("from pkg.models import UserModel\n")
+    (tmp_path / "scratch.tmp").write_text("class UserModel: pass\n")
+    ALLOWED_ROOTS.configure([str(tmp_path)])
+
+    def start(**options):
+        WORKSPACE.configure(WorkspaceIndexConfig(enabled=True, **options), [str(tmp_path)])
+        assert wait_for(lambda: WORKSPACE.lookup(str(tmp_path)) is not None)
+        index, prefix = WORKSPACE.lookup(str(tmp_path))
+        assert prefix == ""
+        return index
+
+    yield tmp_path, start
+    WORKSPACE.stop_all()
+    ALLOWED_ROOTS.reset()
+
+def test_required_literals():
+    assert required_literals(r"class\s+UserModel\b") == [b"class", b"usermodel"]
+    assert required_literals("foo|barbaz") == []
+    assert required_literals("ab.cd") == []
+    assert required_literals("(") == []
+    # Optional and counted characters are dropped; escapes and groups end a run
+    assert required_literals("abcd*ef") == [b"abc"]
+    assert required_literals("abcd{2}x{100}") == [b"abc"]
+    assert required_literals(r"user\.name\x41bcd") == [b"user.name", b"bcd"]
+    assert required_literals("foo(bar|baz)qux[xyz]+end") == [b"foo", b"qux", b"end"]
+    # Verbose mode can't be read literally; inline (?i) disables non-ASCII narrowing
+    assert required_literals("(?x)user model") == []
+    assert required_literals("(?i)Ümlaut") == []
+    assert required_literals("Ümlaut") == ["Ümlaut".encode()]
+
+def test_trigrams_are_ints():
+    assert trigrams(b"") == set() == trigrams(b"ab")
+    assert trigrams(b"ABc") == {gram(b"abc")} == {0x616263}
+    data = bytes(range(256)) * 3 + b"tail"
+    assert trigrams(data) == {gram(data.lower(), i) for i in range(len(data) - 2)}
+
+def test_index_drops_replaced_and_removed_versions(tmp_path):
+    index = WorkspaceIndex(str(tmp_path), WorkspaceIndexConfig(enabled=True, watch=False))
+    for i in range(100):
+        (tmp_path / f"f{i}.py").write_text(f"old_{i}\n")
+        index._index_file(f"f{i}.py", 6, 0)
+    for i in range(100):
+        (tmp_path / f"f{i}.py").write_text(f"new_{i}\n")
+        index._index_file(f"f{i}.py", 6, 1)
+    index._remove("f0.py")
+
+    assert index._candidates([b"old_"]) == set()
+    assert index._candidates([b"new_1"]) == {f"f{i}.py" for i in range(1, 100) if str(i).startswith("1")}
+    # Dead versions are swept from the postings in batches
+    assert len(index._dead) <= 64
+    assert all(ids <= set(index._paths) | index._dead for ids in index._postings.values())
+
+def test_index_answers_searches_without_walking(indexed, monkeypatch):
+    root, start = indexed
+    index = start(watch=False, poll_interval=60)
+    walked = []
+    monkeypatch.setattr(search_module, "walk_files", lambda *args: walked.append(args) or iter(()))
+
+    assert [f["path"] for f in glob_files([str(root)], "*.py")["files"]] == [
+        str(root / "pkg" / "models.py"), str(root / "pkg" / "views.py")
+    ]
+    result = search([str(root)], r"class\s+UserModel")
+    assert [m["path"] for m in result["matches"]] == [str(root / "pkg" / "models.py")]
+    # The trigram filter means views.py is never read
+    assert result["files_searched"] == 1
+    # Subdirectories are served from the same index
+    assert len(glob_files([str(root / "pkg")], "*.py")["files"]) == 2
+    assert walked == []
+    assert index.mode == "polling"
+
+def test_index_follows_changes_with_inotify(indexed):
+    root, start = indexed
+    index = start(watch=True)
+    assert wait_for(lambda: index.mode == "inotify")
+
+    (root / "pkg" / "sub").mkdir()
+    (root / "pkg" / "sub" / "new.py").write_text("class NewModel: pass\n")
+    (root / "pkg" / "views.py").unlink()
+
+    def paths():
+        return [f["path"] for f in glob_files([str(root)], "*.py")["files"]]
+
+    assert wait_for(lambda: paths() == [str(root / "pkg" / "models.py"), str(root / "pkg" / "sub" / "new.py")])
+    assert wait_for(lambda: len(search([str(root)], "NewModel")["matches"]) == 1)
+
+    # New ignore rules apply to already indexed files
+    (root / ".gitignore").write_text("*.tmp\nsub/\n")
+    assert wait_for(lambda: paths() == [str(root / "pkg" / "models.py")])
+
+def test_index_polling_and_own_writes(indexed):
+    root, start = indexed
+    start(watch=False, poll_interval=0.1)
+
+    (root / "pkg" / "extra.py").write_text("x = 1\n")
+    assert wait_for(lambda: any(f["path"].endswith("extra.py") for f in glob_files([str(root)], "*.py")["files"]))
+
+    # fs_write updates the index immediately
+    fs_write.invoke({"path": str(root / "pkg" / "models.py"), "content": "class Renamed: pass\n"})
+    assert [m["path"] for m in search([str(root)], "Renamed")["matches"]] == [str(root / "pkg" / "models.py")]